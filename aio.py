@@ -0,0 +1,793 @@
+"""
+It implements the asyncio engine of the backup executable. A single event loop keeps many requests in flight over a
+pool of keep-alive connections: the next page of issues is listed while the issues of the current page are being
+downloaded, and the attachments of an issue are downloaded concurrently. Responses are parsed by the youtrack classes
+and archives are written by worker threads through the same functions the threaded engine uses, therefore both
+engines give the same archives.
+"""
+
+from argparse import Namespace
+from asyncio import FIRST_COMPLETED, Task, TimeoutError as AsyncTimeoutError
+from asyncio import Condition, Lock, create_task, gather, sleep, to_thread, wait
+from functools import partial
+from io import SEEK_END
+from json import loads
+from logging import getLogger
+from re import sub
+from tempfile import SpooledTemporaryFile
+from threading import Event
+from traceback import format_exc
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, IO, List, Set, Tuple, Optional as Opt
+from urllib.parse import quote, urlencode
+from xml.dom import minidom, Node
+from aiohttp import ClientError, ClientResponse, ClientSession, TCPConnector
+from httplib2 import Response
+from yarl import URL
+from youtrack import Attachment, Issue, Project, YouTrackException
+from backup import CHUNK_SIZE, SPOOL_SIZE, BlobStore, Manifest, Output, Run, archive_issue
+from backup import requested_issues, requested_projects, search_query
+from backup import ISSUE_EXTRA_FIELDS, activities_request, downloaded, group_extras, ids_query, next_page
+from backup import work_items_request
+from metrics import metrics
+from transport import TRANSIENT_STATUSES, backoff_delay, retry_after
+
+
+class AsyncByteBudget:
+    """
+    It bounds the number of bytes in flight among the coroutines of the event loop, as transport.ByteBudget does among
+    threads: an acquisition waits until its size fits in what is left of the budget, one larger than the whole budget
+    being let through alone.
+    """
+
+    def __init__(self, limit: int) -> None:
+        """
+        It creates an instance of the AsyncByteBudget class.
+
+        :param limit:   The number of bytes allowed in flight.
+        :type limit:    int.
+        """
+        self.limit = limit
+        self.used = 0
+        self.condition = Condition()
+
+    async def acquire(self, size: int, wait: bool = True) -> None:
+        """
+        It holds size bytes of the budget until they are released, waiting for them to be available unless wait is
+        False, in which case the budget may be exceeded.
+
+        :param size:    The number of bytes to hold.
+        :type size:     int.
+
+        :param wait:    Whether to wait for the bytes to be available.
+        :type wait:     bool.
+
+        :return: None.
+        :rtype: None.
+        """
+        async with self.condition:
+            if wait:
+                await self.condition.wait_for(lambda: not self.used or self.used + size <= self.limit)
+            self.used += size
+
+    async def release(self, size: int) -> None:
+        """
+        It gives back size bytes of the budget.
+
+        :param size:    The number of bytes to give back.
+        :type size:     int.
+
+        :return: None.
+        :rtype: None.
+        """
+        async with self.condition:
+            self.used -= size
+            self.condition.notify_all()
+
+
+class AsyncConnection:
+    """
+    It performs over an aiohttp session the requests of the legacy REST API performed by the youtrack connection, and
+    parses their responses with the youtrack classes. Requests failed because of rate limiting, transient server
+    errors or network errors are retried as by transport.Connection; the engine only reads, so all of them are.
+    """
+
+    def __init__(self, session: ClientSession, url: str, token: Opt[str], retries: int = 5,
+                 backoff: float = 0.5) -> None:
+        """
+        It creates an instance of the AsyncConnection class.
+
+        :param session:     The session the requests are performed with.
+        :type session:      ClientSession.
+
+        :param url:         The URL of the YouTrack instance.
+        :type url:          str.
+
+        :param token:       The token to use with the given instance.
+        :type token:        Opt[str].
+
+        :param retries:     The number of times a failed request is attempted again.
+        :type retries:      int.
+
+        :param backoff:     The delay in seconds before the first retry, doubled at each attempt.
+        :type backoff:      float.
+        """
+        self.session = session
+        self.url = url.rstrip('/')
+        self.headers = {'Authorization': f'Bearer {token}'} if token else {}
+        self.retries = retries
+        self.backoff = backoff
+
+    async def retry(self, url: str, attempt: int, reason: Any, requested: Opt[float] = None) -> None:
+        """
+        It waits before retrying the request of the given URL.
+
+        :param url:         The URL of the request.
+        :type url:          str.
+
+        :param attempt:     The number of attempts already retried.
+        :type attempt:      int.
+
+        :param reason:      The reason of the failure.
+        :type reason:       Any.
+
+        :param requested:   The delay requested by the server through Retry-After.
+        :type requested:    Opt[float].
+
+        :return: None.
+        :rtype: None.
+        """
+        delay = backoff_delay(self.backoff, attempt, requested)
+        getLogger(__name__).warning(f'GET `{url}` failed ({reason}), retry {attempt + 1}/{self.retries} '
+                                    f'in {delay:.1f}s.')
+        await sleep(delay)
+
+    async def get(self, url: str, consume: Callable[[ClientResponse], Awaitable[Any]],
+                  headers: Opt[Dict[str, str]] = None) -> Any:
+        """
+        It requests the given URL, relative to the URL of the instance, and returns what consume returns for the
+        successful response. Since a failure while reading the body is retried, consume must be safe to call again.
+
+        :param url:         The URL of the request.
+        :type url:          str.
+
+        :param consume:     The coroutine function reading the successful response.
+        :type consume:      Callable[[ClientResponse], Awaitable[Any]].
+
+        :param headers:     The headers of the request, the authorization ones when None.
+        :type headers:      Opt[Dict[str, str]].
+
+        :return: See description.
+        :rtype: Any.
+
+        :raises YouTrackException: When the server answers with an error.
+        """
+        # Sent as given, as the youtrack connection does, rather than normalized
+        target = URL(url if url.startswith('http') else self.url + url, encoded=True)
+        attempt = 0
+
+        while True:
+            try:
+                async with self.session.get(target, headers=headers or self.headers) as response:
+                    if response.status in (200, 201):
+                        return await consume(response)
+
+                    content = await response.read()
+                    status, requested = response.status, retry_after(response.headers.get('Retry-After'))
+                    if status not in TRANSIENT_STATUSES or attempt >= self.retries:
+                        info = Response(dict({k.lower(): v for k, v in response.headers.items()}, status=status))
+                        info.reason = response.reason
+                        raise YouTrackException(url, info, content)
+                    await self.retry(url, attempt, status, requested)
+
+            except (ClientError, OSError, AsyncTimeoutError) as e:
+                if attempt >= self.retries:
+                    raise
+                await self.retry(url, attempt, e)
+
+            attempt += 1
+
+    async def xml(self, url: str, accept: Opt[str] = None) -> Any:
+        """
+        It requests the given URL of the REST API and parses the XML document answered.
+
+        :param url:     The URL of the request, relative to the REST API.
+        :type url:      str.
+
+        :param accept:  The content type asked for, if any.
+        :type accept:   Opt[str].
+
+        :return: See description.
+        :rtype: Document.
+        """
+        headers = dict(self.headers, Accept=accept) if accept else None
+        content = await self.get(f'/rest{url}', ClientResponse.read, headers)
+        # Anonymizes the system user as the youtrack connection does
+        return minidom.parseString(sub(rb'system_user[%@][a-zA-Z0-9]+', b'guest', content))
+
+    async def elements(self, url: str) -> List[Any]:
+        """
+        It requests the given URL of the REST API and returns the child elements of the XML document answered.
+
+        :param url:     The URL of the request, relative to the REST API.
+        :type url:      str.
+
+        :return: See description.
+        :rtype: List[Element].
+        """
+        document = await self.xml(url)
+        return [e for e in document.documentElement.childNodes if e.nodeType == Node.ELEMENT_NODE]
+
+    async def getJson(self, path: str, params: Dict[str, str]) -> Any:
+        """
+        It requests the given path of the REST API, relative to the URL of the instance, with the given query
+        parameters, and returns the JSON document answered, as transport.Connection.getJson does.
+
+        :param path:    The path of the request, e.g. /api/issues.
+        :type path:     str.
+
+        :param params:  The query parameters.
+        :type params:   Dict[str, str].
+
+        :return: See description.
+        :rtype: Any.
+        """
+        return loads(await self.get(f'{path}?{urlencode(params)}', ClientResponse.read,
+                                    dict(self.headers, Accept='application/json')))
+
+    # The requests of the youtrack connection needed by the engine, named after its methods
+
+    async def getProjectIds(self) -> List[str]:
+        return [e.getAttribute('id') for e in await self.elements('/admin/project/')]
+
+    async def getProject(self, prj: str) -> Project:
+        return Project(await self.xml(f'/admin/project/{quote(prj)}', 'application/xml'))
+
+    async def getIssue(self, issue_id: str) -> Issue:
+        return Issue(await self.xml(f'/issue/{issue_id}'))
+
+    async def getIssues(self, prj: str, query: str, after: int, max: int) -> List[Issue]:
+        query = urlencode(dict(after=str(after), max=str(max), filter=query))
+        return [Issue(e) for e in await self.elements(f'/issue/byproject/{quote(prj)}?{query}')]
+
+    async def getAllIssues(self, query: str, after: int, max: int, withFields: Tuple[str, ...] = ()) -> List[Issue]:
+        query = urlencode([('with', f) for f in withFields] + [('after', str(after)), ('max', str(max)),
+                                                               ('filter', query)])
+        return [Issue(e) for e in await self.elements(f'/issue?{query}')]
+
+    async def getAttachments(self, issue_id: str) -> List[Attachment]:
+        return [Attachment(e) for e in await self.elements(f'/issue/{issue_id}/attachment')]
+
+    async def getAttachmentContent(self, url: str,
+                                   hold: Callable[[int, bool], Awaitable[None]]) -> Tuple[IO[bytes], Opt[str]]:
+        """
+        It downloads the content of the attachment at the given URL into a spooled temporary file, kept in memory
+        unless large. Its declared length is held through hold(size, wait) before its content is read, and what
+        exceeds it once read, without waiting.
+
+        :param url:     The URL of the attachment.
+        :type url:      str.
+
+        :param hold:    The coroutine function holding bytes of the budget, waiting for them when told to.
+        :type hold:     Callable[[int, bool], Awaitable[None]].
+
+        :return: The content rewound and its declared length, None when unknown.
+        :rtype: Tuple[IO[bytes], Opt[str]].
+        """
+        held = 0
+
+        async def consume(response: ClientResponse) -> Tuple[IO[bytes], Opt[str]]:
+            nonlocal held
+            length = response.headers.get('Content-Length')
+            # A retried request holds only what the failed one did not
+            size = int(length) if length is not None else 0
+            if size > held:
+                await hold(size - held, True)
+                held = size
+            content = SpooledTemporaryFile(SPOOL_SIZE)
+            try:
+                async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                    content.write(chunk)
+                if content.tell() > held:
+                    await hold(content.tell() - held, False)
+                    held = content.tell()
+            except BaseException:
+                content.close()
+                raise
+            content.seek(0)
+            return content, length
+
+        # Asks for the content as it is, so that its declared length is the one the threaded engine gets
+        return await self.get(url, consume, dict(self.headers, **{'Accept-Encoding': 'identity'}))
+
+
+async def fetch_issues_page(args: Namespace, connection: AsyncConnection, prj: str, query: str,
+                            after: int) -> List[Issue]:
+    """
+    It fetches a single page of at most args.page_size issues of the given project matching the given query, starting
+    from the given offset.
+
+    :param args:        The namespace with parsed command line arguments.
+    :type args:         Namespace.
+
+    :param connection:  The connection to the server.
+    :type connection:   AsyncConnection.
+
+    :param prj:         The project identifier.
+    :type prj:          str.
+
+    :param query:       The YouTrack search query the issues must match, empty for all the issues.
+    :type query:        str.
+
+    :param after:       The number of issues to skip.
+    :type after:        int.
+
+    :return: See description.
+    :rtype: List[Issue].
+    """
+    with metrics.timer('listing', prj):
+        return await connection.getIssues(prj, query, after, args.page_size)
+
+
+async def fetch_issue_stamps_page(args: Namespace, connection: AsyncConnection, prj: str, after: int) -> List[Issue]:
+    """
+    It fetches a single page of at most args.page_size issues of the given project starting from the given offset,
+    carrying only their identifier and their last update timestamp.
+
+    :param args:        The namespace with parsed command line arguments.
+    :type args:         Namespace.
+
+    :param connection:  The connection to the server.
+    :type connection:   AsyncConnection.
+
+    :param prj:         The project identifier.
+    :type prj:          str.
+
+    :param after:       The number of issues to skip.
+    :type after:        int.
+
+    :return: See description.
+    :rtype: List[Issue].
+    """
+    with metrics.timer('listing', prj):
+        query = search_query(args, f'project: {{{prj}}}')
+        return await connection.getAllIssues(query, after, args.page_size, withFields=('updated',))
+
+
+async def iter_pages(args: Namespace, fetch: Callable[..., Awaitable[List[Any]]], *fetch_args: Any) -> AsyncIterator:
+    """
+    It yields the items returned by fetch(*fetch_args, after) page by page, until a page shorter than args.page_size
+    is returned. While the items of a page are consumed the following page is already being fetched.
+
+    :param args:        The namespace with parsed command line arguments.
+    :type args:         Namespace.
+
+    :param fetch:       The coroutine function fetching a single page given its offset as last argument.
+    :type fetch:        Callable[..., Awaitable[List[Any]]].
+
+    :param fetch_args:  The leading arguments of fetch.
+    :type fetch_args:   Any.
+
+    :return: See description.
+    :rtype: AsyncIterator.
+    """
+    after = 0
+    page = create_task(fetch(*fetch_args, after))
+
+    try:
+        while page:
+            items = await page
+            after = next_page(args, after, items)
+            page = create_task(fetch(*fetch_args, after)) if after is not None else None
+
+            for item in items:
+                yield item
+
+    finally:
+        if page:
+            page.cancel()
+
+
+def iter_issues(args: Namespace, connection: AsyncConnection, prj: str, query: str = '') -> AsyncIterator:
+    """
+    It yields the issues of the given project matching the given query, fetching them in pages of args.page_size.
+
+    :param args:        The namespace with parsed command line arguments.
+    :type args:         Namespace.
+
+    :param connection:  The connection to the server.
+    :type connection:   AsyncConnection.
+
+    :param prj:         The project identifier.
+    :type prj:          str.
+
+    :param query:       The YouTrack search query the issues must match, empty for all the issues.
+    :type query:        str.
+
+    :return: See description.
+    :rtype: AsyncIterator.
+    """
+    return iter_pages(args, fetch_issues_page, args, connection, prj, query)
+
+
+async def iter_named_issues(args: Namespace, connection: AsyncConnection, prj: str) -> AsyncIterator:
+    """
+    It yields the issues of the given project given with args.iid and matching args.query, as
+    backup.iter_named_issues does. The batches of identifiers are requested concurrently.
+
+    :param args:        The namespace with parsed command line arguments.
+    :type args:         Namespace.
+
+    :param connection:  The connection to the server.
+    :type connection:   AsyncConnection.
+
+    :param prj:         The project identifier.
+    :type prj:          str.
+
+    :return: See description.
+    :rtype: AsyncIterator.
+    """
+    ids = requested_issues(args, prj)
+    queries = [search_query(args, ids_query(ids[n:n + args.page_size])) for n in range(0, len(ids), args.page_size)]
+    batches = [create_task(fetch_issues_page(args, connection, prj, query, 0)) for query in queries]
+
+    try:
+        for batch in batches:
+            for issue in await batch:
+                yield issue
+
+    finally:
+        for batch in batches:
+            batch.cancel()
+
+
+async def iter_flushed(issues: AsyncIterator) -> AsyncIterator:
+    """
+    It yields the given issues followed by None, which flushes the last batch of issues.
+
+    :param issues:  The issues.
+    :type issues:   AsyncIterator.
+
+    :return: See description.
+    :rtype: AsyncIterator.
+    """
+    async for issue in issues:
+        yield issue
+    yield None
+
+
+async def iter_changed_issues(args: Namespace, connection: AsyncConnection, prj: str, run: Run) -> AsyncIterator:
+    """
+    It yields the issues of the given project that must be archived again according to the manifest, as
+    backup.iter_changed_issues does.
+
+    :param args:        The namespace with parsed command line arguments.
+    :type args:         Namespace.
+
+    :param connection:  The connection to the server.
+    :type connection:   AsyncConnection.
+
+    :param prj:         The project identifier.
+    :type prj:          str.
+
+    :param run:         The run.
+    :type run:          Run.
+
+    :return: See description.
+    :rtype: AsyncIterator.
+    """
+    issue_ids = [stamp.id async for stamp in iter_pages(args, fetch_issue_stamps_page, args, connection, prj)]
+    missing = run.missing(prj, issue_ids)
+
+    async for issue in iter_issues(args, connection, prj, run.changed_query()):
+        missing.discard(issue.id)
+        if not run.is_current(prj, issue):
+            yield issue
+
+    for issue_id in sorted(missing):
+        with metrics.timer('metadata', prj):
+            issue = await connection.getIssue(issue_id)
+        yield issue
+
+
+async def fetch_work_items(connection: AsyncConnection, query: str) -> List[Dict[str, Any]]:
+    """
+    It fetches the work items of the issues matching the given query, as backup.fetch_extras does.
+
+    :param connection:  The connection to the server.
+    :type connection:   AsyncConnection.
+
+    :param query:       The YouTrack search query.
+    :type query:        str.
+
+    :return: See description.
+    :rtype: List[Dict[str, Any]].
+    """
+    work_items, params = [], work_items_request(query, [], None)
+    while params:
+        page = await connection.getJson('/api/workItems', params)
+        work_items.extend(page)
+        params = work_items_request(query, work_items, page)
+    return work_items
+
+
+async def fetch_activities(connection: AsyncConnection, query: str) -> List[Dict[str, Any]]:
+    """
+    It fetches the activities of the issues matching the given query, as backup.fetch_extras does.
+
+    :param connection:  The connection to the server.
+    :type connection:   AsyncConnection.
+
+    :param query:       The YouTrack search query.
+    :type query:        str.
+
+    :return: See description.
+    :rtype: List[Dict[str, Any]].
+    """
+    activities, params = [], activities_request(query, None)
+    while params:
+        page = await connection.getJson('/api/activitiesPage', params)
+        activities.extend(page.get('activities') or [])
+        params = activities_request(query, page)
+    return activities
+
+
+async def fetch_extras(connection: AsyncConnection, prj: str, issue_ids: List[str]) -> Dict[str, Dict[str, List[Any]]]:
+    """
+    It fetches the extra data of the issues with the given identifiers as backup.fetch_extras does, requesting the
+    comments, links and tags, the work items and the activities concurrently.
+
+    :param connection:  The connection to the server.
+    :type connection:   AsyncConnection.
+
+    :param prj:         The project identifier.
+    :type prj:          str.
+
+    :param issue_ids:   The issue identifiers.
+    :type issue_ids:    List[str].
+
+    :return: See description.
+    :rtype: Dict[str, Dict[str, List[Any]]].
+    """
+    query = ids_query(issue_ids)
+
+    with metrics.timer('metadata', prj):
+        issues, work_items, activities = await gather(
+            connection.getJson('/api/issues', {'query': query, 'fields': ISSUE_EXTRA_FIELDS,
+                                               '$top': str(len(issue_ids))}),
+            fetch_work_items(connection, query),
+            fetch_activities(connection, query),
+        )
+
+    return group_extras(issue_ids, issues, work_items, activities)
+
+
+async def download_attachment(connection: AsyncConnection, prj: str, attachment: Attachment,
+                              hold: Callable[[int, bool], Awaitable[None]]) -> Tuple[IO[bytes], Opt[str]]:
+    """
+    It downloads the content of the given attachment, accounting it to the download phase.
+
+    :param connection:  The connection to the server.
+    :type connection:   AsyncConnection.
+
+    :param prj:         The project identifier.
+    :type prj:          str.
+
+    :param attachment:  The attachment.
+    :type attachment:   Attachment.
+
+    :param hold:        The coroutine function holding bytes of the budget, as taken by getAttachmentContent.
+    :type hold:         Callable[[int, bool], Awaitable[None]].
+
+    :return: The content rewound and its declared length, None when unknown.
+    :rtype: Tuple[IO[bytes], Opt[str]].
+    """
+    with metrics.timer('download', prj) as sample:
+        content, length = await connection.getAttachmentContent(attachment.url, hold)
+        sample.size = content.seek(0, SEEK_END)
+        content.seek(0)
+    return content, length
+
+
+async def backup_issue(connection: AsyncConnection, issue: Issue, extras: Dict[str, List[Any]], output: Output,
+                       manifest: Manifest, store: Opt[BlobStore], budget: AsyncByteBudget, logger: Any) -> bool:
+    """
+    It downloads concurrently the attachments of the given issue not stored yet, then archives the issue with the
+    given extra data through archive_issue in a worker thread. The declared length of each attachment is held from
+    the given budget before its content is read, as download_issue does: the first bytes held by the issue wait for
+    the budget, the others do not, and all of them are given back once the issue is archived. Any failure is logged
+    and reported without being raised.
+
+    :param connection:  The connection to the server.
+    :type connection:   AsyncConnection.
+
+    :param issue:       The issue to backup.
+    :type issue:        Issue.
+
+    :param extras:      The extra data of the issue by kind, as returned by group_extras.
+    :type extras:       Dict[str, List[Any]].
+
+    :param output:      The output the archive is stored into.
+    :type output:       Output.
+
+    :param manifest:    The manifest the archived issue is recorded into.
+    :type manifest:     Manifest.
+
+    :param store:       The blob store attachments are stored into, None to embed them into the archive.
+    :type store:        Opt[BlobStore].
+
+    :param budget:      The budget of the downloaded bytes not archived yet.
+    :type budget:       AsyncByteBudget.
+
+    :param logger:      The logger instance object.
+    :type logger:       Logger.
+
+    :return: It returns True upon success, False otherwise.
+    :rtype: bool.
+    """
+    lock, held = Lock(), 0
+
+    async def hold(size: int, wait: bool) -> None:
+        nonlocal held
+        # The attachments downloaded concurrently wait in turn, so that only the first bytes held wait for the budget
+        async with lock:
+            await budget.acquire(size, wait=wait and not held)
+            held += size
+
+    try:
+        prj, name = issue.projectShortName, f'{issue.id}.zip'
+
+        # Acquires some issue metadata
+        logger.info(f'\nIssue: {issue.id} {issue.summary}')
+
+        with metrics.timer('metadata', prj):
+            attachments = await connection.getAttachments(issue.id)
+        pending = [a for a in attachments if not store or not store.lookup(a)]
+        results = await gather(*(download_attachment(connection, prj, a, hold) for a in pending),
+                               return_exceptions=True)
+
+        try:
+            for result in results:
+                if isinstance(result, BaseException):
+                    raise result
+            contents = {a.id: result for a, result in zip(pending, results)}
+            await to_thread(archive_issue, issue, attachments, extras, partial(downloaded, contents), output, store,
+                            logger)
+
+        finally:
+            for result in results:
+                if not isinstance(result, BaseException):
+                    result[0].close()
+
+        digest = await to_thread(output.digest, name, prj)
+        manifest.record(issue, [a.id for a in attachments], output.size(name, prj), digest)
+        metrics.issue(prj)
+        return True
+
+    except Exception as e:
+        logger.error(f'Issue {issue.id} failed: {format_exc()}')
+        return False
+
+    finally:
+        await budget.release(held)
+
+
+async def collect(tasks: Set[Task]) -> int:
+    """
+    It waits for at least one of the given tasks to complete, removes the completed ones from the set and returns the
+    number of failed issue backups among them.
+
+    :param tasks:   The set of pending tasks running backup_issue.
+    :type tasks:    Set[Task].
+
+    :return: See description.
+    :rtype: int.
+    """
+    done, _ = await wait(tasks, return_when=FIRST_COMPLETED)
+    tasks.difference_update(done)
+    return sum(1 for t in done if not t.result())
+
+
+async def backup(args: Namespace, logger: Any, interrupted: Event) -> None:
+    """
+    It performs issues backup according to the given arguments, as backup.backup does. At most args.jobs issues are
+    backed up concurrently, over at most args.connections connections, and the downloaded bytes not archived yet are
+    bounded by args.buffer_budget MiB.
+
+    :param args:        The namespace with parsed command line arguments.
+    :type args:         Namespace.
+
+    :param logger:      The logger instance object.
+    :type logger:       Logger.
+
+    :param interrupted: The event set on interrupt, after which no more issues are started.
+    :type interrupted:  Event.
+
+    :return: None.
+    :rtype: None.
+    """
+    run = Run(args, interrupted, logger)
+    budget = AsyncByteBudget(args.buffer_budget << 20)
+    tasks = set()
+
+    # An issue may list its attachments while another downloads them, certificates are not verified as by youtrack
+    connector = TCPConnector(limit=args.connections or 2 * args.jobs + 1, ssl=False)
+
+    async with ClientSession(connector=connector) as session:
+        connection = AsyncConnection(session, args.url, args.token, args.retries, args.backoff)
+
+        try:
+
+            try:
+                # Only the requested projects are fetched
+                prjs = requested_projects(args)
+                if prjs is None:
+                    with metrics.timer('listing'):
+                        prjs = await connection.getProjectIds()
+
+                # Iterates over projects
+                for prj in prjs:
+
+                    if interrupted.is_set():
+                        break
+
+                    # Acquiring project data
+                    try:
+                        with metrics.timer('metadata', prj):
+                            project = await connection.getProject(prj)
+                    except YouTrackException as e:
+                        logger.warning(f'The `{prj}` project cannot be fetched: {e}')
+                        continue
+
+                    logger.info(f'\nProject: {project.name}')
+                    await to_thread(run.archive_project, prj, project)
+
+                    # Iterates over the requested issues, or over issues page by page
+                    if args.iid:
+                        issues = iter_named_issues(args, connection, prj)
+                    elif run.incremental:
+                        issues = iter_changed_issues(args, connection, prj, run)
+                    else:
+                        issues = iter_issues(args, connection, prj, search_query(args))
+
+                    async for issue in iter_flushed(issues):
+
+                        if interrupted.is_set():
+                            break
+
+                        # The archives completed by the resumed run are verified against their digest
+                        batch = await to_thread(run.queue, prj, issue) if run.resume else run.queue(prj, issue)
+                        if not batch:
+                            continue
+
+                        try:
+                            extras = await fetch_extras(connection, prj, [i.id for i in batch])
+                        except Exception as e:
+                            logger.error(f'Extra data of {len(batch)} issues failed: {format_exc()}')
+                            run.failures += len(batch)
+                            continue
+
+                        for queued in batch:
+
+                            if interrupted.is_set():
+                                break
+
+                            # Bounds the number of issues in flight
+                            while len(tasks) >= args.jobs:
+                                run.failures += await collect(tasks)
+
+                            tasks.add(create_task(backup_issue(connection, queued, extras[queued.id], run.output,
+                                                               run.manifest, run.store, budget, logger)))
+
+            finally:
+                # Drains the remaining issues
+                while tasks:
+                    run.failures += await collect(tasks)
+
+            run.finish()
+
+        except Exception as e:
+            logger.error(f'{format_exc()}')
+            run.manifest.save()
+
+        finally:
+            run.close()
@@ -3,30 +3,100 @@ It allows custom selective YouTrack project's issue backup.
 """
 
 from argparse import ArgumentParser, Namespace
+from asyncio import run
 from colorama import Fore, Style, init as colorama_init, AnsiToWin32
 from timeit import timeit
 from logging import NOTSET, INFO, WARNING, ERROR, DEBUG
 from logging import getLogRecordFactory, setLogRecordFactory, basicConfig, getLogger, LogRecord
 from os.path import basename
 from platform import system as system_platform
-from signal import signal, SIGINT
+from signal import signal, SIGINT, SIG_IGN
 from sys import argv, stdout
-from typing import Any, Dict, List, Optional as Opt
+from typing import Any, Callable, ContextManager, Dict, IO, Iterable, Iterator, List, NamedTuple, Set, Tuple
+from typing import Optional as Opt
+from contextlib import contextmanager
+from functools import partial
+from itertools import chain
 from types import FrameType
-from youtrack.connection import Connection as yt
-from zipfile import ZipFile, ZIP_DEFLATED
-from tempfile import mkdtemp
-from shutil import move, rmtree
-from os import unlink, makedirs
-from json import dumps
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import get_context
+from queue import Queue
+from shutil import copyfileobj
+from threading import Event, Lock, Thread
+from zipfile import ZipFile, ZipInfo, ZIP_STORED, ZIP_DEFLATED, ZIP_BZIP2, ZIP_LZMA, ZIP64_LIMIT
+from zlib import compress
+from time import time, strftime, gmtime, perf_counter
+from hashlib import sha256
+from importlib.util import find_spec
+from uuid import uuid4
+from os import unlink, makedirs, replace, fsync, cpu_count, _exit
+from json import dumps, loads
 from pathlib import Path
+from tempfile import NamedTemporaryFile, SpooledTemporaryFile
+from fingerprint import FINGERPRINT_NAME, make_fingerprint
+from metrics import metrics
+from pack import PackReader, PackWriter, PackError
+from transport import ByteBudget, ConnectionPool
 from traceback import format_exc
+from youtrack import YouTrackException
 
 
 major = 1
 minor = 0
 fixes = 0
 
+# The size of the chunks attachments are streamed with
+CHUNK_SIZE = 1 << 20
+
+# The size above which archives built in memory are moved to disk
+SPOOL_SIZE = 8 << 20
+
+# The compression methods selectable from command line
+CODECS = dict(store=ZIP_STORED, deflate=ZIP_DEFLATED, bzip2=ZIP_BZIP2, lzma=ZIP_LZMA)
+
+# The extensions of file formats which are already compressed
+COMPRESSED_EXTENSIONS = {
+    '.7z', '.aac', '.avi', '.bz2', '.docx', '.flac', '.gif', '.gz', '.heic', '.jar', '.jpeg', '.jpg', '.m4a', '.mkv',
+    '.mov', '.mp3', '.mp4', '.odp', '.ods', '.odt', '.ogg', '.pdf', '.png', '.pptx', '.rar', '.tgz', '.webm', '.webp',
+    '.xlsx', '.xz', '.zip', '.zst',
+}
+
+# The leading bytes of file formats which are already compressed
+COMPRESSED_MAGICS = (
+    b'\x89PNG', b'\xff\xd8\xff', b'GIF8', b'PK\x03\x04', b'\x1f\x8b', b'BZh', b'\xfd7zXZ', b'7z\xbc\xaf\x27\x1c',
+    b'Rar!', b'\x28\xb5\x2f\xfd', b'%PDF', b'OggS', b'ID3', b'fLaC', b'\x1a\x45\xdf\xa3',
+)
+
+# The earliest date a zip entry can hold, given to the entries without a date of their own
+EPOCH = (1980, 1, 1, 0, 0, 0)
+
+# The size of the sample trial compressed and the ratio above which it is deemed incompressible
+TRIAL_SIZE = 1 << 16
+TRIAL_RATIO = 0.9
+
+# The data of an issue besides its fields, each stored as <ID>.<kind>.json next to the issue
+EXTRAS = ('comments', 'links', 'tags', 'work_items', 'history')
+
+# The number of work items or activities requested to the REST API at once
+EXTRAS_PAGE_SIZE = 500
+
+# The fields of the issues, work items and activities requested to the REST API
+ISSUE_EXTRA_FIELDS = 'idReadable,comments(id,text,created,updated,deleted,author(login)),' \
+                     'links(direction,linkType(name,sourceToTarget,targetToSource),issues(idReadable)),tags(name)'
+WORK_ITEM_FIELDS = 'id,issue(idReadable),author(login),creator(login),date,created,updated,duration(minutes),text,' \
+                   'type(name)'
+ACTIVITY_FIELDS = 'activities(id,timestamp,author(login),category(id),field(name),' \
+                  'target(idReadable,issue(idReadable)),added(id,name,login,text,idReadable,presentation),' \
+                  'removed(id,name,login,text,idReadable,presentation)),afterCursor,hasAfter'
+
+# The categories of the activities making the change history of an issue
+ACTIVITY_CATEGORIES = 'IssueCreatedCategory,SummaryCategory,DescriptionCategory,CustomFieldCategory,' \
+                      'CommentsCategory,LinksCategory,TagsCategory,AttachmentsCategory,WorkItemCategory,' \
+                      'IssueResolvedCategory,ProjectCategory'
+
+# Set on the first interrupt: no more issues are started, those in progress are completed
+interrupted = Event()
+
 
 class LoggingRecordFactoryColorama:
     """
@@ -135,7 +205,8 @@ def version() -> str:
 
 def sigint_handler(signum: int, frame: FrameType) -> None:
     """
-    The handler registered for SIGINT signal handling. It terminates the application.
+    The handler registered for SIGINT signal handling. The first interrupt stops the backup once the issues in progress
+    are archived, leaving a journal the backup can be resumed from; the second one terminates the application at once.
 
     :param signum:  The signal.
     :type signum:   int.
@@ -148,195 +219,2271 @@ def sigint_handler(signum: int, frame: FrameType) -> None:
     """
 
     _, _ = frame, signum
-    getLogger(__name__).warning('Interrupt received..')
-    exit(0)
 
+    if interrupted.is_set():
+        getLogger(__name__).warning('Interrupt received again, exiting..')
+        _exit(1)
+
+    interrupted.set()
+    getLogger(__name__).warning('Interrupt received, completing the issues in progress (again to exit at once)..')
+
+
+def fetch_issues_page(args: Namespace, pool: ConnectionPool, prj: str, query: str, after: int) -> List[Any]:
+    """
+    It fetches a single page of at most args.page_size issues of the given project matching the given query, starting
+    from the given offset.
+
+    :param args:    The namespace with parsed command line arguments.
+    :type args:     Namespace.
+
+    :param pool:    The pool of connections to the server.
+    :type pool:     ConnectionPool.
+
+    :param prj:     The project identifier.
+    :type prj:      str.
+
+    :param query:   The YouTrack search query the issues must match, empty for all the issues.
+    :type query:    str.
+
+    :param after:   The number of issues to skip.
+    :type after:    int.
+
+    :return: See description.
+    :rtype: List[Issue].
+    """
+    with pool.connection() as connection, metrics.timer('listing', prj):
+        return connection.getIssues(prj, query, after, args.page_size)
+
+
+def fetch_issue_stamps_page(args: Namespace, pool: ConnectionPool, prj: str, after: int) -> List[Any]:
+    """
+    It fetches a single page of at most args.page_size issues of the given project starting from the given offset,
+    carrying only their identifier and their last update timestamp.
+
+    :param args:    The namespace with parsed command line arguments.
+    :type args:     Namespace.
+
+    :param pool:    The pool of connections to the server.
+    :type pool:     ConnectionPool.
 
-def backup(args, connection, logger):
+    :param prj:     The project identifier.
+    :type prj:      str.
+
+    :param after:   The number of issues to skip.
+    :type after:    int.
+
+    :return: See description.
+    :rtype: List[Issue].
+    """
+    query = search_query(args, f'project: {{{prj}}}')
+    with pool.connection() as connection, metrics.timer('listing', prj):
+        return connection.getAllIssues(query, after, args.page_size, withFields=('updated',))
+
+
+def iter_pages(args: Namespace, fetch: Callable[..., List[Any]], *fetch_args: Any) -> Iterator[Any]:
     """
-    It performs issues backup according to the given arguments.
+    It yields the items returned by fetch(*fetch_args, after) page by page, until a page shorter than args.page_size
+    is returned. While the items of a page are consumed the following page is already being fetched in background,
+    so that downstream work can start with the first page and memory holds at most two pages whatever the size of
+    the project.
 
     :param args:        The namespace with parsed command line arguments.
     :type args:         Namespace.
 
-    :param connection:  The youtrack connection instance object.
-    :type connection:   Connection.
+    :param fetch:       The function fetching a single page given its offset as last argument.
+    :type fetch:        Callable[..., List[Any]].
 
-    :param logger:      The logger instance object.
-    :type logger:       Logger.
+    :param fetch_args:  The leading arguments of fetch.
+    :type fetch_args:   Any.
 
-    :return: None.
-    :rtype: None.
+    :return: See description.
+    :rtype: Iterator[Any].
     """
+    with ThreadPoolExecutor(max_workers=1) as prefetcher:
+        after = 0
+        page = prefetcher.submit(fetch, *fetch_args, after)
 
-    # Generates a temporary directory
-    tempdir = Path(mkdtemp())
+        while page:
+            items = page.result()
+            after = next_page(args, after, items)
+            page = prefetcher.submit(fetch, *fetch_args, after) if after is not None else None
 
-    try:
+            yield from items
 
-        # Iterates over projects
-        for prj in connection.getProjectIds():
 
-            # Acquiring project data
-            project = connection.getProject(prj)
+def next_page(args: Namespace, after: int, items: List[Any]) -> Opt[int]:
+    """
+    It returns the offset of the page following the given page of items, fetched from the given offset, None when it
+    is the last one: a page shorter than args.page_size is the last one.
 
-            # Skips not requested projects
-            if args.prjs and project and project.id not in args.prjs:
-                continue
+    :param args:    The namespace with parsed command line arguments.
+    :type args:     Namespace.
 
-            logger.info(f'\nProject: {project.name}')
+    :param after:   The offset the page was fetched from.
+    :type after:    int.
 
-            # Writing project data
-            prj_name = str(tempdir / f'{prj}.json')
-            with open(prj_name, 'w') as f:
-                logger.debug(f'Writing project data: {str(prj_name)}')
-                f.write(dumps(project.to_dict()))
+    :param items:   The items of the page.
+    :type items:    List[Any].
 
-            # Archiving project data
-            z_name = str(tempdir / f'{prj}.zip')
-            with ZipFile(z_name, 'w', ZIP_DEFLATED, compresslevel=9) as z:
-                logger.info(f'Project archive: {Path(z_name).parts[-1]}')
-                z.write(filename=prj_name, arcname=f'{prj}.json')
+    :return: See description.
+    :rtype: Opt[int].
+    """
+    return after + len(items) if len(items) == args.page_size else None
 
-            # Moves the zip in the output folder
-            move(z_name, str(args.output / f'{prj}.zip'))
 
-            # Filters on project names
-            if args.prjs and prj not in args.prjs:
-                logger.debug(f'Skipped project: {prj}')
-                continue
+def iter_issues(args: Namespace, pool: ConnectionPool, prj: str, query: str = '') -> Iterator[Any]:
+    """
+    It yields the issues of the given project matching the given query, fetching them in pages of args.page_size.
 
-            # Gets the number of issues [otherwise only 10 are downloaded by default]
-            no_issue = connection.getNumberOfIssues(filter=prj)
+    :param args:    The namespace with parsed command line arguments.
+    :type args:     Namespace.
 
-            # Iterates over issues
-            for issue in connection.getIssues(prj, '', '', max=no_issue):
+    :param pool:    The pool of connections to the server.
+    :type pool:     ConnectionPool.
 
-                # Filters on issue ids
-                if args.iid and issue.id not in args.iid:
-                    logger.debug(f'Skipped issue: {issue.id}')
-                    continue
+    :param prj:     The project identifier.
+    :type prj:      str.
 
-                # Acquires some issue metadata
-                logger.info(f'\nIssue: {issue.id} {issue.summary}')
-
-                names = []
-
-                # Iterates over attachments
-                for idx, attachment in enumerate(issue.getAttachments()):
-                    # Acquires some attachment metadata
-                    filename = '_'.join([issue.id, attachment.name])
-                    logger.info(f'Attachment #{idx}: {filename}')
-
-                    # Write the attachment on disk
-                    names.append(str(tempdir / filename))
-                    with open(names[-1], 'wb') as f:
-                        logger.debug(f'Writing content: {Path(f.name).parts[-1]}')
-                        f.write(attachment.getContent().read())
-
-                    # Writes attachment metadata on disk
-                    names.append(str(tempdir / f'{filename}.json'))
-                    with open(names[-1], 'w') as f:
-                        logger.debug(f'Writing metadata: {Path(f.name).parts[-1]}')
-                        f.write(dumps(attachment.to_dict()))
-
-                # Writes the issue data on disk
-                names.append(str(tempdir / f'{issue.id}.json'))
-                with open(names[-1], 'w') as f:
-                    logger.debug(f'Writing issue_path: {Path(f.name).parts[-1]}')
-                    f.write(dumps(issue.to_dict()))
-
-                # Archiving issue data
-                z_name = str(tempdir / f'{issue.id}.zip')
-                with ZipFile(z_name, 'w', ZIP_DEFLATED, compresslevel=9) as z:
-                    logger.info(f'Backup archive: {Path(z_name).parts[-1]}')
-                    for name in names:
-                        z.write(filename=name, arcname=Path(name).parts[-1])
-                        unlink(name)
-
-                # Moves the zip in the output folder
-                move(z_name, str(args.output / f'{issue.id}.zip'))
+    :param query:   The YouTrack search query the issues must match, empty for all the issues.
+    :type query:    str.
 
-    except Exception as e:
-        logger.error(f'{format_exc()}')
+    :return: See description.
+    :rtype: Iterator[Issue].
+    """
+    return iter_pages(args, fetch_issues_page, args, pool, prj, query)
 
-    finally:
 
-        # Removes the empty temporary folder
-        rmtree(tempdir)
+def search_query(args: Namespace, condition: str = '') -> str:
+    """
+    It returns the YouTrack search query matching the issues that match both args.query, if given, and the given
+    condition.
+
+    :param args:        The namespace with parsed command line arguments.
+    :type args:         Namespace.
 
+    :param condition:   The condition, empty for none.
+    :type condition:    str.
 
-def usage(args: List[str]) -> Namespace:
+    :return: See description.
+    :rtype: str.
     """
-    It parses the given args (usually from sys.argv) and checks they conform to the rules of the application. It then
-    returns a namedtuple with a field for a any given or defaulted argument.
+    return ' '.join(c for c in (f'({args.query})' if args.query else '', condition) if c)
 
-    :param args:    The command line arguments to be parsed.
-    :type args:     List[str].
 
-    :return: See description.
-    :rtype: NamedTuple.
+def requested_projects(args: Namespace) -> Opt[List[str]]:
     """
-    helps = dict(
-        description=__doc__,
-        url='The URL of the YouTrack instance.',
-        token='The to use with the given instance.',
-        output='The destination folder.',
-        verbose='It shows more verbose output.',
-        projects='When given only the issue of the given projects are considered.',
-        issueids='When given only the issues with the given id are considered.',
-    )
+    It returns the identifiers of the projects the backup is restricted to: those given with args.prjs, otherwise the
+    projects of the issues given with args.iid. None when every project of the server is backed up.
 
-    parser = ArgumentParser(description=helps['description'])
+    :param args:    The namespace with parsed command line arguments.
+    :type args:     Namespace.
 
-    # Mandatory arguments
-    parser.add_argument('url', help=helps['url'])
-    parser.add_argument('token', help=helps['token'])
-    parser.add_argument('output', help=helps['output'])
+    :return: See description.
+    :rtype: Opt[List[str]].
+    """
+    if args.prjs:
+        return sorted(args.prjs)
+    if args.iid:
+        return sorted(set(i.rpartition('-')[0] for i in args.iid))
+    return None
 
-    # Options
-    parser.add_argument('-v', '--verbose', dest='verbose', action='store_true', default=False, help=helps['verbose'])
-    parser.add_argument('-p', '--projects', dest='prjs', nargs='+', default=[], help=helps['projects'])
-    parser.add_argument('-i', '--issue-ids', dest='iid', nargs='+', default=[], help=helps['issueids'])
 
-    # Parsing
-    args = parser.parse_args(args)
+def requested_issues(args: Namespace, prj: str) -> List[str]:
+    """
+    It returns the identifiers given with args.iid that belong to the given project, in numeric order.
 
-    # Checking the output directory
-    args.output = Path(args.output)
-    if not args.output.exists():
-        makedirs(str(args.output), exist_ok=True)
+    :param args:    The namespace with parsed command line arguments.
+    :type args:     Namespace.
 
-    # Making sets for faster belonging check
-    args.prjs = set(args.prjs) if args.prjs else args.prjs
-    args.iid = set(args.iid) if args.iid else args.iid
+    :param prj:     The project identifier.
+    :type prj:      str.
 
-    return args
+    :return: See description.
+    :rtype: List[str].
+    """
+    # Within a project the shorter number is the lower one
+    return sorted((i for i in args.iid if i.rpartition('-')[0] == prj), key=lambda i: (len(i), i))
 
 
-def main(args: Namespace) -> None:
+def iter_named_issues(args: Namespace, pool: ConnectionPool, prj: str) -> Iterator[Any]:
     """
-    It starts the application.
+    It yields the issues of the given project given with args.iid and matching args.query, if given. They are
+    requested by batches of args.page_size identifiers, instead of listing the whole project.
 
-    :param args:    The parsed command line arguments as returned by usage();
+    :param args:    The namespace with parsed command line arguments.
     :type args:     Namespace.
 
-    :return: None.
-    :rtype: None.
+    :param pool:    The pool of connections to the server.
+    :type pool:     ConnectionPool.
+
+    :param prj:     The project identifier.
+    :type prj:      str.
+
+    :return: See description.
+    :rtype: Iterator[Issue].
     """
-    logger = getLogger(__name__)
-    logger.setLevel(INFO if not args.verbose else DEBUG)
+    ids = requested_issues(args, prj)
 
-    logger.info(f'TARGET: `{args.url}`')
-    logger.debug(f'TOKEN:  `{args.token}`')
-    logger.info(f'OUTPUT: `{args.output}`')
+    for n in range(0, len(ids), args.page_size):
+        yield from fetch_issues_page(args, pool, prj, search_query(args, ids_query(ids[n:n + args.page_size])), 0)
 
-    try:
-        connection = yt(args.url, token=args.token)
-        backup(args, connection, logger)
-    except Exception as e:
-        logger.error(str(e))
-        exit(1)
+
+def ids_query(issue_ids: List[str]) -> str:
+    """
+    It returns the YouTrack search query matching the issues with the given identifiers.
+
+    :param issue_ids:   The issue identifiers.
+    :type issue_ids:    List[str].
+
+    :return: See description.
+    :rtype: str.
+    """
+    return f'issue id: {", ".join(issue_ids)}'
+
+
+def group_extras(issue_ids: List[str], issues: List[Dict[str, Any]], work_items: List[Dict[str, Any]],
+                 activities: List[Dict[str, Any]]) -> Dict[str, Dict[str, List[Any]]]:
+    """
+    It returns by issue identifier and kind the extra data of the issues with the given identifiers, out of the
+    issues, work items and activities the REST API answered for all of them at once. An issue with no data of a kind
+    gets an empty list.
+
+    :param issue_ids:   The issue identifiers.
+    :type issue_ids:    List[str].
+
+    :param issues:      The issues with their comments, links and tags.
+    :type issues:       List[Dict[str, Any]].
+
+    :param work_items:  The work items of the issues.
+    :type work_items:   List[Dict[str, Any]].
+
+    :param activities:  The activities of the issues and of their comments.
+    :type activities:   List[Dict[str, Any]].
+
+    :return: See description.
+    :rtype: Dict[str, Dict[str, List[Any]]].
+    """
+    extras = {issue_id: {kind: [] for kind in EXTRAS} for issue_id in issue_ids}
+
+    for issue in issues:
+        if issue.get('idReadable') in extras:
+            for kind in ('comments', 'links', 'tags'):
+                extras[issue['idReadable']][kind] = issue.get(kind) or []
+
+    for item in work_items:
+        issue_id = (item.get('issue') or {}).get('idReadable')
+        if issue_id in extras:
+            extras[issue_id]['work_items'].append(item)
+
+    for activity in activities:
+        # The target is the issue itself, or one of its comments
+        target = activity.get('target') or {}
+        issue_id = target.get('idReadable') or (target.get('issue') or {}).get('idReadable')
+        if issue_id in extras:
+            extras[issue_id]['history'].append(activity)
+
+    return extras
+
+
+def fetch_extras(pool: ConnectionPool, prj: str, issue_ids: List[str]) -> Dict[str, Dict[str, List[Any]]]:
+    """
+    It fetches the comments, links, tags, work items and change history of the issues with the given identifiers
+    through the REST API, and returns them as group_extras does. The number of requests does not depend on the
+    number of issues: one for the comments, links and tags, and one per EXTRAS_PAGE_SIZE work items or activities.
+
+    :param pool:        The pool of connections to the server.
+    :type pool:         ConnectionPool.
+
+    :param prj:         The project identifier.
+    :type prj:          str.
+
+    :param issue_ids:   The issue identifiers.
+    :type issue_ids:    List[str].
+
+    :return: See description.
+    :rtype: Dict[str, Dict[str, List[Any]]].
+    """
+    query = ids_query(issue_ids)
+
+    with pool.connection() as connection, metrics.timer('metadata', prj):
+        issues = connection.getJson('/api/issues', {
+            'query': query, 'fields': ISSUE_EXTRA_FIELDS, '$top': str(len(issue_ids)),
+        })
+
+        work_items, params = [], work_items_request(query, [], None)
+        while params:
+            page = connection.getJson('/api/workItems', params)
+            work_items.extend(page)
+            params = work_items_request(query, work_items, page)
+
+        activities, params = [], activities_request(query, None)
+        while params:
+            page = connection.getJson('/api/activitiesPage', params)
+            activities.extend(page.get('activities') or [])
+            params = activities_request(query, page)
+
+    return group_extras(issue_ids, issues, work_items, activities)
+
+
+def work_items_request(query: str, work_items: List[Dict[str, Any]], page: Opt[List[Any]]) -> Opt[Dict[str, str]]:
+    """
+    It returns the parameters of the request of the next page of the work items of the issues matching the given
+    query, None when the given last page answered is the last one. Work items are paged by offset, a page shorter
+    than EXTRAS_PAGE_SIZE is the last one.
+
+    :param query:       The YouTrack search query.
+    :type query:        str.
+
+    :param work_items:  The work items fetched so far.
+    :type work_items:   List[Dict[str, Any]].
+
+    :param page:        The last page answered, None before the first request.
+    :type page:         Opt[List[Any]].
+
+    :return: See description.
+    :rtype: Opt[Dict[str, str]].
+    """
+    if page is not None and len(page) < EXTRAS_PAGE_SIZE:
+        return None
+    return {'query': query, 'fields': WORK_ITEM_FIELDS, '$skip': str(len(work_items)), '$top': str(EXTRAS_PAGE_SIZE)}
+
+
+def activities_request(query: str, page: Opt[Dict[str, Any]]) -> Opt[Dict[str, str]]:
+    """
+    It returns the parameters of the request of the next page of the activities of the issues matching the given
+    query, None when the given last page answered is the last one. Activities are paged by cursor, until the server
+    has no more.
+
+    :param query:   The YouTrack search query.
+    :type query:    str.
+
+    :param page:    The last page answered, None before the first request.
+    :type page:     Opt[Dict[str, Any]].
+
+    :return: See description.
+    :rtype: Opt[Dict[str, str]].
+    """
+    if page is not None and not page.get('hasAfter'):
+        return None
+    params = {'issueQuery': query, 'categories': ACTIVITY_CATEGORIES, 'fields': ACTIVITY_FIELDS,
+              '$top': str(EXTRAS_PAGE_SIZE)}
+    if page and page.get('afterCursor'):
+        params['cursor'] = page['afterCursor']
+    return params
+
+
+class Journal:
+    """
+    It durably records the archives completed by a run into the journal of the output folder, one JSON line per project
+    or issue archive with its size and digest, appended and synced to disk as soon as the archive is complete. A run
+    interrupted, killed or failed leaves its journal behind, so that the next run can resume it by skipping the
+    archives it completed. A line torn by a crash is ignored.
+    """
+
+    file_name = 'journal.jsonl'
+
+    def __init__(self, output: Path) -> None:
+        """
+        It creates an instance of the Journal class loading the journal left in the given output folder, if any.
+
+        :param output:  The output folder.
+        :type output:   Path.
+        """
+        self.path = output / self.__class__.file_name
+        self.lock = Lock()
+        self.f = None
+        self.started = None
+        self.projects = {}
+        self.issues = {}
+
+        if self.path.exists():
+            with open(str(self.path), 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = loads(line)
+                    except ValueError:
+                        continue
+                    if 'run' in record:
+                        self.started = record['run']
+                    elif 'issue' in record:
+                        self.issues[record['issue']] = record['entry']
+                    elif 'project' in record:
+                        self.projects[record['project']] = dict(size=record['size'], digest=record['digest'])
+
+    def start(self, started: int) -> None:
+        """
+        It atomically replaces the journal with a new one for the run started at the given time.
+
+        :param started:     The start time in milliseconds of the run.
+        :type started:      int.
+
+        :return: None.
+        :rtype: None.
+        """
+        part = self.path.with_name(f'.{self.path.name}.part')
+        with open(str(part), 'w', encoding='utf-8') as f:
+            f.write(dumps(dict(run=started)) + '\n')
+            f.flush()
+            fsync(f.fileno())
+        replace(str(part), str(self.path))
+        self.f = open(str(self.path), 'a', encoding='utf-8')
+
+    def resume(self) -> None:
+        """
+        It reopens the loaded journal for the run resuming the one it comes from.
+
+        :return: None.
+        :rtype: None.
+        """
+        self.f = open(str(self.path), 'a', encoding='utf-8')
+        # Terminates the line possibly torn by a crash
+        self.write(None)
+
+    def write(self, record: Opt[Dict[str, Any]]) -> None:
+        """
+        It appends the given record to the journal and syncs it to disk, an empty line when the record is None.
+
+        :param record:  The record.
+        :type record:   Opt[Dict[str, Any]].
+
+        :return: None.
+        :rtype: None.
+        """
+        with self.lock:
+            if self.f:
+                self.f.write((dumps(record) if record is not None else '') + '\n')
+                self.f.flush()
+                fsync(self.f.fileno())
+
+    def close(self, remove: bool = False) -> None:
+        """
+        It closes the journal, removing it when the run it records does not need to be resumed.
+
+        :param remove:  Whether the journal is removed.
+        :type remove:   bool.
+
+        :return: None.
+        :rtype: None.
+        """
+        with self.lock:
+            if self.f:
+                self.f.close()
+                self.f = None
+            if remove and self.path.exists():
+                unlink(str(self.path))
+
+
+class Manifest:
+    """
+    It keeps track of the issues stored in an output folder: for each issue it records the project, the `updated`
+    timestamp, the attachment ids and the size and digest of its archive, along with the start time of the last
+    complete run. It allows later runs to fetch only what changed in the meanwhile. The issues are recorded into the
+    journal as well, whose records left by a previous run are merged on load.
+    """
+
+    file_name = 'manifest.json'
+
+    def __init__(self, output: Path) -> None:
+        """
+        It creates an instance of the Manifest class loading the manifest of the given output folder, if any.
+
+        :param output:  The output folder.
+        :type output:   Path.
+        """
+        self.output = output
+        self.path = output / self.__class__.file_name
+        self.lock = Lock()
+        self.data = dict(version=1, completed=None, issues={}, deleted={})
+
+        if self.path.exists():
+            with open(str(self.path), 'r', encoding='utf-8') as f:
+                self.data.update(loads(f.read()))
+
+        # The archives completed by a run which could not save the manifest
+        self.journal = Journal(output)
+        for issue_id, entry in self.journal.issues.items():
+            self.data['issues'][issue_id] = entry
+            self.data['deleted'].pop(issue_id, None)
+
+    @property
+    def completed(self) -> Opt[int]:
+        """
+        It returns the start time in milliseconds of the last run completed without failures, None if there is none.
+        """
+        return self.data['completed']
+
+    def issues(self, prj: str) -> Set[str]:
+        """
+        It returns the identifiers of the recorded issues belonging to the given project.
+
+        :param prj:     The project identifier.
+        :type prj:      str.
+
+        :return: See description.
+        :rtype: Set[str].
+        """
+        with self.lock:
+            return {k for k, v in self.data['issues'].items() if v['project'] == prj}
+
+    def is_current(self, issue_id: str, updated: Any, size: Opt[int]) -> bool:
+        """
+        It tells whether the archive of the given issue is recorded with the given update timestamp and is still
+        stored with the recorded size.
+
+        :param issue_id:    The issue identifier.
+        :type issue_id:     str.
+
+        :param updated:     The `updated` timestamp of the issue on the server.
+        :type updated:      Any.
+
+        :param size:        The size of the stored archive of the issue, None when it is missing.
+        :type size:         Opt[int].
+
+        :return: See description.
+        :rtype: bool.
+        """
+        with self.lock:
+            entry = self.data['issues'].get(issue_id)
+
+        return bool(entry) and entry['updated'] == str(updated) and entry['size'] == size
+
+    def record(self, issue: Any, attachments: List[str], size: int, digest: str) -> None:
+        """
+        It records the given issue as archived with the given size and digest.
+
+        :param issue:       The archived issue.
+        :type issue:        Issue.
+
+        :param attachments: The identifiers of the archived attachments.
+        :type attachments:  List[str].
+
+        :param size:        The size of the issue archive.
+        :type size:         int.
+
+        :param digest:      The digest of the issue archive.
+        :type digest:       str.
+
+        :return: None.
+        :rtype: None.
+        """
+        entry = dict(
+            project=issue.projectShortName,
+            updated=str(getattr(issue, 'updated', '')),
+            attachments=attachments,
+            size=size,
+            digest=digest,
+        )
+
+        with self.lock:
+            self.data['issues'][issue.id] = entry
+            self.data['deleted'].pop(issue.id, None)
+
+        self.journal.write(dict(issue=issue.id, entry=entry))
+
+    def record_project(self, prj: str, size: int, digest: str) -> None:
+        """
+        It records into the journal the archive of the given project as written with the given size and digest.
+
+        :param prj:     The project identifier.
+        :type prj:      str.
+
+        :param size:    The size of the project archive.
+        :type size:     int.
+
+        :param digest:  The digest of the project archive.
+        :type digest:   str.
+
+        :return: None.
+        :rtype: None.
+        """
+        self.journal.write(dict(project=prj, size=size, digest=digest))
+
+    def delete(self, issue_id: str, when: int) -> None:
+        """
+        It records the given issue as deleted from the server at the given time.
+
+        :param issue_id:    The issue identifier.
+        :type issue_id:     str.
+
+        :param when:        The time of the detection in milliseconds.
+        :type when:         int.
+
+        :return: None.
+        :rtype: None.
+        """
+        with self.lock:
+            self.data['deleted'][issue_id] = dict(when=when, **self.data['issues'].pop(issue_id))
+
+    def save(self, completed: Opt[int] = None) -> None:
+        """
+        It atomically writes the manifest inside the output folder.
+
+        :param completed:   When given, the start time in milliseconds of the run that just completed.
+        :type completed:    Opt[int].
+
+        :return: None.
+        :rtype: None.
+        """
+        with self.lock:
+            if completed is not None:
+                self.data['completed'] = completed
+            part = self.path.with_name(f'.{self.path.name}.part')
+            with open(str(part), 'w', encoding='utf-8') as f:
+                f.write(dumps(self.data, indent=1, sort_keys=True))
+            replace(str(part), str(self.path))
+
+
+class BlobStore:
+    """
+    It stores attachments inside the blobs folder of the output folder, each one named after the SHA-256 digest of
+    its content, so that an attachment shared by several issues or unchanged across runs is stored once. Its index
+    maps attachment ids to the size and digest of their content, which allows to skip downloading known attachments.
+    """
+
+    folder_name = 'blobs'
+    index_name = 'index.json'
+
+    def __init__(self, output: Path) -> None:
+        """
+        It creates an instance of the BlobStore class loading the index of the store of the given output folder, if any.
+
+        :param output:  The output folder.
+        :type output:   Path.
+        """
+        self.folder = output / self.__class__.folder_name
+        self.index_path = self.folder / self.__class__.index_name
+        self.lock = Lock()
+        self.index = {}
+
+        makedirs(str(self.folder), exist_ok=True)
+        if self.index_path.exists():
+            with open(str(self.index_path), 'r', encoding='utf-8') as f:
+                self.index = loads(f.read())
+
+    def path(self, digest: str) -> Path:
+        """
+        It returns the path of the blob with the given digest.
+
+        :param digest:  The digest of the blob in the `sha256:<hex>` form.
+        :type digest:   str.
+
+        :return: See description.
+        :rtype: Path.
+        """
+        hexdigest = digest.partition(':')[2]
+        return self.folder / hexdigest[:2] / hexdigest
+
+    def lookup(self, attachment: Any) -> Opt[Dict[str, Any]]:
+        """
+        It returns the reference to the blob of the given attachment when it is already stored, None otherwise. The
+        attachment id and size are checked against the index, and the blob against the recorded size.
+
+        :param attachment:  The attachment.
+        :type attachment:   Attachment.
+
+        :return: See description.
+        :rtype: Opt[Dict[str, Any]].
+        """
+        with self.lock:
+            entry = self.index.get(attachment.id)
+
+        if not entry:
+            return None
+
+        size = getattr(attachment, 'size', None)
+        if size is not None and int(size) != entry['size']:
+            return None
+
+        path = self.path(entry['digest'])
+        return entry if path.exists() and path.stat().st_size == entry['size'] else None
+
+    def put(self, attachment: Any, content: IO[bytes]) -> Dict[str, Any]:
+        """
+        It streams the given content of the given attachment into the store and returns the reference to its blob. The
+        content is hashed while written to a partial file, which is dropped when a blob with the same digest exists.
+
+        :param attachment:  The attachment.
+        :type attachment:   Attachment.
+
+        :param content:     The file-like object the content is read from.
+        :type content:      IO[bytes].
+
+        :return: See description.
+        :rtype: Dict[str, Any].
+        """
+        part = self.folder / f'.{uuid4().hex}.part'
+        digest = sha256()
+        size = 0
+
+        try:
+            with open(str(part), 'wb') as f:
+                for chunk in iter(lambda: content.read(CHUNK_SIZE), b''):
+                    digest.update(chunk)
+                    f.write(chunk)
+                    size += len(chunk)
+
+            entry = dict(digest=f'sha256:{digest.hexdigest()}', size=size)
+            path = self.path(entry['digest'])
+
+            if path.exists():
+                unlink(str(part))
+            else:
+                makedirs(str(path.parent), exist_ok=True)
+                replace(str(part), str(path))
+
+        except BaseException:
+            if part.exists():
+                unlink(str(part))
+            raise
+
+        with self.lock:
+            self.index[attachment.id] = entry
+
+        return entry
+
+    def save(self) -> None:
+        """
+        It atomically writes the index of the store.
+
+        :return: None.
+        :rtype: None.
+        """
+        with self.lock:
+            part = self.index_path.with_name(f'.{self.index_path.name}.part')
+            with open(str(part), 'w', encoding='utf-8') as f:
+                f.write(dumps(self.index, sort_keys=True))
+            replace(str(part), str(self.index_path))
+
+
+def is_compressible(name: str, head: bytes) -> bool:
+    """
+    It tells whether the content of the file with the given name, starting with the given head bytes, is worth being
+    compressed. Formats known to be already compressed are detected by extension or by magic bytes; for the others a
+    sample of the head is trial compressed with the fastest deflate level.
+
+    :param name:    The file name.
+    :type name:     str.
+
+    :param head:    The leading bytes of the content.
+    :type head:     bytes.
+
+    :return: See description.
+    :rtype: bool.
+    """
+    if Path(name).suffix.lower() in COMPRESSED_EXTENSIONS:
+        return False
+
+    # ISO media files (mp4, mov, heic..) carry their magic after the box size
+    if head.startswith(COMPRESSED_MAGICS) or head[4:8] == b'ftyp' or head[8:12] == b'WEBP':
+        return False
+
+    sample = head[:TRIAL_SIZE]
+    return not sample or len(compress(sample, 1)) < TRIAL_RATIO * len(sample)
+
+
+@contextmanager
+def atomic_archive(path: Path, compression: int = ZIP_DEFLATED, level: Opt[int] = None,
+                   project: Opt[str] = None) -> Iterator[ZipFile]:
+    """
+    It opens for writing the zip archive at the given path. Entries are written to a hidden partial file placed in the
+    same folder, which atomically replaces the given path only once the archive is complete. On failure the partial
+    file is removed and the exception is propagated. The writes to disk are accounted to the write phase.
+
+    :param path:        The final path of the archive.
+    :type path:         Path.
+
+    :param compression: The default compression method of the entries.
+    :type compression:  int.
+
+    :param level:       The default compression level of the entries, None for the default of the method.
+    :type level:        Opt[int].
+
+    :param project:     The project the archive is accounted to, if any.
+    :type project:      Opt[str].
+
+    :return: The archive opened for writing.
+    :rtype: Iterator[ZipFile].
+    """
+    part = path.with_name(f'.{path.name}.part')
+
+    try:
+        with metrics.metered(open(str(part), 'wb'), 'write', project) as f, \
+                ZipFile(f, 'w', compression, compresslevel=level) as z:
+            yield z
+        replace(str(part), str(path))
+
+    except BaseException:
+        if part.exists():
+            unlink(str(part))
+        raise
+
+
+def archive_entry(z: ZipFile, name: str, date_time: Tuple[int, ...], compressed: bool = True) -> ZipInfo:
+    """
+    It builds the ZipInfo of a new entry of the given archive, dated at the given date and compressed as the archive
+    is, or stored when compressed is False.
+
+    :param z:           The archive the entry will be written to.
+    :type z:            ZipFile.
+
+    :param name:        The name of the entry.
+    :type name:         str.
+
+    :param date_time:   The date of the entry as (year, month, day, hour, minute, second).
+    :type date_time:    Tuple[int, ...].
+
+    :param compressed:  Whether the entry is compressed.
+    :type compressed:   bool.
+
+    :return: See description.
+    :rtype: ZipInfo.
+    """
+    zinfo = ZipInfo(name, date_time=date_time)
+    zinfo.compress_type = z.compression if compressed else ZIP_STORED
+    # Honoured by ZipFile.open() and ZipFile.writestr()
+    zinfo._compresslevel = z.compresslevel
+    # The permissions ZipFile.writestr() gives to entries named by a string
+    zinfo.external_attr = 0o600 << 16
+    return zinfo
+
+
+def issue_date(issue: Any) -> Tuple[int, ...]:
+    """
+    It returns the date the entries of the archive of the given issue are dated at: its last update in UTC, so that
+    archiving an unchanged issue always gives the same bytes, or the earliest date a zip entry can hold when unknown.
+
+    :param issue:   The issue.
+    :type issue:    Issue.
+
+    :return: See description.
+    :rtype: Tuple[int, ...].
+    """
+    try:
+        return max(EPOCH, tuple(gmtime(int(getattr(issue, 'updated', '')) / 1000)[:6]))
+    except (TypeError, ValueError, OverflowError):
+        return EPOCH
+
+
+class Output:
+    """
+    It abstracts where archives are stored: either one zip file per archive inside the output folder, or one pack per
+    project, named <PRJ>.pack, holding the archive of the project and the archives of its issues. The archives written
+    by a run are appended to the previous version of the pack, which is rewritten with only its current archives
+    instead once more than half of it is taken by superseded ones.
+    """
+
+    def __init__(self, args: Namespace) -> None:
+        """
+        It creates an instance of the Output class according to the given arguments.
+
+        :param args:    The namespace with parsed command line arguments.
+        :type args:     Namespace.
+        """
+        self.folder = args.output
+        self.packed = args.format == 'pack'
+        self.compression = CODECS[args.compression]
+        self.level = args.level
+        self.lock = Lock()
+        self.packs = {}
+        self.previous = {}
+
+    def pack(self, prj: str) -> PackWriter:
+        """
+        It returns the pack being written for the given project, opening it on first use: the previous version of the
+        pack is appended to, unless more than half of it is wasted, in which case a new pack is written and the current
+        archives of the previous version are carried over on close.
+
+        :param prj:     The project identifier.
+        :type prj:      str.
+
+        :return: See description.
+        :rtype: PackWriter.
+        """
+        with self.lock:
+            if prj not in self.packs:
+                path = self.folder / f'{prj}.pack'
+                try:
+                    self.previous[prj] = PackReader(path) if path.exists() else None
+                except PackError as e:
+                    getLogger(__name__).warning(f'{e}. Its archives are not carried over.')
+                    self.previous[prj] = None
+                previous = self.previous[prj]
+                self.packs[prj] = PackWriter(path, previous if previous and
+                                             previous.wasted() * 2 <= previous.length else None)
+            return self.packs[prj]
+
+    @contextmanager
+    def archive(self, name: str, prj: str) -> Iterator[ZipFile]:
+        """
+        It opens for writing the archive with the given name belonging to the given project. Inside a pack the archive
+        is built in a spooled temporary file, kept in memory unless large, and appended once complete.
+
+        :param name:    The name of the archive, <ID>.zip.
+        :type name:     str.
+
+        :param prj:     The project identifier.
+        :type prj:      str.
+
+        :return: The archive opened for writing.
+        :rtype: Iterator[ZipFile].
+        """
+        if not self.packed:
+            with atomic_archive(self.folder / name, self.compression, self.level, prj) as z:
+                yield z
+            return
+
+        pack = self.pack(prj)
+        with SpooledTemporaryFile(SPOOL_SIZE) as f:
+            with ZipFile(f, 'w', self.compression, compresslevel=self.level) as z:
+                yield z
+            with metrics.timer('write', prj) as sample:
+                sample.size = f.tell()
+                f.seek(0)
+                pack.add(name, f)
+
+    def put(self, name: str, prj: str, path: Path) -> None:
+        """
+        It stores as the archive with the given name belonging to the given project the complete archive built at
+        the given path, a hidden partial file of the output folder: the file is renamed into place, or appended to the
+        pack of the project and removed.
+
+        :param name:    The name of the archive, <ID>.zip.
+        :type name:     str.
+
+        :param prj:     The project identifier.
+        :type prj:      str.
+
+        :param path:    The path of the complete archive.
+        :type path:     Path.
+
+        :return: None.
+        :rtype: None.
+        """
+        if not self.packed:
+            replace(str(path), str(self.folder / name))
+            return
+
+        pack = self.pack(prj)
+        with metrics.timer('write', prj) as sample, open(str(path), 'rb') as f:
+            sample.size = path.stat().st_size
+            pack.add(name, f)
+        unlink(str(path))
+
+    def size(self, name: str, prj: str) -> Opt[int]:
+        """
+        It returns the size of the stored archive with the given name, None when it is not stored.
+
+        :param name:    The name of the archive, <ID>.zip.
+        :type name:     str.
+
+        :param prj:     The project identifier.
+        :type prj:      str.
+
+        :return: See description.
+        :rtype: Opt[int].
+        """
+        if not self.packed:
+            path = self.folder / name
+            return path.stat().st_size if path.exists() else None
+
+        pack, previous = self.pack(prj), self.previous[prj]
+        if name in pack:
+            return pack.entry(name)[1]
+        return previous.entry(name)[1] if previous and name in previous else None
+
+    def digest(self, name: str, prj: str) -> str:
+        """
+        It returns the digest of the archive with the given name just written.
+
+        :param name:    The name of the archive, <ID>.zip.
+        :type name:     str.
+
+        :param prj:     The project identifier.
+        :type prj:      str.
+
+        :return: See description.
+        :rtype: str.
+        """
+        if self.packed:
+            return self.pack(prj).entry(name)[2]
+
+        digest = sha256()
+        with metrics.timer('digest', prj) as sample, open(str(self.folder / name), 'rb') as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+                digest.update(chunk)
+                sample.size += len(chunk)
+        return f'sha256:{digest.hexdigest()}'
+
+    def verify(self, name: str, prj: str, size: int, digest: str) -> bool:
+        """
+        It tells whether the archive with the given name is stored with the given size and digest. Inside a pack the
+        archive is looked for in its previous version, whose records are left as they are by the run.
+
+        :param name:    The name of the archive, <ID>.zip.
+        :type name:     str.
+
+        :param prj:     The project identifier.
+        :type prj:      str.
+
+        :param size:    The expected size.
+        :type size:     int.
+
+        :param digest:  The expected digest.
+        :type digest:   str.
+
+        :return: See description.
+        :rtype: bool.
+        """
+        if not self.packed:
+            path = self.folder / name
+            return path.exists() and path.stat().st_size == size and self.digest(name, prj) == digest
+
+        self.pack(prj)
+        previous = self.previous[prj]
+        return bool(previous) and name in previous and tuple(previous.entry(name)[1:]) == (size, digest) and \
+            previous.verify(name)
+
+    def close(self) -> int:
+        """
+        It completes the packs being written, carrying over the archives of their previous version into those
+        rewritten. A pack that cannot be completed is aborted, its previous version being left as it was, and the
+        number of such packs is returned.
+
+        :return: See description.
+        :rtype: int.
+        """
+        with self.lock:
+            packs, self.packs = self.packs, {}
+
+        failures = 0
+        for prj, pack in packs.items():
+            try:
+                if self.previous[prj] and not pack.appending:
+                    pack.carry_over(self.previous[prj])
+                pack.close()
+            except Exception:
+                getLogger(__name__).error(f'The `{prj}` pack cannot be completed: {format_exc()}')
+                pack.abort()
+                failures += 1
+        return failures
+
+
+@contextmanager
+def download_attachment(connection: Any, prj: str, attachment: Any) -> Iterator[Tuple[IO[bytes], Opt[str]]]:
+    """
+    It opens for reading the content of the given attachment over the given connection. The request and the reads of
+    the content are accounted to the download phase.
+
+    :param connection:  The connection to the server.
+    :type connection:   Connection.
+
+    :param prj:         The project identifier.
+    :type prj:          str.
+
+    :param attachment:  The attachment.
+    :type attachment:   Attachment.
+
+    :return: The content being downloaded and its declared length, None when unknown.
+    :rtype: Iterator[Tuple[IO[bytes], Opt[str]]].
+    """
+    started = perf_counter()
+    content = connection.getAttachmentContent(attachment.url)
+    with metrics.metered(content, 'download', prj, perf_counter() - started) as content:
+        yield content, content.headers.get('Content-Length')
+
+
+def write_json(z: ZipFile, name: str, date_time: Tuple[int, ...], data: Any, prj: str) -> None:
+    """
+    It writes the given data serialized as JSON into a new entry of the given archive.
+
+    :param z:           The archive.
+    :type z:            ZipFile.
+
+    :param name:        The name of the entry.
+    :type name:         str.
+
+    :param date_time:   The date of the entry as (year, month, day, hour, minute, second).
+    :type date_time:    Tuple[int, ...].
+
+    :param data:        The data.
+    :type data:         Any.
+
+    :param prj:         The project the entry is accounted to.
+    :type prj:          str.
+
+    :return: None.
+    :rtype: None.
+    """
+    with metrics.timer('serialization', prj) as sample:
+        text = dumps(data)
+        sample.size = len(text)
+
+    with metrics.timer('compression', prj) as sample:
+        z.writestr(archive_entry(z, name, date_time), text)
+        sample.size = len(text)
+
+
+def archive_project(output: Output, prj: str, project: Any, logger: Any) -> None:
+    """
+    It archives the data of the given project as <PRJ>.zip into the given output.
+
+    :param output:      The output the archive is stored into.
+    :type output:       Output.
+
+    :param prj:         The project identifier.
+    :type prj:          str.
+
+    :param project:     The project.
+    :type project:      Project.
+
+    :param logger:      The logger instance object.
+    :type logger:       Logger.
+
+    :return: None.
+    :rtype: None.
+    """
+    with output.archive(f'{prj}.zip', prj) as z:
+        logger.info(f'Project archive: {prj}.zip')
+        logger.debug(f'Writing project data: {prj}.json')
+        write_json(z, f'{prj}.json', EPOCH, project.to_dict(), prj)
+
+
+def archive_issue(issue: Any, attachments: List[Any], extras: Dict[str, List[Any]],
+                  fetch: Callable[[Any], ContextManager], output: Output, store: Opt[BlobStore], logger: Any) -> None:
+    """
+    It archives the given issue along with the given attachments and extra data as <ID>.zip into the given output. Each
+    kind of extra data is stored as <ID>.<kind>.json next to the <ID>.json issue data, and so is the fingerprint of the
+    issue, which covers the digests of its attachments. Attachments are streamed in chunks from fetch(attachment), which
+    gives their content and declared length, straight into the archive entries, so memory usage does not depend on their
+    size. When a blob store is given attachments are stored there instead, and the archive holds a <ID>_<name>.blob
+    reference to their blob. Entries are dated by issue_date, therefore both backup engines give the same archive for
+    the same issue.
+
+    :param issue:       The issue to archive.
+    :type issue:        Issue.
+
+    :param attachments: The attachments of the issue.
+    :type attachments:  List[Attachment].
+
+    :param extras:      The extra data of the issue by kind, as returned by group_extras.
+    :type extras:       Dict[str, List[Any]].
+
+    :param fetch:       The function opening the content of an attachment.
+    :type fetch:        Callable[[Attachment], ContextManager].
+
+    :param output:      The output the archive is stored into.
+    :type output:       Output.
+
+    :param store:       The blob store attachments are stored into, None to embed them into the archive.
+    :type store:        Opt[BlobStore].
+
+    :param logger:      The logger instance object.
+    :type logger:       Logger.
+
+    :return: None.
+    :rtype: None.
+    """
+    with output.archive(f'{issue.id}.zip', issue.projectShortName) as z:
+        logger.info(f'Backup archive: {issue.id}.zip')
+        write_issue_entries(z, issue, attachments, extras, fetch, store, logger)
+
+
+def write_issue_entries(z: ZipFile, issue: Any, attachments: List[Any], extras: Dict[str, List[Any]],
+                        fetch: Callable[[Any], ContextManager], store: Opt[BlobStore], logger: Any) -> None:
+    """
+    It writes into the given archive the entries of the given issue, as described by archive_issue.
+
+    :param z:           The archive.
+    :type z:            ZipFile.
+
+    :param issue:       The issue to archive.
+    :type issue:        Issue.
+
+    :param attachments: The attachments of the issue.
+    :type attachments:  List[Attachment].
+
+    :param extras:      The extra data of the issue by kind, as returned by group_extras.
+    :type extras:       Dict[str, List[Any]].
+
+    :param fetch:       The function opening the content of an attachment.
+    :type fetch:        Callable[[Attachment], ContextManager].
+
+    :param store:       The blob store attachments are stored into, None to embed them into the archive.
+    :type store:        Opt[BlobStore].
+
+    :param logger:      The logger instance object.
+    :type logger:       Logger.
+
+    :return: None.
+    :rtype: None.
+    """
+    prj, date_time = issue.projectShortName, issue_date(issue)
+    stored = []
+
+    # Iterates over attachments
+    for idx, attachment in enumerate(attachments):
+        # Acquires some attachment metadata
+        filename = '_'.join([issue.id, attachment.name])
+        logger.info(f'Attachment #{idx}: {filename}')
+
+        if store:
+            # Stores the attachment once and references it from the archive
+            blob = store.lookup(attachment)
+            if blob:
+                logger.debug(f'Stored content: {filename}')
+            else:
+                logger.debug(f'Storing content: {filename}')
+                with fetch(attachment) as (content, _), metrics.timer('write', prj) as sample:
+                    blob = store.put(attachment, content)
+                    sample.size = blob['size']
+            write_json(z, f'{filename}.blob', date_time, blob, prj)
+            stored.append(dict(name=attachment.name, size=blob['size'], digest=blob['digest']))
+
+        else:
+            # Streams the attachment into the archive, storing it when already compressed
+            with fetch(attachment) as (content, length), metrics.timer('compression', prj) as sample:
+                large = length is None or int(length) > ZIP64_LIMIT // 2
+                head = content.read(CHUNK_SIZE)
+                zinfo = archive_entry(z, filename, date_time, is_compressible(filename, head))
+                digest = sha256()
+                with z.open(zinfo, 'w', force_zip64=large) as entry:
+                    logger.debug(f'Writing content: {filename}')
+                    for chunk in chain([head], iter(lambda: content.read(CHUNK_SIZE), b'')):
+                        digest.update(chunk)
+                        entry.write(chunk)
+                sample.size = zinfo.file_size
+            stored.append(dict(name=attachment.name, size=zinfo.file_size, digest=f'sha256:{digest.hexdigest()}'))
+
+        # Writes attachment metadata
+        logger.debug(f'Writing metadata: {filename}.json')
+        write_json(z, f'{filename}.json', date_time, attachment.to_dict(), prj)
+
+    # Writes the issue data
+    logger.debug(f'Writing issue_path: {issue.id}.json')
+    data = issue.to_dict()
+    write_json(z, f'{issue.id}.json', date_time, data, prj)
+
+    # Writes the extra data
+    for kind in EXTRAS:
+        logger.debug(f'Writing {kind}: {issue.id}.{kind}.json')
+        write_json(z, f'{issue.id}.{kind}.json', date_time, extras.get(kind, []), prj)
+
+    # Writes the fingerprint the restore compares the target issue with
+    comments = [c.get('text') for c in extras.get('comments', []) if not c.get('deleted')]
+    write_json(z, FINGERPRINT_NAME.format(issue.id), date_time, make_fingerprint(data, comments, stored), prj)
+
+
+@contextmanager
+def downloaded(contents: Dict[str, Tuple[Opt[IO[bytes]], Opt[str]]], attachment: Any,
+               stream: Opt[Callable[[Any], ContextManager]] = None) -> Iterator[Tuple[IO[bytes], Opt[str]]]:
+    """
+    It gives the already downloaded content of the given attachment, rewound, or the content opened by
+    stream(attachment) when the attachment has been left to be streamed straight into its archive.
+
+    :param contents:    The downloaded contents, None for those left to be streamed, and their declared length by
+                        attachment id.
+    :type contents:     Dict[str, Tuple[Opt[IO[bytes]], Opt[str]]].
+
+    :param attachment:  The attachment.
+    :type attachment:   Attachment.
+
+    :param stream:      The function opening the content of an attachment left to be streamed.
+    :type stream:       Opt[Callable[[Attachment], ContextManager]].
+
+    :return: See description.
+    :rtype: Iterator[Tuple[IO[bytes], Opt[str]]].
+    """
+    content, length = contents[attachment.id]
+    if content is None:
+        with stream(attachment) as (content, length):
+            yield content, length
+        return
+    content.seek(0)
+    yield content, length
+
+
+@contextmanager
+def spooled(contents: Dict[str, Tuple[str, Opt[str]]], attachment: Any) -> Iterator[Tuple[IO[bytes], Opt[str]]]:
+    """
+    It opens for reading the content of the given attachment downloaded into a file.
+
+    :param contents:    The paths of the downloaded contents and their declared length by attachment id.
+    :type contents:     Dict[str, Tuple[str, Opt[str]]].
+
+    :param attachment:  The attachment.
+    :type attachment:   Attachment.
+
+    :return: See description.
+    :rtype: Iterator[Tuple[IO[bytes], Opt[str]]].
+    """
+    path, length = contents[attachment.id]
+    with open(path, 'rb') as content:
+        yield content, length
+
+
+def discard(contents: Dict[str, Tuple[IO[bytes], Opt[str]]]) -> None:
+    """
+    It closes the given downloaded contents, removing those downloaded into a named file.
+
+    :param contents:    The downloaded contents, None for those left to be streamed, and their declared length by
+                        attachment id.
+    :type contents:     Dict[str, Tuple[Opt[IO[bytes]], Opt[str]]].
+
+    :return: None.
+    :rtype: None.
+    """
+    for content, _ in contents.values():
+        if content is None:
+            continue
+        content.close()
+        # Spooled and anonymous files have no name, or a descriptor
+        if isinstance(getattr(content, 'name', None), str) and Path(content.name).exists():
+            unlink(content.name)
+
+
+class Snapshot:
+    """
+    It is a copy of a youtrack object that can be sent to another process: its attributes, as given by to_dict(),
+    without the connection the object is bound to.
+    """
+
+    def __init__(self, item: Any) -> None:
+        """
+        It creates an instance of the Snapshot class copying the given object.
+
+        :param item:    The youtrack object, e.g. an Issue or an Attachment.
+        :type item:     YouTrackObject.
+        """
+        self.__dict__.update(item.to_dict())
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        It returns the attributes of the copied object.
+
+        :return: See description.
+        :rtype: Dict[str, Any].
+        """
+        return dict(self.__dict__)
+
+
+def ignore_interrupts() -> None:
+    """
+    It makes the current worker process ignore SIGINT, which is sent to the whole process group on Ctrl-C: the main
+    process decides when to stop, and the archives being built are completed.
+
+    :return: None.
+    :rtype: None.
+    """
+    signal(SIGINT, SIG_IGN)
+
+
+def build_archive(path: str, compression: int, level: Opt[int], issue: Snapshot, attachments: List[Snapshot],
+                  extras: Dict[str, List[Any]], contents: Dict[str, Tuple[str, Opt[str]]]) -> None:
+    """
+    It builds at the given path the archive of the given issue, with the contents of its attachments downloaded into
+    the given files, as archive_issue does. It is meant to run in a worker process, so that archives are compressed
+    on several cores at once; the archive is then stored into the output by the calling process.
+
+    :param path:        The path of the archive.
+    :type path:         str.
+
+    :param compression: The compression method of the entries.
+    :type compression:  int.
+
+    :param level:       The compression level of the entries, None for the default of the method.
+    :type level:        Opt[int].
+
+    :param issue:       The issue to archive.
+    :type issue:        Snapshot.
+
+    :param attachments: The attachments of the issue.
+    :type attachments:  List[Snapshot].
+
+    :param extras:      The extra data of the issue by kind, as returned by group_extras.
+    :type extras:       Dict[str, List[Any]].
+
+    :param contents:    The paths of the downloaded contents and their declared length by attachment id.
+    :type contents:     Dict[str, Tuple[str, Opt[str]]].
+
+    :return: None.
+    :rtype: None.
+    """
+    with open(path, 'wb') as f, ZipFile(f, 'w', compression, compresslevel=level) as z:
+        write_issue_entries(z, issue, attachments, extras, partial(spooled, contents), None, getLogger(__name__))
+
+
+class Downloaded(NamedTuple):
+    """
+    It is an issue whose attachments have been downloaded, handed from the download stage to the archive stage along
+    with the bytes of the budget its contents hold.
+    """
+    issue: Any
+    attachments: List[Any]
+    extras: Dict[str, List[Any]]
+    contents: Dict[str, Tuple[Opt[IO[bytes]], Opt[str]]]
+    held: int
+
+    @property
+    def streamed(self) -> bool:
+        """
+        It tells whether some attachments have been left to be streamed straight into the archive.
+
+        :return: See description.
+        :rtype: bool.
+        """
+        return any(content is None for content, _ in self.contents.values())
+
+
+class Stage:
+    """
+    It is a stage of the backup pipeline: a number of worker threads taking the items put into a bounded queue and
+    handing them to a handler, which returns the number of failures and may put what it produces into the next stage.
+    A full queue blocks whoever feeds the stage, so every stage runs at the pace of the slowest one without items
+    piling up in memory. On interrupt the items not started yet are dropped, unless the stage completes them all.
+    """
+
+    def __init__(self, name: str, workers: int, handler: Callable[[Any], int], complete: bool = False) -> None:
+        """
+        It creates an instance of the Stage class and starts its workers.
+
+        :param name:        The name of the stage, given to its threads.
+        :type name:         str.
+
+        :param workers:     The number of workers, the queue holds twice as many items.
+        :type workers:      int.
+
+        :param handler:     The function handling an item and returning the number of failures.
+        :type handler:      Callable[[Any], int].
+
+        :param complete:    Whether the items put into the stage are handled even on interrupt.
+        :type complete:     bool.
+        """
+        self.handler = handler
+        self.complete = complete
+        self.queue = Queue(2 * workers)
+        self.lock = Lock()
+        self.failures = 0
+        self.threads = [Thread(target=self.run, name=f'{name}-{n}', daemon=True) for n in range(workers)]
+        for thread in self.threads:
+            thread.start()
+
+    def put(self, item: Any) -> None:
+        """
+        It queues the given item, waiting for room in the queue.
+
+        :param item:    The item.
+        :type item:     Any.
+
+        :return: None.
+        :rtype: None.
+        """
+        self.queue.put(item)
+
+    def run(self) -> None:
+        """
+        It handles the queued items until told to stop by a None item.
+
+        :return: None.
+        :rtype: None.
+        """
+        for item in iter(self.queue.get, None):
+            if interrupted.is_set() and not self.complete:
+                continue
+            try:
+                failures = self.handler(item)
+            except Exception:
+                getLogger(__name__).error(f'{format_exc()}')
+                failures = 1
+            with self.lock:
+                self.failures += failures
+
+    def close(self) -> int:
+        """
+        It waits for the queued items to be handled and for the workers to stop, and returns the number of failures.
+
+        :return: See description.
+        :rtype: int.
+        """
+        for _ in self.threads:
+            self.queue.put(None)
+        for thread in self.threads:
+            thread.join()
+        return self.failures
+
+
+def download_issue(connection: Any, issue: Any, extras: Dict[str, List[Any]], store: Opt[BlobStore],
+                   budget: ByteBudget, spool: Callable[[], IO[bytes]], limit: Opt[int], logger: Any) -> Downloaded:
+    """
+    It lists the attachments of the given issue over the given connection and downloads those not stored yet into the
+    temporary files given by spool(): spooled ones, kept in memory, or named ones the worker processes can read. Once
+    an attachment declares more than limit bytes, it and the following ones are not downloaded but left to be
+    streamed straight into the archive, at the cost of a request, so that no content is written to disk twice. The
+    declared length of each attachment is held from the given budget before its content is read: the first attachment
+    of the issue waits for it to be available, the others do not, so that an issue being downloaded never waits for
+    another one and the budget is exceeded by a part of an issue at most per worker.
+
+    :param connection:  The connection to the server.
+    :type connection:   Connection.
+
+    :param issue:       The issue to download.
+    :type issue:        Issue.
+
+    :param extras:      The extra data of the issue by kind, as returned by group_extras.
+    :type extras:       Dict[str, List[Any]].
+
+    :param store:       The blob store attachments are stored into, None to embed them into the archive.
+    :type store:        Opt[BlobStore].
+
+    :param budget:      The budget of the downloaded bytes not archived yet.
+    :type budget:       ByteBudget.
+
+    :param spool:       The function creating the temporary file of a content.
+    :type spool:        Callable[[], IO[bytes]].
+
+    :param limit:       The declared length above which attachments are left to be streamed, None to download all.
+    :type limit:        Opt[int].
+
+    :param logger:      The logger instance object.
+    :type logger:       Logger.
+
+    :return: See description.
+    :rtype: Downloaded.
+
+    :raises Exception: When the download fails, the contents being then closed and their bytes given back.
+    """
+    prj = issue.projectShortName
+    contents, held, streamed = {}, 0, False
+
+    try:
+        # Binds the issue to the connection checked out by the current worker
+        issue.youtrack = connection
+
+        # Acquires some issue metadata
+        logger.info(f'\nIssue: {issue.id} {issue.summary}')
+
+        with metrics.timer('metadata', prj):
+            attachments = issue.getAttachments()
+
+        for attachment in attachments:
+            if store and store.lookup(attachment):
+                continue
+            if streamed:
+                contents[attachment.id] = (None, None)
+                continue
+            with download_attachment(connection, prj, attachment) as (content, length):
+                size = int(length) if length is not None else 0
+                if limit is not None and size > limit:
+                    contents[attachment.id], streamed = (None, length), True
+                    continue
+                budget.acquire(size, wait=not held)
+                held += size
+                contents[attachment.id] = (spool(), length)
+                copyfileobj(content, contents[attachment.id][0], CHUNK_SIZE)
+            # The declared length may be missing
+            extra = contents[attachment.id][0].tell() - size
+            if extra > 0:
+                budget.acquire(extra, wait=False)
+                held += extra
+
+        return Downloaded(issue, attachments, extras, contents, held)
+
+    except BaseException:
+        discard(contents)
+        budget.release(held)
+        raise
+
+
+def write_issue(output: Output, manifest: Manifest, store: Opt[BlobStore], budget: ByteBudget, item: Downloaded,
+                processes: Opt[Executor], stream: Opt[Callable[[Any], ContextManager]], logger: Any) -> bool:
+    """
+    It archives the given downloaded issue through archive_issue and records it into the manifest, the attachments
+    left to be streamed being opened by stream(attachment). When a pool of processes is given the archive is built by
+    one of them through build_archive instead, from the contents downloaded into named files, and then stored into
+    the output. The contents are then closed and their bytes given back to the budget, whatever the outcome. Any
+    failure is logged and reported without being raised.
+
+    :param output:      The output the archive is stored into.
+    :type output:       Output.
+
+    :param manifest:    The manifest the archived issue is recorded into.
+    :type manifest:     Manifest.
+
+    :param store:       The blob store attachments are stored into, None to embed them into the archive.
+    :type store:        Opt[BlobStore].
+
+    :param budget:      The budget of the downloaded bytes not archived yet.
+    :type budget:       ByteBudget.
+
+    :param item:        The downloaded issue.
+    :type item:         Downloaded.
+
+    :param processes:   The pool of processes building the archives, None to build them in the current thread.
+    :type processes:    Opt[Executor].
+
+    :param stream:      The function opening the content of an attachment left to be streamed, None when none is.
+    :type stream:       Opt[Callable[[Attachment], ContextManager]].
+
+    :param logger:      The logger instance object.
+    :type logger:       Logger.
+
+    :return: It returns True upon success, False otherwise.
+    :rtype: bool.
+    """
+    issue = item.issue
+    part = output.folder / f'.{issue.id}.zip.part'
+
+    try:
+        prj, name = issue.projectShortName, f'{issue.id}.zip'
+
+        if processes:
+            logger.info(f'Backup archive: {name}')
+            contents = {}
+            for key, (content, length) in item.contents.items():
+                # The named file is kept once closed
+                content.close()
+                contents[key] = (content.name, length)
+            with metrics.timer('compression', prj) as sample:
+                processes.submit(build_archive, str(part), output.compression, output.level, Snapshot(issue),
+                                 [Snapshot(a) for a in item.attachments], item.extras, contents).result()
+                sample.size = sum(Path(path).stat().st_size for path, _ in contents.values())
+            output.put(name, prj, part)
+        else:
+            fetch = partial(downloaded, item.contents, stream=stream)
+            archive_issue(issue, item.attachments, item.extras, fetch, output, store, logger)
+
+        manifest.record(issue, [a.id for a in item.attachments], output.size(name, prj), output.digest(name, prj))
+        metrics.issue(prj)
+        return True
+
+    except Exception as e:
+        logger.error(f'Issue {issue.id} failed: {format_exc()}')
+        return False
+
+    finally:
+        if processes and part.exists():
+            unlink(str(part))
+        discard(item.contents)
+        budget.release(item.held)
+
+
+def remove_partials(folder: Path, logger: Any) -> None:
+    """
+    It removes the partial files left in the given output folder and in its blob store by a run that was killed.
+
+    :param folder:  The output folder.
+    :type folder:   Path.
+
+    :param logger:  The logger instance object.
+    :type logger:   Logger.
+
+    :return: None.
+    :rtype: None.
+    """
+    for part in [*folder.glob('.*.part'), *(folder / BlobStore.folder_name).glob('.*.part')]:
+        logger.debug(f'Removing partial file: {part.name}')
+        unlink(str(part))
+
+
+def open_journal(args: Namespace, manifest: Manifest, started: int, logger: Any) -> Tuple[bool, int]:
+    """
+    It opens the journal of the run after removing the partial files left in the output folder. With args.resume the
+    journal left by an interrupted run is continued and the run takes its start time; otherwise a new journal is
+    started, once the manifest holds what the previous one recorded.
+
+    :param args:        The namespace with parsed command line arguments.
+    :type args:         Namespace.
+
+    :param manifest:    The manifest of the output folder.
+    :type manifest:     Manifest.
+
+    :param started:     The start time in milliseconds of the current run.
+    :type started:      int.
+
+    :param logger:      The logger instance object.
+    :type logger:       Logger.
+
+    :return: Whether an interrupted run is resumed, and the start time of the run.
+    :rtype: Tuple[bool, int].
+    """
+    remove_partials(args.output, logger)
+    journal = manifest.journal
+
+    if args.resume and journal.started is not None:
+        logger.info(f'Resuming the backup started at {strftime("%Y-%m-%d %H:%M:%S", gmtime(journal.started / 1000))} '
+                    f'UTC: {len(journal.issues)} issues completed.')
+        journal.resume()
+        return True, journal.started
+
+    if args.resume:
+        logger.warning('No interrupted backup found in the output folder, a new backup is performed.')
+
+    if journal.issues:
+        manifest.save()
+    journal.start(started)
+    return False, started
+
+
+def is_completed(manifest: Manifest, output: Output, prj: str, issue: Opt[Any] = None) -> bool:
+    """
+    It tells whether the archive of the given issue, or of the given project when no issue is given, was completed by
+    the run the journal of the manifest comes from, and is still stored with the recorded size and digest. An issue
+    updated since then is not.
+
+    :param manifest:    The manifest of the output folder.
+    :type manifest:     Manifest.
+
+    :param output:      The output the archives are stored into.
+    :type output:       Output.
+
+    :param prj:         The project identifier.
+    :type prj:          str.
+
+    :param issue:       The issue, None for the project.
+    :type issue:        Opt[Issue].
+
+    :return: See description.
+    :rtype: bool.
+    """
+    if issue is None:
+        name, entry = f'{prj}.zip', manifest.journal.projects.get(prj)
+    else:
+        name, entry = f'{issue.id}.zip', manifest.journal.issues.get(issue.id)
+        if entry and entry['updated'] != str(getattr(issue, 'updated', '')):
+            return False
+
+    return bool(entry) and output.verify(name, prj, entry['size'], entry['digest'])
+
+
+class Run:
+    """
+    It holds the output, the manifest and the blob store of a backup run, and takes the decisions both backup engines
+    share: which archives are skipped as unchanged or completed by the resumed run, how issues are batched, which
+    issues an incremental run downloads again, and whether the run becomes the base of the next incremental one.
+    """
+
+    def __init__(self, args: Namespace, interrupted: Event, logger: Any) -> None:
+        """
+        It creates an instance of the Run class, opening the journal of the run.
+
+        :param args:        The namespace with parsed command line arguments.
+        :type args:         Namespace.
+
+        :param interrupted: The event set on interrupt, after which no more issues are started.
+        :type interrupted:  Event.
+
+        :param logger:      The logger instance object.
+        :type logger:       Logger.
+        """
+        self.args = args
+        self.interrupted = interrupted
+        self.logger = logger
+        self.output = Output(args)
+        self.manifest = Manifest(args.output)
+        self.store = BlobStore(args.output) if args.dedup else None
+        self.resume, self.started = open_journal(args, self.manifest, int(time() * 1000), logger)
+        self.incremental = args.incremental and self.manifest.completed is not None
+        self.failures = 0
+        self.batch = []
+
+        if args.incremental and not self.incremental:
+            logger.warning('No complete backup found in the output folder, a full backup is performed.')
+
+    def archive_project(self, prj: str, project: Any) -> None:
+        """
+        It archives the given project and records it into the manifest, unless completed by the resumed run.
+
+        :param prj:     The project identifier.
+        :type prj:      str.
+
+        :param project: The project.
+        :type project:  Project.
+
+        :return: None.
+        :rtype: None.
+        """
+        if self.resume and is_completed(self.manifest, self.output, prj):
+            return
+        archive_project(self.output, prj, project, self.logger)
+        self.manifest.record_project(prj, self.output.size(f'{prj}.zip', prj),
+                                     self.output.digest(f'{prj}.zip', prj))
+
+    def is_current(self, prj: str, issue: Any) -> bool:
+        """
+        It tells whether the given issue of the given project is archived as it was last updated.
+
+        :param prj:     The project identifier.
+        :type prj:      str.
+
+        :param issue:   The issue.
+        :type issue:    Issue.
+
+        :return: See description.
+        :rtype: bool.
+        """
+        if self.manifest.is_current(issue.id, issue.updated, self.output.size(f'{issue.id}.zip', prj)):
+            self.logger.debug(f'Unchanged issue: {issue.id}')
+            return True
+        return False
+
+    def queue(self, prj: str, issue: Opt[Any]) -> List[Any]:
+        """
+        It adds the given issue of the given project to the batch being filled, unless it is skipped, and returns the
+        batch once it holds a page of issues, whose extra data are fetched at once; a None issue flushes the batch.
+        Otherwise an empty list is returned. An issue is skipped when requested with args.iid by an incremental run
+        and unchanged since the last complete run, or when completed by the resumed run.
+
+        :param prj:     The project identifier.
+        :type prj:      str.
+
+        :param issue:   The issue, None to flush the batch.
+        :type issue:    Opt[Issue].
+
+        :return: See description.
+        :rtype: List[Issue].
+        """
+        if issue is not None:
+
+            if self.incremental and self.args.iid and self.is_current(prj, issue):
+                return []
+
+            if self.resume and is_completed(self.manifest, self.output, prj, issue):
+                self.logger.debug(f'Completed issue: {issue.id}')
+                return []
+
+            self.batch.append(issue)
+            if len(self.batch) < self.args.page_size:
+                return []
+
+        batch, self.batch = self.batch, []
+        return batch
+
+    def missing(self, prj: str, issue_ids: Iterable[str]) -> Set[str]:
+        """
+        It records as deleted the issues of the given project in the manifest which are not among the given ones, the
+        identifiers of all the issues of the project on the server, and returns those whose archive is missing. With
+        args.query only the matching issues are listed, and none is recorded as deleted.
+
+        :param prj:         The project identifier.
+        :type prj:          str.
+
+        :param issue_ids:   The identifiers of the issues of the project.
+        :type issue_ids:    Iterable[str].
+
+        :return: See description.
+        :rtype: Set[str].
+        """
+        recorded = self.manifest.issues(prj)
+        current = set(issue_ids)
+
+        for issue_id in sorted(recorded - current) if not self.args.query else ():
+            self.logger.info(f'Deleted issue: {issue_id}')
+            self.manifest.delete(issue_id, self.started)
+
+        return {i for i in current if i not in recorded or self.output.size(f'{i}.zip', prj) is None}
+
+    def changed_query(self) -> str:
+        """
+        It returns the YouTrack search query matching the issues updated since the last complete run.
+
+        :return: See description.
+        :rtype: str.
+        """
+        # Dates granularity is a day, one more day absorbs time zone differences
+        since = strftime('%Y-%m-%d', gmtime(self.manifest.completed / 1000 - 24 * 3600))
+        return search_query(self.args, f'updated: {since} .. Today')
+
+    def finish(self) -> None:
+        """
+        It completes the output and saves the manifest once every issue has been handled. Only a complete run, neither
+        failed nor interrupted, of every project and issue, can be the base of the next incremental one; its journal
+        is then removed. A pack that cannot be completed counts as a failure.
+
+        :return: None.
+        :rtype: None.
+        """
+        # The packs are completed before the manifest records the archives they hold
+        self.failures += self.output.close()
+        finished = not self.failures and not self.interrupted.is_set()
+        args = self.args
+        self.manifest.save(self.started if finished and not args.prjs and not args.iid and not args.query else None)
+        self.manifest.journal.close(remove=finished)
+
+    def close(self) -> None:
+        """
+        It completes the output, closes the journal and saves the blob store, then reports the failures.
+
+        :return: None.
+        :rtype: None.
+        """
+        self.failures += self.output.close()
+        self.manifest.journal.close()
+
+        if self.store:
+            self.store.save()
+
+        if self.failures:
+            self.logger.warning(f'\nFailed issues: {self.failures}')
+
+        if self.interrupted.is_set():
+            self.logger.warning('\nBackup interrupted, it can be completed with --resume.')
+
+
+def iter_changed_issues(args: Namespace, pool: ConnectionPool, prj: str, run: Run) -> Iterator[Any]:
+    """
+    It yields the issues of the given project that must be archived again according to the manifest. Only the issues
+    updated since the last complete run are fully fetched; a lightweight listing of identifiers and update timestamps
+    detects the issues deleted from the server, which are recorded as such, and the issues whose archive is missing.
+    With args.query only the matching issues are considered, and none is recorded as deleted.
+
+    :param args:    The namespace with parsed command line arguments.
+    :type args:     Namespace.
+
+    :param pool:    The pool of connections to the server.
+    :type pool:     ConnectionPool.
+
+    :param prj:     The project identifier.
+    :type prj:      str.
+
+    :param run:     The run.
+    :type run:      Run.
+
+    :return: See description.
+    :rtype: Iterator[Issue].
+    """
+    missing = run.missing(prj, (stamp.id for stamp in iter_pages(args, fetch_issue_stamps_page, args, pool, prj)))
+
+    for issue in iter_issues(args, pool, prj, run.changed_query()):
+        missing.discard(issue.id)
+        if not run.is_current(prj, issue):
+            yield issue
+
+    for issue_id in sorted(missing):
+        with pool.connection() as connection, metrics.timer('metadata', prj):
+            issue = connection.getIssue(issue_id)
+        yield issue
+
+
+def backup(args, pool, logger):
+    """
+    It performs issues backup according to the given arguments. The issues are listed by the calling thread and flow
+    through a pipeline of stages connected by bounded queues: args.metadata_jobs workers fetch the extra data of the
+    issues by batches of a page of issues, in a few requests per batch, args.jobs workers download the attachments
+    of each issue, and args.archive_jobs workers serialize, compress and write its archive, the building of the
+    archives being handed to a pool of args.processes worker processes when given. An issue with an attachment too
+    large to be kept in memory is archived by its download worker instead, the attachment being streamed from the
+    server straight into the archive. A stage whose queue is
+    full blocks the previous one, and the downloaded bytes not archived yet are bounded by args.buffer_budget MiB, so
+    the network and the CPU work at once while memory does not grow with the project size or the attachments size.
+    The project and issue filters are part of the requests, so that only the requested projects and issues are
+    fetched from the server. Archived issues are recorded in the manifest of the output folder; with args.incremental
+    only the issues changed since the last complete run are downloaded again. Completed archives are recorded in the
+    journal as well: with args.resume the archives completed by an interrupted run are skipped. On interrupt no more
+    issues are started and the ones downloaded are archived.
+
+    :param args:        The namespace with parsed command line arguments.
+    :type args:         Namespace.
+
+    :param pool:        The pool of connections to the server.
+    :type pool:         ConnectionPool.
+
+    :param logger:      The logger instance object.
+    :type logger:       Logger.
+
+    :return: None.
+    :rtype: None.
+    """
+    run = Run(args, interrupted, logger)
+    budget = ByteBudget(args.buffer_budget << 20)
+    # Spawned rather than forked, since the process is running threads already
+    processes = ProcessPoolExecutor(args.processes, get_context('spawn'), ignore_interrupts) \
+        if args.processes else None
+    # The worker processes read the contents from named files, otherwise the contents too large to be kept in memory
+    # are streamed rather than spooled to disk
+    spool = partial(NamedTemporaryFile, dir=str(args.output), prefix='.', suffix='.part', delete=False) \
+        if processes else partial(SpooledTemporaryFile, SPOOL_SIZE)
+    limit = None if processes else SPOOL_SIZE
+
+    def fetch(item: Tuple[str, List[Any]]) -> int:
+        prj, batch = item
+        try:
+            extras = fetch_extras(pool, prj, [i.id for i in batch])
+        except Exception:
+            logger.error(f'Extra data of {len(batch)} issues failed: {format_exc()}')
+            return len(batch)
+        for issue in batch:
+            downloads.put((issue, extras[issue.id]))
+        return 0
+
+    def download(item: Tuple[Any, Dict[str, List[Any]]]) -> int:
+        issue, extras = item
+        try:
+            with pool.connection() as connection:
+                downloaded_issue = download_issue(connection, issue, extras, run.store, budget, spool, limit, logger)
+                if downloaded_issue.streamed:
+                    # Archived right away, its large attachments being streamed over the same connection
+                    stream = partial(download_attachment, connection, issue.projectShortName)
+                    return int(not write_issue(run.output, run.manifest, run.store, budget, downloaded_issue, None,
+                                               stream, logger))
+            archives.put(downloaded_issue)
+            return 0
+        except Exception:
+            logger.error(f'Issue {issue.id} failed: {format_exc()}')
+            return 1
+
+    def write(item: Downloaded) -> int:
+        return int(not write_issue(run.output, run.manifest, run.store, budget, item, processes, None, logger))
+
+    try:
+
+        # The stages are started from the last one, the downloaded issues are archived even on interrupt. Every
+        # worker process is kept busy by an archive worker
+        archives = Stage('archive', max(args.archive_jobs, args.processes), write, True)
+        downloads = Stage('download', args.jobs, download)
+        batches = Stage('metadata', args.metadata_jobs, fetch)
+
+        try:
+
+            # Only the requested projects are fetched
+            prjs = requested_projects(args)
+            if prjs is None:
+                with pool.connection() as connection, metrics.timer('listing'):
+                    prjs = connection.getProjectIds()
+
+            # Iterates over projects
+            for prj in prjs:
+
+                if interrupted.is_set():
+                    break
+
+                # Acquiring project data
+                try:
+                    with pool.connection() as connection, metrics.timer('metadata', prj):
+                        project = connection.getProject(prj)
+                except YouTrackException as e:
+                    logger.warning(f'The `{prj}` project cannot be fetched: {e}')
+                    continue
+
+                logger.info(f'\nProject: {project.name}')
+                run.archive_project(prj, project)
+
+                # Iterates over the requested issues, or over issues page by page
+                if args.iid:
+                    issues = iter_named_issues(args, pool, prj)
+                elif run.incremental:
+                    issues = iter_changed_issues(args, pool, prj, run)
+                else:
+                    issues = iter_issues(args, pool, prj, search_query(args))
+
+                # A trailing None flushes the last batch
+                for issue in chain(issues, [None]):
+
+                    if interrupted.is_set():
+                        break
+
+                    batch = run.queue(prj, issue)
+                    if batch:
+                        batches.put((prj, batch))
+
+        finally:
+
+            # Drains the stages in order, the queued issues are dropped on interrupt
+            for stage in (batches, downloads, archives):
+                run.failures += stage.close()
+
+        run.finish()
+
+    except Exception as e:
+        logger.error(f'{format_exc()}')
+        run.manifest.save()
+
+    finally:
+
+        if processes:
+            processes.shutdown()
+        run.close()
+
+
+def available_cores() -> int:
+    """
+    It returns the number of cores the current process may run on.
+
+    :return: See description.
+    :rtype: int.
+    """
+    try:
+        # Not available on every platform
+        from os import sched_getaffinity
+        return len(sched_getaffinity(0))
+    except (ImportError, OSError):
+        return cpu_count() or 1
+
+
+def usage(args: List[str]) -> Namespace:
+    """
+    It parses the given args (usually from sys.argv) and checks they conform to the rules of the application. It then
+    returns a namedtuple with a field for a any given or defaulted argument.
+
+    :param args:    The command line arguments to be parsed.
+    :type args:     List[str].
+
+    :return: See description.
+    :rtype: NamedTuple.
+    """
+    helps = dict(
+        description=__doc__,
+        url='The URL of the YouTrack instance.',
+        token='The to use with the given instance.',
+        output='The destination folder.',
+        verbose='It shows more verbose output.',
+        projects='When given only the issue of the given projects are considered.',
+        issueids='When given only the issues with the given id are considered.',
+        query='When given only the issues matching the given YouTrack search query are considered, e.g. '
+              '"#Unresolved".',
+        jobs='The number of issues downloaded concurrently.',
+        metadata_jobs='The number of pages of issues whose comments, links, tags, work items and history are fetched '
+                      'concurrently.',
+        archive_jobs='The number of issues serialized, compressed and written concurrently.',
+        buffer_budget='The number of MiB of downloaded attachments waiting to be archived, across all the issues.',
+        processes='The number of worker processes the archives are built by, so that compression runs on several '
+                  'cores, by default one per available core. Without it archives are built by the archive jobs.',
+        page_size='The number of issues requested to the server at once.',
+        connections='The number of connections to the server, by default one per job and metadata job plus one, or '
+                    'two per job plus one with the async engine.',
+        retries='The number of times a request failed for a transient error is attempted again.',
+        backoff='The delay in seconds before retrying a failed request, doubled at each attempt.',
+        incremental='Only the issues changed since the last complete backup in the output folder are downloaded.',
+        dedup='Attachments are stored once in a content addressed store inside the output folder.',
+        compression='The compression method of the archives. Already compressed attachments are always stored.',
+        level='The compression level: 0-9 for deflate, 1-9 for bzip2, ignored otherwise.',
+        format='The output format: a zip archive per project and issue, or a single indexed pack per project, the '
+               'archives of each run being appended to.',
+        resume='The backup interrupted in the output folder is resumed: the archives it completed are verified and '
+               'skipped, and the partial ones removed.',
+        engine='The backup engine: worker threads, or an asyncio event loop multiplexing many concurrent requests '
+               '(it requires aiohttp). Both give the same archives.',
+        metrics_json='The JSON file the time, operations and bytes of each phase of the run are written to, besides '
+                     'the summary shown at exit.',
+    )
+
+    parser = ArgumentParser(description=helps['description'])
+
+    # Mandatory arguments
+    parser.add_argument('url', help=helps['url'])
+    parser.add_argument('token', help=helps['token'])
+    parser.add_argument('output', help=helps['output'])
+
+    # Options
+    parser.add_argument('-v', '--verbose', dest='verbose', action='store_true', default=False, help=helps['verbose'])
+    parser.add_argument('-p', '--projects', dest='prjs', nargs='+', default=[], help=helps['projects'])
+    parser.add_argument('-i', '--issue-ids', dest='iid', nargs='+', default=[], help=helps['issueids'])
+    parser.add_argument('-q', '--query', dest='query', default='', help=helps['query'])
+    parser.add_argument('-j', '--jobs', dest='jobs', type=int, default=1, help=helps['jobs'])
+    parser.add_argument('--metadata-jobs', dest='metadata_jobs', type=int, default=1, help=helps['metadata_jobs'])
+    parser.add_argument('--archive-jobs', dest='archive_jobs', type=int, default=1, help=helps['archive_jobs'])
+    parser.add_argument('--buffer-budget', dest='buffer_budget', type=int, default=256, help=helps['buffer_budget'])
+    parser.add_argument('--processes', dest='processes', type=int, nargs='?', const=available_cores(), default=0,
+                        help=helps['processes'])
+    parser.add_argument('--page-size', dest='page_size', type=int, default=100, help=helps['page_size'])
+    parser.add_argument('--connections', dest='connections', type=int, default=0, help=helps['connections'])
+    parser.add_argument('--retries', dest='retries', type=int, default=5, help=helps['retries'])
+    parser.add_argument('--backoff', dest='backoff', type=float, default=0.5, help=helps['backoff'])
+    parser.add_argument('--incremental', dest='incremental', action='store_true', default=False,
+                        help=helps['incremental'])
+    parser.add_argument('--dedup', dest='dedup', action='store_true', default=False, help=helps['dedup'])
+    parser.add_argument('--compression', dest='compression', choices=list(CODECS), default='deflate',
+                        help=helps['compression'])
+    parser.add_argument('--level', dest='level', type=int, default=6, help=helps['level'])
+    parser.add_argument('--format', dest='format', choices=['zip', 'pack'], default='zip', help=helps['format'])
+    parser.add_argument('--resume', dest='resume', action='store_true', default=False, help=helps['resume'])
+    parser.add_argument('--engine', dest='engine', choices=['sync', 'async'], default='sync', help=helps['engine'])
+    parser.add_argument('--metrics-json', dest='metrics_json', default=None, help=helps['metrics_json'])
+
+    # Parsing
+    args = parser.parse_args(args)
+
+    # Checking the number of workers
+    if min(args.jobs, args.metadata_jobs, args.archive_jobs) < 1:
+        parser.error('The number of jobs, metadata jobs and archive jobs must be positive integers.')
+
+    # Checking the buffer budget
+    if args.buffer_budget < 1:
+        parser.error(f'The buffer budget must be a positive integer: `{args.buffer_budget}`')
+
+    # Checking the worker processes
+    if args.processes < 0:
+        parser.error(f'The number of processes cannot be negative: `{args.processes}`')
+
+    if args.processes and (args.dedup or args.engine == 'async'):
+        parser.error('The worker processes cannot be used with --dedup, whose attachments are not compressed, nor '
+                     'with the async engine.')
+
+    # Checking the page size
+    if args.page_size < 1:
+        parser.error(f'The page size must be a positive integer: `{args.page_size}`')
+
+    # Checking the transport
+    if args.connections < 0 or args.retries < 0 or args.backoff < 0:
+        parser.error('The number of connections, the retries and the backoff cannot be negative.')
+
+    # Checking the compression level
+    if args.compression == 'deflate' and not 0 <= args.level <= 9 or \
+            args.compression == 'bzip2' and not 1 <= args.level <= 9:
+        parser.error(f'The level is out of range for {args.compression}: `{args.level}`')
+
+    # Checking the optional dependencies of the engine
+    missing = [m for m in ('aiohttp', 'yarl') if find_spec(m) is None] if args.engine == 'async' else []
+    if missing:
+        parser.error(f'The async engine requires {" and ".join(missing)}: `pip install {" ".join(missing)}`, or '
+                     f'install the optional requirements listed in requirements.txt.')
+
+    # Checking the output directory
+    args.output = Path(args.output)
+    if not args.output.exists():
+        makedirs(str(args.output), exist_ok=True)
+
+    # Making sets for faster belonging check
+    args.prjs = set(args.prjs) if args.prjs else args.prjs
+    args.iid = set(args.iid) if args.iid else args.iid
+
+    return args
+
+
+def main(args: Namespace) -> None:
+    """
+    It starts the application.
+
+    :param args:    The parsed command line arguments as returned by usage();
+    :type args:     Namespace.
+
+    :return: None.
+    :rtype: None.
+    """
+    logger = getLogger(__name__)
+    logger.setLevel(INFO if not args.verbose else DEBUG)
+    metrics.reset()
+
+    logger.info(f'TARGET: `{args.url}`')
+    logger.debug(f'TOKEN:  `{args.token}`')
+    logger.info(f'OUTPUT: `{args.output}`')
+
+    # The listing of the next page takes a connection besides the workers
+    pool = ConnectionPool(args.url, args.token, args.connections or args.jobs + args.metadata_jobs + 1, args.retries,
+                          args.backoff)
+
+    try:
+        if args.engine == 'async':
+            # Imported on demand since aiohttp is an optional dependency
+            from aio import backup as backup_async
+            # The event is passed along since this module may run as __main__
+            run(backup_async(args, logger, interrupted))
+        else:
+            backup(args, pool, logger)
+    except Exception as e:
+        logger.error(str(e))
+        exit(1)
+    finally:
+        pool.close()
+        metrics.report(logger, args.metrics_json)
 
 
 def external_main(args: List[str]) -> None:
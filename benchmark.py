@@ -0,0 +1,506 @@
+"""
+It benchmarks the backup and restore executables end to end against the mock YouTrack server, and writes the
+throughput, peak memory and request counts of each run into a JSON file, so that versions can be compared on a
+machine with no network.
+"""
+
+from argparse import ArgumentParser, Namespace
+from datetime import datetime, timezone
+from importlib import import_module
+from io import BytesIO
+from json import dumps, loads
+from logging import INFO, DEBUG, getLogger
+from multiprocessing import get_context
+from os import devnull, dup2, open as os_open, O_WRONLY
+from pathlib import Path
+from platform import platform, python_version, system as system_platform
+from random import Random
+from shlex import split
+from statistics import median
+from subprocess import run, DEVNULL
+from sys import argv, stdout
+from tempfile import TemporaryDirectory
+from time import perf_counter
+from typing import Any, Dict, List, Optional as Opt
+from zipfile import ZipFile
+from zlib import compress
+from backup import CODECS, TRIAL_SIZE, logging_console_init
+from mock_server import Dataset, MockYouTrackServer, add_dataset_arguments, make_dataset
+
+try:
+    from resource import getrusage, RUSAGE_SELF
+except ImportError:
+    # Not available on Windows, where the peak memory is not measured
+    getrusage = None
+
+# The metrics summarized across repetitions, and whether the higher the better
+SUMMARIZED = dict(seconds=False, issues_per_second=True, mb_per_second=True, peak_rss_mb=False, requests=False)
+
+# The contents and the codecs measured with --codecs, as (content, method, level)
+CODEC_TRIALS = [
+    ('issue JSON', 'deflate', 6),
+    ('issue JSON', 'deflate', 9),
+    ('issue JSON', 'bzip2', 9),
+    ('issue JSON', 'lzma', None),
+    ('application log', 'deflate', 6),
+    ('incompressible', 'deflate', 6),
+    ('incompressible', 'store', None),
+]
+
+
+def run_step(module: str, args: List[str], verbose: bool, results: Any) -> None:
+    """
+    It runs the external_main of the given executable module with the given arguments, and puts into results its
+    elapsed time, its peak resident memory and its exit code. It is meant to run in a fresh process, so that the peak
+    memory is the one of the executable alone.
+
+    :param module:  The name of the executable module, backup or restore.
+    :type module:   str.
+
+    :param args:    The command line arguments of the executable.
+    :type args:     List[str].
+
+    :param verbose: Whether the output of the executable is shown.
+    :type verbose:  bool.
+
+    :param results: The queue the measures are put into.
+    :type results:  Queue.
+
+    :return: None.
+    :rtype: None.
+    """
+    if not verbose:
+        # Silences the executable whatever stream its logging is bound to
+        dup2(os_open(devnull, O_WRONLY), stdout.fileno())
+
+    executable = import_module(module)
+    started = perf_counter()
+    code = 0
+
+    try:
+        executable.external_main(args)
+    except SystemExit as e:
+        code = e.code or 0
+
+    seconds = perf_counter() - started
+    peak = None
+    if getrusage:
+        # Kilobytes on Linux, bytes on macOS
+        peak = getrusage(RUSAGE_SELF).ru_maxrss * (1 if system_platform() == 'Darwin' else 1024)
+
+    results.put(dict(seconds=seconds, peak_rss=peak, exit=code))
+
+
+def measure(module: str, args: List[str], verbose: bool) -> Dict[str, Any]:
+    """
+    It runs the given executable module with the given arguments in a fresh process and returns its measures.
+
+    :param module:  The name of the executable module, backup or restore.
+    :type module:   str.
+
+    :param args:    The command line arguments of the executable.
+    :type args:     List[str].
+
+    :param verbose: Whether the output of the executable is shown.
+    :type verbose:  bool.
+
+    :return: See description.
+    :rtype: Dict[str, Any].
+    """
+    context = get_context('spawn')
+    results = context.Queue()
+    process = context.Process(target=run_step, args=(module, args, verbose, results))
+    process.start()
+    measures = results.get()
+    process.join()
+    return measures
+
+
+def folder_size(folder: Path) -> int:
+    """
+    It returns the total size in bytes of the files inside the given folder.
+
+    :param folder:  The folder.
+    :type folder:   Path.
+
+    :return: See description.
+    :rtype: int.
+    """
+    return sum(p.stat().st_size for p in folder.rglob('*') if p.is_file())
+
+
+def step_report(measures: Dict[str, Any], server: MockYouTrackServer, issues: int, payload: int) -> Dict[str, Any]:
+    """
+    It builds the report of a step from the measures of the executable and the requests accounted by the server.
+
+    :param measures:    The measures returned by measure().
+    :type measures:     Dict[str, Any].
+
+    :param server:      The server the executable talked to.
+    :type server:       MockYouTrackServer.
+
+    :param issues:      The number of issues handled by the step.
+    :type issues:       int.
+
+    :param payload:     The number of attachment bytes handled by the step.
+    :type payload:      int.
+
+    :return: See description.
+    :rtype: Dict[str, Any].
+    """
+    seconds = measures['seconds']
+    peak = measures['peak_rss']
+
+    return dict(
+        exit=measures['exit'],
+        seconds=round(seconds, 4),
+        issues=issues,
+        issues_per_second=round(issues / seconds, 2),
+        bytes=payload,
+        mb_per_second=round(payload / seconds / 1e6, 2),
+        peak_rss_mb=round(peak / 1e6, 1) if peak is not None else None,
+        requests=sum(server.requests.values()),
+        requests_by_route=dict(sorted(server.requests.items())),
+    )
+
+
+def bench(args: Namespace, logger: Any) -> Dict[str, Any]:
+    """
+    It performs a single repetition of the benchmark: the backup of a freshly generated dataset, followed, unless
+    args.no_restore, by its restore into an empty instance.
+
+    :param args:        The namespace with parsed command line arguments.
+    :type args:         Namespace.
+
+    :param logger:      The logger instance object.
+    :type logger:       Logger.
+
+    :return: The reports of the steps by name.
+    :rtype: Dict[str, Any].
+    """
+    dataset = make_dataset(args)
+    issues = sum(len(p['issues']) for p in dataset.projects.values())
+    report = {}
+
+    with TemporaryDirectory(prefix='ytbench-') as folder:
+        source = MockYouTrackServer(dataset, latency=args.latency, error_rate=args.error_rate, seed=args.seed).start()
+        try:
+            measures = measure('backup', [source.url, 'token', folder] + split(args.backup_args), args.verbose)
+            report['backup'] = step_report(measures, source, issues, dataset.payload())
+            report['backup']['output_bytes'] = folder_size(Path(folder))
+        finally:
+            source.stop()
+
+        if report['backup']['exit']:
+            logger.warning(f'Backup exited with code {report["backup"]["exit"]}.')
+
+        logger.info(f'Backup:  {report["backup"]["seconds"]:.2f}s, '
+                    f'{report["backup"]["issues_per_second"]:.1f} issues/s, '
+                    f'{report["backup"]["mb_per_second"]:.1f} MB/s')
+
+        if args.no_restore:
+            return report
+
+        target = MockYouTrackServer(Dataset(seed=args.seed), latency=args.latency, error_rate=args.error_rate,
+                                    seed=args.seed).start()
+        try:
+            measures = measure('restore', [target.url, 'token', folder] + split(args.restore_args), args.verbose)
+            restored = sum(len(p['issues']) for p in target.dataset.projects.values())
+            report['restore'] = step_report(measures, target, restored, target.dataset.payload())
+        finally:
+            target.stop()
+
+        logger.info(f'Restore: {report["restore"]["seconds"]:.2f}s, '
+                    f'{report["restore"]["issues_per_second"]:.1f} issues/s, '
+                    f'{report["restore"]["mb_per_second"]:.1f} MB/s')
+
+        if report['restore']['exit']:
+            logger.warning(f'Restore exited with code {report["restore"]["exit"]}.')
+
+        if restored != issues:
+            logger.warning(f'Restored {restored} issues out of {issues}.')
+
+    return report
+
+
+def codec_samples(size: int, seed: int) -> Dict[str, bytes]:
+    """
+    It generates, with the given seed, a sample of about the given size of each content measured with --codecs: the
+    JSON documents of issues and of their comments shaped as the backup executable writes them, whose texts are made of
+    the words of the README, the lines of an application log, and random bytes standing for already compressed
+    attachments.
+
+    :param size:    The size in bytes of each sample.
+    :type size:     int.
+
+    :param seed:    The seed of the pseudo random generator.
+    :type seed:     int.
+
+    :return: The samples by content.
+    :rtype: Dict[str, bytes].
+    """
+    rnd = Random(seed)
+    words = (Path(__file__).parent / 'README.md').read_text(encoding='utf-8').split()
+
+    def text(count: int) -> str:
+        # The words are drawn as frequent as they are in the README, which is too short to be copied verbatim
+        return ' '.join(rnd.choice(words) for _ in range(count))
+
+    documents, length, n = [], 0, 0
+    while length < size:
+        n += 1
+        created = 1577836800000 + rnd.randrange(10 ** 11)
+        issue = dict(
+            id=f'PRJ-{n}', entityId=f'2-{rnd.randrange(10 ** 6)}', summary=text(rnd.randint(4, 12)),
+            description=text(rnd.randint(20, 400)), created=str(created), updated=str(created + rnd.randrange(10 ** 9)),
+            reporterName=rnd.choice(['root', 'jdoe', 'asmith', 'mrossi']), Priority=rnd.choice(['Normal', 'Major']),
+            State=rnd.choice(['Open', 'Fixed', 'Submitted']), Type=rnd.choice(['Bug', 'Feature', 'Task']),
+            Assignee=rnd.choice(['root', 'jdoe', 'asmith']), votes=str(rnd.randrange(5)), commentsCount='2',
+        )
+        comments = [dict(id=f'4-{rnd.randrange(10 ** 6)}', author=rnd.choice(['root', 'jdoe']), text=text(rnd.randint(
+            5, 120)), created=str(created + rnd.randrange(10 ** 9)), deleted='false') for _ in range(2)]
+        for document in (issue, comments):
+            documents.append(dumps(document))
+            length += len(documents[-1])
+
+    levels = ['DEBUG', 'INFO', 'INFO', 'INFO', 'WARNING']
+    lines, length = [], 0
+    while length < size:
+        lines.append(f'2020-01-0{rnd.randint(1, 9)} 12:{rnd.randrange(60):02}:{rnd.randrange(60):02},'
+                     f'{rnd.randrange(1000):03} {rnd.choice(levels):<7} worker-{rnd.randrange(8)} request '
+                     f'{rnd.randrange(10 ** 6)} served in {rnd.randrange(500)} ms\n')
+        length += len(lines[-1])
+
+    return {
+        'issue JSON': ''.join(documents).encode('utf-8')[:size],
+        'application log': ''.join(lines).encode('utf-8')[:size],
+        'incompressible': rnd.randbytes(size),
+    }
+
+
+def bench_codecs(args: Namespace, logger: Any) -> List[Dict[str, Any]]:
+    """
+    It measures, on a single core, the throughput and the ratio with which each of the CODEC_TRIALS compresses its
+    sample into a zip entry, taking the median time of args.repeat repetitions, and the time taken by the trial
+    compression of a TRIAL_SIZE head the backup executable detects incompressible attachments with.
+
+    :param args:        The namespace with parsed command line arguments.
+    :type args:         Namespace.
+
+    :param logger:      The logger instance object.
+    :type logger:       Logger.
+
+    :return: The measures of each trial.
+    :rtype: List[Dict[str, Any]].
+    """
+    samples = codec_samples(args.codec_size << 20, args.seed)
+    rows = []
+
+    logger.info(f'{"content":<16} {"method":<10} {"MB/s":>8} {"ratio":>7}')
+    for content, method, level in CODEC_TRIALS:
+        data, times, compressed = samples[content], [], 0
+        for _ in range(args.repeat):
+            f = BytesIO()
+            started = perf_counter()
+            with ZipFile(f, 'w', CODECS[method], compresslevel=level) as z:
+                z.writestr('sample', data)
+            times.append(perf_counter() - started)
+            compressed = z.getinfo('sample').compress_size
+
+        rows.append(dict(content=content, method=method, level=level, bytes=len(data),
+                         mb_per_second=round(len(data) / median(times) / 1e6, 1),
+                         ratio=round(compressed / len(data), 3)))
+        logger.info(f'{content:<16} {method + (f" {level}" if level else ""):<10} {rows[-1]["mb_per_second"]:>8} '
+                    f'{rows[-1]["ratio"]:>7}')
+
+    head = samples['incompressible'][:TRIAL_SIZE]
+    times = []
+    for _ in range(args.repeat):
+        started = perf_counter()
+        compress(head, 1)
+        times.append(perf_counter() - started)
+    rows.append(dict(content='trial', method='deflate', level=1, bytes=len(head),
+                     milliseconds=round(median(times) * 1000, 2)))
+    logger.info(f'Trial compression of a {len(head) >> 10} KiB head: {rows[-1]["milliseconds"]} ms')
+
+    return rows
+
+
+def summarize(runs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    It returns, for each step, the median across the given runs of the summarized metrics.
+
+    :param runs:    The reports of the runs.
+    :type runs:     List[Dict[str, Any]].
+
+    :return: See description.
+    :rtype: Dict[str, Any].
+    """
+    summary = {}
+    for step in runs[0]:
+        summary[step] = {}
+        for metric in SUMMARIZED:
+            values = [r[step][metric] for r in runs if r[step][metric] is not None]
+            summary[step][metric] = round(median(values), 4) if values else None
+    return summary
+
+
+def compare(summary: Dict[str, Any], baseline: Dict[str, Any], logger: Any) -> None:
+    """
+    It logs the relative change of each summarized metric with respect to the given baseline summary, flagging the
+    changes for the worse.
+
+    :param summary:     The summary of the current results.
+    :type summary:      Dict[str, Any].
+
+    :param baseline:    The summary of the baseline results.
+    :type baseline:     Dict[str, Any].
+
+    :param logger:      The logger instance object.
+    :type logger:       Logger.
+
+    :return: None.
+    :rtype: None.
+    """
+    for step, metrics in summary.items():
+        for metric, higher_is_better in SUMMARIZED.items():
+            current, previous = metrics.get(metric), baseline.get(step, {}).get(metric)
+            if not current or not previous:
+                continue
+            change = (current - previous) / previous * 100
+            worse = change < 0 if higher_is_better else change > 0
+            line = f'{step} {metric}: {previous} -> {current} ({change:+.1f}%)'
+            if worse and abs(change) >= 5:
+                logger.warning(line)
+            else:
+                logger.info(line)
+
+
+def revision() -> Opt[str]:
+    """
+    It returns the git revision of the benchmarked tree, None when unknown.
+
+    :return: See description.
+    :rtype: Opt[str].
+    """
+    try:
+        result = run(['git', 'rev-parse', 'HEAD'], cwd=str(Path(__file__).parent), capture_output=True, text=True,
+                     stdin=DEVNULL)
+        return result.stdout.strip() or None
+    except OSError:
+        return None
+
+
+def usage(args: List[str]) -> Namespace:
+    """
+    It parses the given args (usually from sys.argv) and checks they conform to the rules of the application. It then
+    returns a namespace with a field for any given or defaulted argument.
+
+    :param args:    The command line arguments to be parsed.
+    :type args:     List[str].
+
+    :return: See description.
+    :rtype: Namespace.
+    """
+    parser = ArgumentParser(description=__doc__)
+
+    # Mandatory arguments
+    parser.add_argument('output', help='The JSON file the results are written to.')
+
+    # Options
+    parser.add_argument('-v', '--verbose', dest='verbose', action='store_true', default=False,
+                        help='It shows the output of the executables.')
+    add_dataset_arguments(parser)
+    parser.add_argument('--repeat', dest='repeat', type=int, default=3, help='The number of repetitions.')
+    parser.add_argument('--backup-args', dest='backup_args', default='',
+                        help='The options given to the backup executable, e.g. "-j 8 --engine async".')
+    parser.add_argument('--restore-args', dest='restore_args', default='',
+                        help='The options given to the restore executable, e.g. "-j 8".')
+    parser.add_argument('--no-restore', dest='no_restore', action='store_true', default=False,
+                        help='Only the backup is benchmarked.')
+    parser.add_argument('--compare', dest='compare', default=None,
+                        help='A previous results file the results are compared with.')
+    parser.add_argument('--codecs', dest='codecs', action='store_true', default=False,
+                        help='The compression methods are measured on generated contents instead.')
+    parser.add_argument('--codec-size', dest='codec_size', type=int, default=8,
+                        help='The size in MiB of the contents the compression methods are measured on.')
+
+    # Parsing
+    args = parser.parse_args(args)
+
+    if args.repeat < 1:
+        parser.error(f'The number of repetitions must be a positive integer: `{args.repeat}`')
+
+    if args.codec_size < 1:
+        parser.error(f'The size of the contents must be a positive integer: `{args.codec_size}`')
+
+    if args.compare and not Path(args.compare).exists():
+        parser.error(f'No such results file: `{args.compare}`')
+
+    return args
+
+
+def main(args: Namespace) -> None:
+    """
+    It starts the application.
+
+    :param args:    The parsed command line arguments as returned by usage().
+    :type args:     Namespace.
+
+    :return: None.
+    :rtype: None.
+    """
+    logging_console_init()
+    logger = getLogger(__name__)
+    logger.setLevel(INFO if not args.verbose else DEBUG)
+
+    parameters = {k: v for k, v in vars(args).items() if k not in ('output', 'verbose', 'compare')}
+
+    if args.codecs:
+        results = dict(
+            version=1,
+            created=datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            revision=revision(),
+            python=python_version(),
+            platform=platform(),
+            parameters=dict(repeat=args.repeat, codec_size=args.codec_size, seed=args.seed),
+            codecs=bench_codecs(args, logger),
+        )
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(dumps(results, indent=1))
+        logger.info(f'\nResults: `{args.output}`')
+        return
+
+    runs = []
+
+    for n in range(args.repeat):
+        logger.info(f'\nRun {n + 1}/{args.repeat}')
+        runs.append(bench(args, logger))
+
+    results = dict(
+        version=1,
+        created=datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        revision=revision(),
+        python=python_version(),
+        platform=platform(),
+        parameters=parameters,
+        runs=runs,
+        summary=summarize(runs),
+    )
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        f.write(dumps(results, indent=1))
+    logger.info(f'\nResults: `{args.output}`')
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = loads(f.read())
+        logger.info(f'\nCompared with `{args.compare}` ({baseline.get("revision")}):')
+        if {k: v for k, v in baseline['parameters'].items() if k != 'repeat'} != \
+                {k: v for k, v in parameters.items() if k != 'repeat'}:
+            logger.warning('The results were produced with different parameters.')
+        compare(results['summary'], baseline['summary'], logger)
+
+
+if __name__ == '__main__':
+    main(usage(argv[1:]))
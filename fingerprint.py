@@ -0,0 +1,171 @@
+"""
+It implements the fingerprint of an issue shared by the backup and restore executables: a canonical digest of what a
+restore reproduces on a target instance, that is the fields it sets, the comments and the attachments of the issue.
+The backup stores the fingerprint of each issue next to it, the restore computes the fingerprint of the issue found on
+the target instance and applies only their differences.
+"""
+
+from hashlib import sha256
+from json import dumps
+from typing import Any, Dict, List, Optional as Opt
+from unicodedata import normalize as unicode_normalize
+
+# The version of the fingerprint format, part of the digest
+VERSION = 1
+
+# The fields of an issue set by the restore, the custom ones under their names
+FIELDS = ('summary', 'description', 'Priority', 'State', 'Type', 'Assignee')
+
+# The fields set by the REST API call updating an issue, the others are set by commands
+BUILTIN_FIELDS = ('summary', 'description')
+
+# The name the fingerprint of an issue is stored under, next to <ID>.json
+FINGERPRINT_NAME = '{}.fingerprint.json'
+
+
+def normalize(value: Any) -> Any:
+    """
+    It returns the canonical form of the given field value or text: strings in NFC form with Unix newlines and no
+    surrounding blanks, multiple values sorted, None for an empty value.
+
+    :param value:   The value.
+    :type value:    Any.
+
+    :return: See description.
+    :rtype: Any.
+    """
+    if isinstance(value, (list, tuple)):
+        values = sorted(v for v in (normalize(v) for v in value) if v is not None)
+        return values if len(values) > 1 else values[0] if values else None
+
+    if value is None:
+        return None
+
+    text = unicode_normalize('NFC', str(value)).replace('\r\n', '\n').strip()
+    return text or None
+
+
+def make_fingerprint(fields: Dict[str, Any], comments: List[str], attachments: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    It returns the fingerprint of an issue with the given fields, comment texts and attachments, each attachment being
+    given by its name, size and, when known, digest. The fingerprint holds their canonical form, and the digest of
+    its canonical JSON serialization.
+
+    :param fields:      The fields of the issue by name, those missing from FIELDS are ignored.
+    :type fields:       Dict[str, Any].
+
+    :param comments:    The texts of the comments of the issue, in order.
+    :type comments:     List[str].
+
+    :param attachments: The attachments of the issue, dictionaries with name, size and digest.
+    :type attachments:  List[Dict[str, Any]].
+
+    :return: See description.
+    :rtype: Dict[str, Any].
+    """
+    fingerprint = dict(
+        version=VERSION,
+        fields={name: normalize(fields.get(name)) for name in FIELDS},
+        comments=[text for text in (normalize(c) for c in comments) if text is not None],
+        attachments=sorted((dict(name=a['name'], size=a.get('size'), digest=a.get('digest')) for a in attachments),
+                           key=lambda a: (a['name'], a['size'] or 0)),
+    )
+    canonical = dumps(fingerprint, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    fingerprint['digest'] = f'sha256:{sha256(canonical.encode("utf-8")).hexdigest()}'
+    return fingerprint
+
+
+def target_fingerprint(issue: Dict[str, Any], backed_up: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    It returns the fingerprint of the given issue of a target instance, as answered by the REST API. The content of
+    its attachments is not downloaded: an attachment with the name and the size of a backed up one is given the
+    digest recorded by the given backed up fingerprint, so that the fingerprints of issues with the same content match.
+
+    :param issue:       The issue with its summary, description, custom fields, comments and attachments.
+    :type issue:        Dict[str, Any].
+
+    :param backed_up:   The fingerprint of the backed up issue.
+    :type backed_up:    Dict[str, Any].
+
+    :return: See description.
+    :rtype: Dict[str, Any].
+    """
+    fields = dict(summary=issue.get('summary'), description=issue.get('description'))
+    for field in issue.get('customFields') or []:
+        fields[field.get('name')] = field_value(field.get('value'))
+
+    digests = {(a['name'], a['size']): a['digest'] for a in backed_up['attachments']}
+    attachments = [dict(name=a.get('name'), size=a.get('size'), digest=digests.get((a.get('name'), a.get('size'))))
+                   for a in issue.get('attachments') or []]
+
+    comments = [c.get('text') for c in issue.get('comments') or [] if not c.get('deleted')]
+    return make_fingerprint(fields, comments, attachments)
+
+
+def field_value(value: Any) -> Any:
+    """
+    It returns the value of a custom field answered by the REST API as the legacy REST API gives it: the name of an
+    enumerated value, the login of a user, the text of a text, as they are for simple values.
+
+    :param value:   The value.
+    :type value:    Any.
+
+    :return: See description.
+    :rtype: Any.
+    """
+    if isinstance(value, list):
+        return [field_value(v) for v in value]
+
+    if isinstance(value, dict):
+        for key in ('login', 'name', 'text', 'presentation'):
+            if value.get(key) is not None:
+                return value[key]
+        return None
+
+    return value
+
+
+def differences(backed_up: Dict[str, Any], target: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    It returns what must be applied to the target issue with the given fingerprint for it to match the given backed up
+    fingerprint: the fields whose value differs, with their backed up value, the backed up comments missing from the
+    target issue, and the names of the backed up attachments missing from it. Nothing is ever removed from the target
+    issue, therefore a field empty in the backup is left as it is.
+
+    :param backed_up:   The fingerprint of the backed up issue.
+    :type backed_up:    Dict[str, Any].
+
+    :param target:      The fingerprint of the target issue.
+    :type target:       Dict[str, Any].
+
+    :return: See description.
+    :rtype: Dict[str, Any].
+    """
+    fields = {name: value for name, value in backed_up['fields'].items()
+              if value is not None and value != target['fields'].get(name)}
+
+    # Comments are matched by text, each one at most once
+    comments, existing = [], list(target['comments'])
+    for text in backed_up['comments']:
+        if text in existing:
+            existing.remove(text)
+        else:
+            comments.append(text)
+
+    names = set(a['name'] for a in target['attachments'])
+    attachments = [a['name'] for a in backed_up['attachments'] if a['name'] not in names]
+
+    return dict(fields=fields, comments=comments, attachments=attachments)
+
+
+def is_unchanged(changes: Opt[Dict[str, Any]]) -> bool:
+    """
+    It tells whether the given differences, as returned by differences(), are empty.
+
+    :param changes: The differences.
+    :type changes:  Opt[Dict[str, Any]].
+
+    :return: See description.
+    :rtype: bool.
+    """
+    return not changes or not any(changes.values())
@@ -0,0 +1,351 @@
+"""
+It implements the instrumentation shared by the backup and restore executables: the time spent in each phase of a
+run, the number of operations and the bytes they handled, their latency percentiles and the totals of each project.
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from json import dumps
+from threading import Lock
+from time import perf_counter
+from typing import Any, Dict, Iterator, List, Optional as Opt
+
+# The phases in the order they are reported, those missing from a run are omitted
+PHASES = (
+    'listing', 'metadata', 'download', 'serialization', 'compression', 'write', 'digest',
+    'project_lookup', 'project_create', 'issue_lookup', 'read', 'create', 'update', 'upload',
+)
+
+# The phases moving the content of attachments over the network
+TRANSFERS = ('download', 'upload')
+
+PERCENTILES = (50, 95, 99)
+
+
+class Sample:
+    """
+    It is a measure being taken by a timer, whose size can be set while the timed operation runs.
+    """
+
+    __slots__ = ('size', 'nested')
+
+    def __init__(self) -> None:
+        self.size = 0
+        self.nested = 0.0
+
+
+# The sample of the innermost timer running in the current thread or task
+current: ContextVar[Opt[Sample]] = ContextVar('current', default=None)
+
+
+def percentile(values: List[float], p: int) -> float:
+    """
+    It returns the given percentile of the given sorted values, by nearest rank.
+
+    :param values:  The sorted values, at least one.
+    :type values:   List[float].
+
+    :param p:       The percentile, between 0 and 100.
+    :type p:        int.
+
+    :return: See description.
+    :rtype: float.
+    """
+    return values[max(0, -(-len(values) * p // 100) - 1)]
+
+
+class Metered:
+    """
+    It wraps a file-like object timing its reads and writes, which are accounted as a single operation of the given
+    phase once closed. Their time is excluded from the enclosing timer, if any.
+    """
+
+    def __init__(self, registry: 'Metrics', stream: Any, phase: str, project: Opt[str] = None,
+                 seconds: float = 0.0) -> None:
+        """
+        It creates an instance of the Metered class.
+
+        :param registry:    The metrics the operation is accounted into.
+        :type registry:     Metrics.
+
+        :param stream:      The wrapped file-like object, closed along with the instance.
+        :type stream:       Any.
+
+        :param phase:       The phase the operation belongs to.
+        :type phase:        str.
+
+        :param project:     The project the operation is accounted to, if any.
+        :type project:      Opt[str].
+
+        :param seconds:     The time already spent by the operation, opening the stream for instance.
+        :type seconds:      float.
+        """
+        self.registry = registry
+        self.stream = stream
+        self.phase = phase
+        self.project = project
+        self.seconds = seconds
+        self.size = 0
+        self.accounted = False
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.stream, name)
+
+    def __enter__(self) -> 'Metered':
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    def account(self, started: float, size: int) -> None:
+        elapsed = perf_counter() - started
+        self.seconds += elapsed
+        self.size += size
+        self.registry.exclude(elapsed)
+
+    def read(self, size: int = -1) -> bytes:
+        started = perf_counter()
+        data = self.stream.read(size)
+        self.account(started, len(data))
+        return data
+
+    def readinto(self, buffer: Any) -> int:
+        started = perf_counter()
+        size = self.stream.readinto(buffer)
+        self.account(started, size or 0)
+        return size
+
+    def write(self, data: Any) -> int:
+        started = perf_counter()
+        size = self.stream.write(data)
+        self.account(started, len(data))
+        return size
+
+    def close(self) -> None:
+        if not self.accounted:
+            self.accounted = True
+            self.registry.record(self.phase, self.seconds, self.size, self.project)
+        self.stream.close()
+
+
+class Metrics:
+    """
+    It collects, from several threads or asyncio tasks, the duration and the size of the operations performed in each
+    phase of a run, in total and by project. The time of a timer excludes the time of the timers and of the metered
+    streams nested into it, so that the phases add up to the work actually done.
+    """
+
+    def __init__(self) -> None:
+        """
+        It creates an instance of the Metrics class.
+        """
+        self.lock = Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        """
+        It drops the collected metrics and restarts the elapsed time, at the beginning of a run.
+
+        :return: None.
+        :rtype: None.
+        """
+        with self.lock:
+            self.started = perf_counter()
+            self.durations = {}
+            self.sizes = {}
+            self.projects = {}
+            self.issues = {}
+
+    def record(self, phase: str, seconds: float, size: int = 0, project: Opt[str] = None) -> None:
+        """
+        It accounts an operation of the given phase.
+
+        :param phase:       The phase of the operation.
+        :type phase:        str.
+
+        :param seconds:     The duration of the operation.
+        :type seconds:      float.
+
+        :param size:        The number of bytes handled by the operation.
+        :type size:         int.
+
+        :param project:     The project the operation is accounted to, if any.
+        :type project:      Opt[str].
+
+        :return: None.
+        :rtype: None.
+        """
+        with self.lock:
+            self.durations.setdefault(phase, []).append(seconds)
+            self.sizes[phase] = self.sizes.get(phase, 0) + size
+            if project:
+                totals = self.projects.setdefault(project, {}).setdefault(phase, [0, 0, 0.0])
+                totals[0] += 1
+                totals[1] += size
+                totals[2] += seconds
+
+    def exclude(self, seconds: float) -> None:
+        """
+        It excludes the given time from the innermost running timer, if any.
+
+        :param seconds:     The time spent by a nested operation.
+        :type seconds:      float.
+
+        :return: None.
+        :rtype: None.
+        """
+        sample = current.get()
+        if sample is not None:
+            sample.nested += seconds
+
+    def issue(self, project: str) -> None:
+        """
+        It accounts an issue handled in the given project.
+
+        :param project:     The project identifier.
+        :type project:      str.
+
+        :return: None.
+        :rtype: None.
+        """
+        with self.lock:
+            self.issues[project] = self.issues.get(project, 0) + 1
+
+    @contextmanager
+    def timer(self, phase: str, project: Opt[str] = None) -> Iterator[Sample]:
+        """
+        It accounts the operation running inside the context as an operation of the given phase. The size of the
+        operation can be set on the yielded sample.
+
+        :param phase:       The phase of the operation.
+        :type phase:        str.
+
+        :param project:     The project the operation is accounted to, if any.
+        :type project:      Opt[str].
+
+        :return: See description.
+        :rtype: Iterator[Sample].
+        """
+        sample = Sample()
+        token = current.set(sample)
+        started = perf_counter()
+
+        try:
+            yield sample
+        finally:
+            elapsed = perf_counter() - started
+            current.reset(token)
+            self.exclude(elapsed)
+            self.record(phase, elapsed - sample.nested, sample.size, project)
+
+    def metered(self, stream: Any, phase: str, project: Opt[str] = None, seconds: float = 0.0) -> Metered:
+        """
+        It wraps the given file-like object so that its reads and writes are accounted as an operation of the given
+        phase once closed.
+
+        :param stream:      The file-like object.
+        :type stream:       Any.
+
+        :param phase:       The phase of the operation.
+        :type phase:        str.
+
+        :param project:     The project the operation is accounted to, if any.
+        :type project:      Opt[str].
+
+        :param seconds:     The time already spent by the operation.
+        :type seconds:      float.
+
+        :return: See description.
+        :rtype: Metered.
+        """
+        return Metered(self, stream, phase, project, seconds)
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        It returns the collected metrics: for each phase the number of operations, their bytes, their total time and
+        their latency percentiles in milliseconds; for each project the issues handled and the totals of each phase.
+
+        :return: See description.
+        :rtype: Dict[str, Any].
+        """
+        with self.lock:
+            phases = {}
+            for phase in sorted(self.durations, key=lambda p: (PHASES.index(p) if p in PHASES else len(PHASES), p)):
+                durations = sorted(self.durations[phase])
+                phases[phase] = dict(count=len(durations), bytes=self.sizes[phase], seconds=round(sum(durations), 4))
+                phases[phase].update({f'p{p}_ms': round(percentile(durations, p) * 1000, 3) for p in PERCENTILES})
+
+            projects = {}
+            for project in sorted(set(self.projects) | set(self.issues)):
+                totals = self.projects.get(project, {})
+                projects[project] = dict(
+                    issues=self.issues.get(project, 0),
+                    bytes=sum(totals[p][1] for p in TRANSFERS if p in totals),
+                    seconds=round(sum(t[2] for t in totals.values()), 4),
+                    phases={p: dict(count=t[0], bytes=t[1], seconds=round(t[2], 4)) for p, t in totals.items()},
+                )
+
+        return dict(elapsed=round(perf_counter() - self.started, 4), phases=phases, projects=projects)
+
+    def table(self) -> str:
+        """
+        It returns the collected metrics as a plain text table, by phase and then by project.
+
+        :return: See description.
+        :rtype: str.
+        """
+        summary = self.summary()
+        lines = [f'{"phase":<16}{"count":>9}{"MB":>11}{"seconds":>11}{"p50 ms":>10}{"p95 ms":>10}{"p99 ms":>10}']
+
+        for phase, m in summary['phases'].items():
+            lines.append(f'{phase:<16}{m["count"]:>9}{m["bytes"] / 1e6:>11.2f}{m["seconds"]:>11.2f}'
+                         f'{m["p50_ms"]:>10.1f}{m["p95_ms"]:>10.1f}{m["p99_ms"]:>10.1f}')
+
+        if summary['projects']:
+            lines.append('')
+            lines.append(f'{"project":<16}{"issues":>9}{"MB":>11}{"seconds":>11}')
+            for project, m in summary['projects'].items():
+                lines.append(f'{project:<16}{m["issues"]:>9}{m["bytes"] / 1e6:>11.2f}{m["seconds"]:>11.2f}')
+
+        lines.append(f'\nPhases are timed exclusive of the phases nested into them, across all the workers: their '
+                     f'total may exceed the elapsed {summary["elapsed"]:.2f} seconds.')
+        return '\n'.join(lines)
+
+    def save(self, path: Any) -> None:
+        """
+        It writes the collected metrics as JSON into the file at the given path.
+
+        :param path:    The path of the file.
+        :type path:     Any.
+
+        :return: None.
+        :rtype: None.
+        """
+        with open(str(path), 'w', encoding='utf-8') as f:
+            f.write(dumps(self.summary(), indent=1))
+
+    def report(self, logger: Any, path: Opt[str] = None) -> None:
+        """
+        It logs the collected metrics as a table and, when a path is given, writes them as JSON into that file.
+
+        :param logger:  The logger instance object.
+        :type logger:   Logger.
+
+        :param path:    The path of the JSON file, if any.
+        :type path:     Opt[str].
+
+        :return: None.
+        :rtype: None.
+        """
+        logger.info(f'\nMetrics:\n{self.table()}')
+
+        if path:
+            try:
+                self.save(path)
+                logger.info(f'Metrics: `{path}`')
+            except OSError as e:
+                logger.error(f'The metrics cannot be written to `{path}`: {e}')
+
+
+# The metrics of the current run
+metrics = Metrics()
@@ -0,0 +1,826 @@
+"""
+It serves a synthetic, self-contained YouTrack instance speaking the legacy REST dialect used by the youtrack client,
+with configurable projects, issues, attachments, latency and injected failures. It is meant for benchmarks and for
+trying the backup and restore executables on a machine with no YouTrack instance and no network.
+"""
+
+from argparse import ArgumentParser, Namespace
+from calendar import timegm
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from json import dumps
+from random import Random
+from re import compile as re_compile
+from sys import argv
+from threading import Lock, Thread
+from time import sleep, strptime
+from typing import Any, Dict, List, Optional as Opt, Tuple
+from urllib.parse import urlsplit, parse_qs, unquote
+from xml.sax.saxutils import escape, quoteattr
+
+
+# The creation timestamp in milliseconds of the first synthetic issue
+BASE_TIMESTAMP = 1600000000000
+
+XSI = 'xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance"'
+
+# The size of the random block incompressible attachments repeat
+BLOCK_SIZE = 4096
+
+# The size of the chunks attachment contents are sent with
+CHUNK_SIZE = 1 << 20
+
+# The line compressible attachments repeat
+LOG_LINE = b'log line of a rather repetitive attachment\n'
+
+# The custom fields defined on a new instance
+CUSTOM_FIELDS = ('Priority', 'State', 'Type', 'Assignee')
+
+
+class Dataset:
+    """
+    It holds the synthetic projects, issues, comments, links, tags, work items and attachments served by the mock
+    server. Each issue but the first of a project relates to the previous one and every third issue is starred. The
+    contents of synthetic attachments are generated on demand from their identifier, so that large datasets take little
+    memory; the contents of uploaded attachments are kept as they are.
+    """
+
+    def __init__(self, projects: int = 0, issues: int = 0, attachments: int = 0, attachment_size: int = 0,
+                 comments: int = 0, work_items: int = 0, seed: int = 0) -> None:
+        """
+        It creates an instance of the Dataset class with the given shape.
+
+        :param projects:        The number of projects to generate.
+        :type projects:         int.
+
+        :param issues:          The number of issues per project.
+        :type issues:           int.
+
+        :param attachments:     The number of attachments per issue, half compressible text and half random bytes.
+        :type attachments:      int.
+
+        :param attachment_size: The size in bytes of each attachment.
+        :type attachment_size:  int.
+
+        :param comments:        The number of comments per issue.
+        :type comments:         int.
+
+        :param work_items:      The number of work items per issue.
+        :type work_items:       int.
+
+        :param seed:            The seed of the pseudo random generator.
+        :type seed:             int.
+        """
+        self.lock = Lock()
+        self.projects = {}
+        self.attachments = {}
+        self.seed = seed
+        rnd = Random(seed)
+
+        for p in range(projects):
+            # Project identifiers are made of letters only, PRJA, PRJB..
+            project_id = 'PRJ' + ''.join(chr(65 + int(d)) for d in str(p))
+            self.add_project(project_id, f'Project {project_id}', f'Synthetic project {project_id}', 'root')
+
+            for n in range(1, issues + 1):
+                issue = self.add_issue(project_id, dict(
+                    summary=f'Issue {n} of {project_id}',
+                    description=' '.join(rnd.choice(['lorem', 'ipsum', 'dolor', 'sit', 'amet']) for _ in range(64)),
+                    Priority=rnd.choice(['Normal', 'Major', 'Minor']),
+                    State=rnd.choice(['Open', 'Fixed', 'Submitted']),
+                    Type=rnd.choice(['Bug', 'Feature', 'Task']),
+                    Assignee='root',
+                ))
+
+                for c in range(comments):
+                    issue['comments'].append(dict(
+                        id=f'{project_id}-{n}-c{c}', author='root', text=f'Comment {c}', created=BASE_TIMESTAMP + c))
+
+                for w in range(work_items):
+                    issue['workitems'].append(dict(
+                        id=f'{project_id}-{n}-w{w}', author='root', date=BASE_TIMESTAMP + w, duration=30 * (w + 1),
+                        text=f'Work item {w}'))
+
+                if n > 1:
+                    issue['links'].append(dict(type='Relates', direction='BOTH', target=f'{project_id}-{n - 1}'))
+
+                if n % 3 == 0:
+                    issue['tags'].append('Star')
+
+                for a in range(attachments):
+                    self.add_attachment(issue, f'file{a}.{"bin" if a % 2 else "txt"}', None, 'root',
+                                        size=attachment_size, random=bool(a % 2))
+
+    def add_project(self, project_id: str, name: str, description: str, lead: str) -> Dict[str, Any]:
+        """
+        It adds a new empty project to the dataset and returns it.
+
+        :param project_id:  The project identifier.
+        :type project_id:   str.
+
+        :param name:        The project name.
+        :type name:         str.
+
+        :param description: The project description.
+        :type description:  str.
+
+        :param lead:        The login of the project lead.
+        :type lead:         str.
+
+        :return: See description.
+        :rtype: Dict[str, Any].
+        """
+        with self.lock:
+            project = dict(id=project_id, name=name, description=description, lead=lead, issues={}, next=1)
+            self.projects[project_id] = project
+            return project
+
+    def add_issue(self, project_id: str, fields: Dict[str, str]) -> Dict[str, Any]:
+        """
+        It adds a new issue to the given project and returns it.
+
+        :param project_id:  The project identifier.
+        :type project_id:   str.
+
+        :param fields:      The issue fields.
+        :type fields:       Dict[str, str].
+
+        :return: See description.
+        :rtype: Dict[str, Any].
+        """
+        with self.lock:
+            project = self.projects[project_id]
+            number = project['next']
+            project['next'] += 1
+            issue = dict(
+                id=f'{project_id}-{number}', project=project_id, number=number, created=BASE_TIMESTAMP + number,
+                updated=BASE_TIMESTAMP + number, fields=dict(fields), comments=[], attachments=[], links=[], tags=[],
+                workitems=[],
+            )
+            project['issues'][number] = issue
+            return issue
+
+    def add_attachment(self, issue: Dict[str, Any], name: str, content: Opt[bytes], author: str,
+                       created: Opt[int] = None, size: int = 0, random: bool = False) -> Dict[str, Any]:
+        """
+        It adds a new attachment to the given issue and returns it.
+
+        :param issue:   The issue the attachment belongs to.
+        :type issue:    Dict[str, Any].
+
+        :param name:    The attachment file name.
+        :type name:     str.
+
+        :param content: The attachment content, None to generate size bytes on demand.
+        :type content:  Opt[bytes].
+
+        :param author:  The login of the attachment author.
+        :type author:   str.
+
+        :param created: The creation timestamp, the one of the issue when None.
+        :type created:  Opt[int].
+
+        :param size:    The size of the generated content.
+        :type size:     int.
+
+        :param random:  Whether the generated content is made of random bytes rather than repeated text.
+        :type random:   bool.
+
+        :return: See description.
+        :rtype: Dict[str, Any].
+        """
+        with self.lock:
+            attachment = dict(
+                id=f'67-{len(self.attachments) + 1}', name=name, content=content, author=author,
+                created=created if created is not None else issue['created'], group='All Users',
+                size=len(content) if content is not None else size, random=random,
+            )
+            self.attachments[attachment['id']] = attachment
+            issue['attachments'].append(attachment)
+            return attachment
+
+    def content(self, attachment: Dict[str, Any]) -> bytes:
+        """
+        It returns the content of the given attachment.
+
+        :param attachment:  The attachment.
+        :type attachment:   Dict[str, Any].
+
+        :return: See description.
+        :rtype: bytes.
+        """
+        if attachment['content'] is not None:
+            return attachment['content']
+
+        if attachment['random']:
+            block = Random(f'{self.seed}:{attachment["id"]}').randbytes(BLOCK_SIZE)
+        else:
+            block = LOG_LINE
+        return (block * (attachment['size'] // len(block) + 1))[:attachment['size']]
+
+    def payload(self) -> int:
+        """
+        It returns the total size in bytes of the attachments of the dataset.
+
+        :return: See description.
+        :rtype: int.
+        """
+        return sum(a['size'] for a in self.attachments.values())
+
+    def find_issue(self, issue_id: str) -> Opt[Dict[str, Any]]:
+        """
+        It returns the issue with the given identifier or None when it does not exist.
+
+        :param issue_id:    The issue identifier.
+        :type issue_id:     str.
+
+        :return: See description.
+        :rtype: Opt[Dict[str, Any]].
+        """
+        project_id, _, number = issue_id.rpartition('-')
+        project = self.projects.get(project_id)
+        if not project or not number.isdigit():
+            return None
+        return project['issues'].get(int(number))
+
+    def users(self) -> List[str]:
+        """
+        It returns the logins of the users of the dataset: the administrator of a new instance, the project leads and
+        the assignees and authors of the issues.
+
+        :return: See description.
+        :rtype: List[str].
+        """
+        logins = set(['root'] + [p['lead'] for p in self.projects.values()])
+        for issue in self.all_issues():
+            logins.update(c['author'] for c in issue['comments'])
+            if issue['fields'].get('Assignee'):
+                logins.add(issue['fields']['Assignee'])
+        return sorted(logins)
+
+    def all_issues(self) -> List[Dict[str, Any]]:
+        """
+        It returns all the issues of all the projects ordered by project and number.
+
+        :return: See description.
+        :rtype: List[Dict[str, Any]].
+        """
+        return [i for p in self.projects.values() for _, i in sorted(p['issues'].items())]
+
+
+def issue_xml(issue: Dict[str, Any], with_fields: Opt[List[str]] = None) -> str:
+    """
+    It renders the given issue as a legacy REST issue element.
+
+    :param issue:       The issue to render.
+    :type issue:        Dict[str, Any].
+
+    :param with_fields: When given only these fields are rendered.
+    :type with_fields:  Opt[List[str]].
+
+    :return: See description.
+    :rtype: str.
+    """
+    fields = [
+        ('projectShortName', issue['project'], None),
+        ('numberInProject', str(issue['number']), None),
+        ('summary', issue['fields'].get('summary', ''), None),
+        ('description', issue['fields'].get('description', ''), None),
+        ('created', str(issue['created']), None),
+        ('updated', str(issue['updated']), None),
+        ('reporterName', 'root', None),
+    ]
+    for name in ('Priority', 'State', 'Type', 'Assignee'):
+        if issue['fields'].get(name) is not None:
+            fields.append((name, issue['fields'][name], 'CustomFieldValue'))
+
+    out = [f'<issue id={quoteattr(issue["id"])}>']
+    for name, value, type_ in fields:
+        if with_fields and name not in with_fields:
+            continue
+        type_attr = f' xsi:type="{type_}"' if type_ else ''
+        out.append(f'<field name="{name}"{type_attr}><value>{escape(value)}</value></field>')
+    if not with_fields:
+        for c in issue['comments']:
+            out.append(f'<comment id={quoteattr(c["id"])} author={quoteattr(c["author"])} '
+                       f'text={quoteattr(c["text"])} created="{c["created"]}"/>')
+    out.append('</issue>')
+    return ''.join(out)
+
+
+def issue_json(issue: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    It renders the given issue as answered by the REST API, with its comments, links and tags.
+
+    :param issue:   The issue to render.
+    :type issue:    Dict[str, Any].
+
+    :return: See description.
+    :rtype: Dict[str, Any].
+    """
+    return dict(
+        idReadable=issue['id'],
+        comments=[dict(id=c['id'], text=c['text'], created=c['created'], author=dict(login=c['author']))
+                  for c in issue['comments']],
+        links=[dict(direction=k['direction'], linkType=dict(name=k['type']), issues=[dict(idReadable=k['target'])])
+               for k in issue['links']],
+        tags=[dict(name=t) for t in issue['tags']],
+    )
+
+
+def work_items_json(issue: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    It renders the work items of the given issue as answered by the REST API.
+
+    :param issue:   The issue.
+    :type issue:    Dict[str, Any].
+
+    :return: See description.
+    :rtype: List[Dict[str, Any]].
+    """
+    return [dict(id=w['id'], issue=dict(idReadable=issue['id']), author=dict(login=w['author']), date=w['date'],
+                 duration=dict(minutes=w['duration']), text=w['text']) for w in issue['workitems']]
+
+
+def activities_json(issue: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    It renders the change history of the given issue as answered by the REST API: its creation, then the addition of
+    its comments and of its work items.
+
+    :param issue:   The issue.
+    :type issue:    Dict[str, Any].
+
+    :return: See description.
+    :rtype: List[Dict[str, Any]].
+    """
+    target = dict(idReadable=issue['id'])
+    out = [dict(id=f'{issue["id"]}.0', timestamp=issue['created'], author=dict(login='root'),
+                category=dict(id='IssueCreatedCategory'), target=target)]
+    for c in issue['comments']:
+        out.append(dict(id=f'{c["id"]}.0', timestamp=c['created'], author=dict(login=c['author']),
+                        category=dict(id='CommentsCategory'), target=dict(id=c['id'], issue=target),
+                        added=[dict(id=c['id'], text=c['text'])]))
+    for w in issue['workitems']:
+        out.append(dict(id=f'{w["id"]}.0', timestamp=w['date'], author=dict(login=w['author']),
+                        category=dict(id='WorkItemCategory'), target=target, added=[dict(id=w['id'])]))
+    return out
+
+
+class MockYouTrackHandler(BaseHTTPRequestHandler):
+    """
+    It handles the requests against the mock YouTrack server. Handlers are routed by method and path through the
+    routes class attribute, and are counted by name in the requests counter of the server.
+    """
+
+    protocol_version = 'HTTP/1.1'
+    routes = []
+
+    # Headers and body are written separately: with Nagle the body would wait for the delayed ACK of the headers
+    disable_nagle_algorithm = True
+
+    def log_message(self, fmt: str, *args: Any) -> None:
+        """
+        It silences the default per request logging.
+        """
+        pass
+
+    @property
+    def dataset(self) -> Dataset:
+        return self.server.dataset
+
+    def reply(self, status: int, body: bytes = b'', content_type: str = 'application/xml',
+              headers: Opt[Dict[str, str]] = None) -> None:
+        """
+        It sends a complete response with the given status, body and headers.
+        """
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        if self.command != 'HEAD':
+            # Large bodies are sent in chunks not to copy them whole into the socket buffers
+            view = memoryview(body)
+            for offset in range(0, len(body), CHUNK_SIZE):
+                self.wfile.write(view[offset:offset + CHUNK_SIZE])
+
+    def reply_xml(self, text: str, status: int = 200) -> None:
+        self.reply(status, f'<?xml version="1.0" encoding="UTF-8"?>{text}'.encode('utf-8'))
+
+    def reply_json(self, data: Any, status: int = 200) -> None:
+        self.reply(status, dumps(data).encode('utf-8'), 'application/json')
+
+    def not_found(self) -> None:
+        self.reply(404, b'<error>Not found</error>')
+
+    def read_body(self) -> bytes:
+        length = int(self.headers.get('Content-Length') or 0)
+        return self.rfile.read(length) if length else b''
+
+    def dispatch(self) -> None:
+        """
+        It accounts the request, applies injected latency and errors, and routes it to its handler. Injected errors
+        are 503 responses asking to retry at once, which a client can safely retry whatever the method.
+        """
+        server = self.server
+        parts = urlsplit(self.path)
+        path, query = unquote(parts.path), parse_qs(parts.query)
+
+        for method, pattern, handler in self.routes:
+            match = pattern.match(path)
+            if method == self.command and match:
+                break
+        else:
+            self.read_body()
+            return self.not_found()
+
+        with server.lock:
+            server.requests[f'{self.command} {handler.__name__}'] += 1
+            fail = server.random.random() < server.error_rate
+
+        if server.latency:
+            sleep(server.latency)
+
+        if fail:
+            self.read_body()
+            return self.reply(503, b'<error>Injected failure</error>', headers={'Retry-After': '0'})
+
+        return handler(self, query, *match.groups())
+
+    do_GET = do_PUT = do_POST = do_DELETE = dispatch
+
+    def project_ids(self, query: Dict[str, List[str]]) -> None:
+        refs = ''.join(f'<project id={quoteattr(p)} url="/admin/project/{p}"/>' for p in self.dataset.projects)
+        self.reply_xml(f'<projectRefs>{refs}</projectRefs>')
+
+    def project(self, query: Dict[str, List[str]], project_id: str) -> None:
+        p = self.dataset.projects.get(project_id)
+        if not p:
+            return self.not_found()
+        self.reply_xml(f'<project id={quoteattr(p["id"])} name={quoteattr(p["name"])} '
+                       f'description={quoteattr(p["description"])} lead={quoteattr(p["lead"])} '
+                       f'startingNumber="1"/>')
+
+    def create_project(self, query: Dict[str, List[str]], project_id: str) -> None:
+        self.read_body()
+        if project_id in self.dataset.projects:
+            return self.reply(400, b'<error>Project already exists</error>')
+        get = lambda k: query.get(k, [''])[0]
+        self.dataset.add_project(project_id, get('projectName'), get('description').strip(), get('projectLeadLogin'))
+        self.reply(201, b'', headers={'Location': f'/rest/admin/project/{project_id}'})
+
+    def filtered(self, query: Dict[str, List[str]], project_id: Opt[str] = None) -> List[Dict[str, Any]]:
+        """
+        It applies to the dataset the subset of the YouTrack query language understood by the mock: the project,
+        issue id and updated since conditions.
+        """
+        text = query.get('filter', [''])[0]
+        issues = self.dataset.projects[project_id]['issues'].values() if project_id else self.dataset.all_issues()
+        issues = sorted(issues, key=lambda i: (i['project'], i['number']))
+
+        m = re_compile(r'project:\s*\{?([^\s}]+)\}?').search(text)
+        if m:
+            issues = [i for i in issues if i['project'] == m.group(1)]
+
+        m = re_compile(r'issue id:\s*([^:]+?)(?:\s+\w+:|$)').search(text)
+        if m:
+            ids = set(x for x in re_compile(r'[\s,]+').split(m.group(1)) if x)
+            issues = [i for i in issues if i['id'] in ids]
+
+        m = re_compile(r'updated:\s*(\d{4}-\d{2}-\d{2})').search(text)
+        if m:
+            since = timegm(strptime(m.group(1), '%Y-%m-%d')) * 1000
+            issues = [i for i in issues if i['updated'] >= since]
+
+        return issues
+
+    def api_filtered(self, query: Dict[str, List[str]], name: str = 'query') -> List[Dict[str, Any]]:
+        return self.filtered(dict(filter=query.get(name, [''])))
+
+    def api_page(self, items: List[Any], query: Dict[str, List[str]]) -> List[Any]:
+        skip = int(query.get('$skip', ['0'])[0] or 0)
+        top = int(query.get('$top', ['42'])[0] or 42)
+        return items[skip:skip + top]
+
+    def fields_json(self, issue: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        It renders the fields, the comments and the attachments of the given issue as answered by the REST API, all
+        that its fingerprint is computed from.
+        """
+        fields = issue['fields']
+        return dict(
+            idReadable=issue['id'], summary=fields.get('summary'), description=fields.get('description'),
+            customFields=[dict(name=k, value=dict(name=v) if v else None) for k, v in fields.items()
+                          if k not in ('summary', 'description')],
+            comments=[dict(text=c['text'], deleted=False) for c in issue['comments']],
+            attachments=[dict(name=a['name'], size=a['size']) for a in issue['attachments']],
+        )
+
+    def api_issues(self, query: Dict[str, List[str]]) -> None:
+        self.reply_json([dict(self.fields_json(i), **issue_json(i))
+                         for i in self.api_page(self.api_filtered(query), query)])
+
+    def api_issue(self, query: Dict[str, List[str]], issue_id: str) -> None:
+        i = self.dataset.find_issue(issue_id)
+        if not i:
+            return self.not_found()
+        self.reply_json(self.fields_json(i))
+
+    def api_users(self, query: Dict[str, List[str]]) -> None:
+        self.reply_json(self.api_page([dict(login=u) for u in self.dataset.users()], query))
+
+    def api_custom_fields(self, query: Dict[str, List[str]]) -> None:
+        self.reply_json(self.api_page([dict(name=f) for f in CUSTOM_FIELDS], query))
+
+    def api_work_items(self, query: Dict[str, List[str]]) -> None:
+        items = [w for i in self.api_filtered(query) for w in work_items_json(i)]
+        self.reply_json(self.api_page(items, query))
+
+    def api_activities(self, query: Dict[str, List[str]]) -> None:
+        # The cursor is the offset of the next activity
+        items = [a for i in self.api_filtered(query, 'issueQuery') for a in activities_json(i)]
+        skip = int(query.get('cursor', ['0'])[0] or 0)
+        top = int(query.get('$top', ['100'])[0] or 100)
+        page = items[skip:skip + top]
+        self.reply_json(dict(activities=page, afterCursor=str(skip + len(page)), hasAfter=skip + top < len(items)))
+
+    def page(self, issues: List[Dict[str, Any]], query: Dict[str, List[str]]) -> List[Dict[str, Any]]:
+        after = int(query.get('after', ['0'])[0] or 0)
+        max_ = int(query.get('max', ['10'])[0] or 10)
+        return issues[after:after + max_]
+
+    def issues_by_project(self, query: Dict[str, List[str]], project_id: str) -> None:
+        if project_id not in self.dataset.projects:
+            return self.not_found()
+        issues = self.page(self.filtered(query, project_id), query)
+        self.reply_xml(f'<issues {XSI}>{"".join(issue_xml(i) for i in issues)}</issues>')
+
+    def issues(self, query: Dict[str, List[str]]) -> None:
+        issues = self.page(self.filtered(query), query)
+        with_fields = query.get('with')
+        self.reply_xml(f'<issueCompacts {XSI}>{"".join(issue_xml(i, with_fields) for i in issues)}</issueCompacts>')
+
+    def issue_count(self, query: Dict[str, List[str]]) -> None:
+        self.reply_json(dict(value=len(self.filtered(query))))
+
+    def issue(self, query: Dict[str, List[str]], issue_id: str) -> None:
+        i = self.dataset.find_issue(issue_id)
+        if not i:
+            return self.not_found()
+        self.reply_xml(issue_xml(i).replace('<issue ', f'<issue {XSI} ', 1))
+
+    def create_issue(self, query: Dict[str, List[str]]) -> None:
+        form = {k: v[0] for k, v in parse_qs(self.read_body().decode('utf-8')).items()}
+        project_id = form.pop('project', '')
+        if project_id not in self.dataset.projects:
+            return self.reply(400, b'<error>Unknown project</error>')
+        names = dict(priority='Priority', state='State', type='Type', assignee='Assignee')
+        issue = self.dataset.add_issue(project_id, {names.get(k, k): v for k, v in form.items()})
+        self.reply(201, b'', headers={'Location': f'{self.server.url}/rest/issue/{issue["id"]}'})
+
+    def update_issue(self, query: Dict[str, List[str]], issue_id: str) -> None:
+        self.read_body()
+        i = self.dataset.find_issue(issue_id)
+        if not i:
+            return self.not_found()
+        for k in ('summary', 'description'):
+            if k in query:
+                i['fields'][k] = query[k][0]
+        i['updated'] += 1
+        self.reply(200)
+
+    def execute(self, query: Dict[str, List[str]], issue_id: str) -> None:
+        form = {k: v[0] for k, v in parse_qs(self.read_body().decode('utf-8')).items()}
+        i = self.dataset.find_issue(issue_id)
+        if not i:
+            return self.not_found()
+        field, _, value = form.get('command', '').partition(' ')
+        if field:
+            i['fields'][field] = value.strip('{}')
+            i['updated'] += 1
+        if form.get('comment'):
+            i['comments'].append(dict(id=f'{issue_id}-c{len(i["comments"])}', author='root', text=form['comment'],
+                                      created=BASE_TIMESTAMP))
+        self.reply(200)
+
+    def attachments(self, query: Dict[str, List[str]], issue_id: str) -> None:
+        i = self.dataset.find_issue(issue_id)
+        if not i:
+            return self.not_found()
+        urls = ''.join(
+            f'<fileUrl url="/_persistent/{a["id"]}?file={a["id"]}" name={quoteattr(a["name"])} '
+            f'authorLogin={quoteattr(a["author"])} created="{a["created"]}" id="{a["id"]}" group="{a["group"]}"/>'
+            for a in i['attachments'])
+        self.reply_xml(f'<fileUrls>{urls}</fileUrls>')
+
+    def attachment_content(self, query: Dict[str, List[str]], attachment_id: str) -> None:
+        a = self.dataset.attachments.get(attachment_id)
+        if not a:
+            return self.not_found()
+        self.reply(200, self.dataset.content(a), 'application/octet-stream')
+
+    def upload_attachment(self, query: Dict[str, List[str]], issue_id: str) -> None:
+        i = self.dataset.find_issue(issue_id)
+        body = self.read_body()
+        if not i:
+            return self.not_found()
+        boundary = self.headers.get('Content-Type', '').partition('boundary=')[2].strip('"').encode('ascii')
+        get = lambda k: query.get(k, [''])[0]
+        for part in body.split(b'--' + boundary)[1:-1]:
+            head, _, content = part.partition(b'\r\n\r\n')
+            name = re_compile(rb'filename="([^"]*)"').search(head)
+            self.dataset.add_attachment(i, name.group(1).decode('utf-8') if name else 'attachment', content[:-2],
+                                        get('authorLogin'), int(get('created') or 0) or None)
+        self.reply(201)
+
+    def comments(self, query: Dict[str, List[str]], issue_id: str) -> None:
+        i = self.dataset.find_issue(issue_id)
+        if not i:
+            return self.not_found()
+        body = ''.join(f'<comment id={quoteattr(c["id"])} author={quoteattr(c["author"])} '
+                       f'text={quoteattr(c["text"])} created="{c["created"]}"/>' for c in i['comments'])
+        self.reply_xml(f'<comments>{body}</comments>')
+
+    def links(self, query: Dict[str, List[str]], issue_id: str) -> None:
+        i = self.dataset.find_issue(issue_id)
+        if not i:
+            return self.not_found()
+        self.reply_xml('<issueLinks/>')
+
+
+MockYouTrackHandler.routes = [(m, re_compile(f'^{p}$'), h) for m, p, h in [
+    ('GET', r'/rest/admin/project/?', MockYouTrackHandler.project_ids),
+    ('GET', r'/rest/admin/project/([^/]+)', MockYouTrackHandler.project),
+    ('PUT', r'/rest/admin/project/([^/]+)', MockYouTrackHandler.create_project),
+    ('GET', r'/rest/issue/byproject/([^/]+)', MockYouTrackHandler.issues_by_project),
+    ('GET', r'/rest/issue/count', MockYouTrackHandler.issue_count),
+    ('GET', r'/rest/issue', MockYouTrackHandler.issues),
+    ('PUT', r'/rest/issue', MockYouTrackHandler.create_issue),
+    ('GET', r'/rest/issue/([^/]+)/attachment', MockYouTrackHandler.attachments),
+    ('GET', r'/rest/issue/([^/]+)/comment', MockYouTrackHandler.comments),
+    ('GET', r'/rest/issue/([^/]+)/link', MockYouTrackHandler.links),
+    ('POST', r'/rest/issue/([^/]+)/execute', MockYouTrackHandler.execute),
+    ('POST', r'/rest/(?:issue|import)/([^/]+)/attachment', MockYouTrackHandler.upload_attachment),
+    ('GET', r'/rest/issue/([^/]+)', MockYouTrackHandler.issue),
+    ('POST', r'/rest/issue/([^/]+)', MockYouTrackHandler.update_issue),
+    ('GET', r'/_persistent/([^/]+)', MockYouTrackHandler.attachment_content),
+    ('GET', r'/api/issues', MockYouTrackHandler.api_issues),
+    ('GET', r'/api/issues/([^/]+)', MockYouTrackHandler.api_issue),
+    ('GET', r'/api/users', MockYouTrackHandler.api_users),
+    ('GET', r'/api/admin/customFieldSettings/customFields', MockYouTrackHandler.api_custom_fields),
+    ('GET', r'/api/workItems', MockYouTrackHandler.api_work_items),
+    ('GET', r'/api/activitiesPage', MockYouTrackHandler.api_activities),
+]]
+
+
+class MockYouTrackServer(ThreadingHTTPServer):
+    """
+    It is a threaded HTTP server exposing a Dataset through the legacy YouTrack REST endpoints, each request delayed
+    by latency seconds and failed with probability error_rate.
+    """
+
+    daemon_threads = True
+
+    # Clients opening many connections at once must not overflow the listen backlog
+    request_queue_size = 1024
+
+    def __init__(self, dataset: Dataset, address: Tuple[str, int] = ('127.0.0.1', 0), latency: float = 0.0,
+                 error_rate: float = 0.0, seed: int = 0) -> None:
+        """
+        It creates an instance of the MockYouTrackServer class.
+
+        :param dataset:     The dataset to serve.
+        :type dataset:      Dataset.
+
+        :param address:     The address to listen to, port 0 for any free port.
+        :type address:      Tuple[str, int].
+
+        :param latency:     The delay in seconds applied to each request.
+        :type latency:      float.
+
+        :param error_rate:  The probability of a request to fail with a transient error.
+        :type error_rate:   float.
+
+        :param seed:        The seed of the pseudo random generator deciding the failures.
+        :type seed:         int.
+        """
+        super().__init__(address, MockYouTrackHandler)
+        self.dataset = dataset
+        self.latency = latency
+        self.error_rate = error_rate
+        self.random = Random(seed)
+        self.lock = Lock()
+        self.requests = Counter()
+        self.thread = None
+
+    @property
+    def url(self) -> str:
+        """
+        It returns the URL of the instance.
+        """
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self) -> 'MockYouTrackServer':
+        """
+        It starts serving in a background thread and returns the server itself.
+
+        :return: See description.
+        :rtype: MockYouTrackServer.
+        """
+        self.thread = Thread(target=self.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self) -> None:
+        """
+        It stops serving and closes the listening socket.
+
+        :return: None.
+        :rtype: None.
+        """
+        self.shutdown()
+        self.server_close()
+
+
+def usage(args: List[str]) -> Namespace:
+    """
+    It parses the given args (usually from sys.argv) and returns a namespace with a field for any given or defaulted
+    argument.
+
+    :param args:    The command line arguments to be parsed.
+    :type args:     List[str].
+
+    :return: See description.
+    :rtype: Namespace.
+    """
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument('--host', dest='host', default='127.0.0.1', help='The address to listen to.')
+    parser.add_argument('--port', dest='port', type=int, default=8080, help='The port to listen to.')
+    add_dataset_arguments(parser)
+    return parser.parse_args(args)
+
+
+def add_dataset_arguments(parser: ArgumentParser) -> None:
+    """
+    It adds to the given parser the options shaping the dataset and the behaviour of the server.
+
+    :param parser:  The parser.
+    :type parser:   ArgumentParser.
+
+    :return: None.
+    :rtype: None.
+    """
+    parser.add_argument('--projects', dest='projects', type=int, default=2, help='The number of projects.')
+    parser.add_argument('--issues', dest='issues', type=int, default=100, help='The number of issues per project.')
+    parser.add_argument('--attachments', dest='attachments', type=int, default=2,
+                        help='The number of attachments per issue.')
+    parser.add_argument('--attachment-size', dest='attachment_size', type=int, default=64 << 10,
+                        help='The size in bytes of each attachment.')
+    parser.add_argument('--comments', dest='comments', type=int, default=2, help='The number of comments per issue.')
+    parser.add_argument('--work-items', dest='work_items', type=int, default=1,
+                        help='The number of work items per issue.')
+    parser.add_argument('--latency', dest='latency', type=float, default=0.0,
+                        help='The delay in seconds applied to each request.')
+    parser.add_argument('--error-rate', dest='error_rate', type=float, default=0.0,
+                        help='The probability of a request to fail with a transient error.')
+    parser.add_argument('--seed', dest='seed', type=int, default=0, help='The seed of the pseudo random generators.')
+
+
+def make_dataset(args: Namespace) -> Dataset:
+    """
+    It builds the dataset described by the given arguments, as added by add_dataset_arguments.
+
+    :param args:    The namespace with parsed command line arguments.
+    :type args:     Namespace.
+
+    :return: See description.
+    :rtype: Dataset.
+    """
+    return Dataset(args.projects, args.issues, args.attachments, args.attachment_size, args.comments, args.work_items,
+                   args.seed)
+
+
+def main(args: Namespace) -> None:
+    """
+    It serves the dataset described by the given arguments until interrupted.
+
+    :param args:    The parsed command line arguments as returned by usage().
+    :type args:     Namespace.
+
+    :return: None.
+    :rtype: None.
+    """
+    server = MockYouTrackServer(make_dataset(args), (args.host, args.port), args.latency, args.error_rate, args.seed)
+    print(f'Serving {server.url}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main(usage(argv[1:]))
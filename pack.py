@@ -0,0 +1,401 @@
+"""
+It implements the pack format: a single append-only file holding many archives followed by an index.
+
+Layout:
+    header      b'YTPACK1\n'
+    records     the bytes of each archive, one after the other
+    index       UTF-8 JSON: {"version": 1, "entries": {name: [offset, length, "sha256:<hex>"]}}
+    footer      b'YTPIDX1\n' followed by the offset and the length of the index as little endian uint64
+
+A pack is updated by appending the new records, a new index and a new footer after the previous footer. While it is
+being appended to, a hidden `.<name>.end` file holds the length of its last complete version, which readers stop at
+and which a pack left incomplete by a killed run is truncated back to.
+"""
+
+from hashlib import sha256
+from io import RawIOBase, SEEK_SET, SEEK_CUR, SEEK_END
+from json import dumps, loads
+from os import fsync, replace, unlink
+from pathlib import Path
+from shutil import copyfileobj
+from struct import Struct
+from threading import Lock
+from typing import Any, BinaryIO, IO, Iterator, Optional as Opt, Tuple, Union
+from zipfile import ZipFile
+
+TPath = Union[Path, str]
+
+HEADER = b'YTPACK1\n'
+FOOTER = Struct('<8sQQ')
+FOOTER_MAGIC = b'YTPIDX1\n'
+
+# The size of the chunks records are copied with
+CHUNK_SIZE = 1 << 20
+
+
+def end_path(path: Path) -> Path:
+    """
+    It returns the path of the file holding the length of the last complete version of the pack at the given path
+    while it is being appended to.
+
+    :param path:    The path of the pack.
+    :type path:     Path.
+
+    :return: See description.
+    :rtype: Path.
+    """
+    return path.with_name(f'.{path.name}.end')
+
+
+def complete_length(path: Path) -> int:
+    """
+    It returns the length of the last complete version of the pack at the given path: the one recorded while the pack
+    is being appended to, its size otherwise.
+
+    :param path:    The path of the pack.
+    :type path:     Path.
+
+    :return: See description.
+    :rtype: int.
+    """
+    try:
+        return int(end_path(path).read_text())
+    except (OSError, ValueError):
+        return path.stat().st_size
+
+
+class PackError(Exception):
+    """
+    It is raised when a file is not a valid pack.
+    """
+    pass
+
+
+class PackSlice(RawIOBase):
+    """
+    It is a read only, seekable view over the bytes of a single record of a pack, suitable to be opened by ZipFile.
+    """
+
+    def __init__(self, f: BinaryIO, offset: int, length: int) -> None:
+        """
+        It creates an instance of the PackSlice class over the given range of the given file.
+
+        :param f:       The pack file opened in binary mode, owned by the slice.
+        :type f:        BinaryIO.
+
+        :param offset:  The offset of the record.
+        :type offset:   int.
+
+        :param length:  The length of the record.
+        :type length:   int.
+        """
+        super().__init__()
+        self.f = f
+        self.offset = offset
+        self.length = length
+        self.position = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self.position
+
+    def seek(self, offset: int, whence: int = SEEK_SET) -> int:
+        base = {SEEK_SET: 0, SEEK_CUR: self.position, SEEK_END: self.length}[whence]
+        self.position = max(0, base + offset)
+        return self.position
+
+    def readinto(self, buffer: Any) -> int:
+        size = min(len(buffer), self.length - self.position)
+        if size <= 0:
+            return 0
+        self.f.seek(self.offset + self.position)
+        data = self.f.read(size)
+        buffer[:len(data)] = data
+        self.position += len(data)
+        return len(data)
+
+    def close(self) -> None:
+        if not self.closed:
+            self.f.close()
+        super().close()
+
+
+class PackZipFile(ZipFile):
+    """
+    It is a ZipFile reading a record of a pack, which releases the record when closed.
+    """
+
+    def __init__(self, record: PackSlice) -> None:
+        """
+        It creates an instance of the PackZipFile class reading the given record.
+
+        :param record:  The record holding the archive.
+        :type record:   PackSlice.
+        """
+        self.record = record
+        try:
+            super().__init__(record)
+        except BaseException:
+            record.close()
+            raise
+
+    def close(self) -> None:
+        try:
+            super().close()
+        finally:
+            self.record.close()
+
+
+class PackReader:
+    """
+    It gives random access to the records of a pack through its trailing index.
+    """
+
+    def __init__(self, path: TPath) -> None:
+        """
+        It creates an instance of the PackReader class loading the index of the pack at the given path.
+
+        :param path:    The path of the pack.
+        :type path:     TPath.
+
+        :raises PackError: When the file is not a valid pack.
+        """
+        self.path = Path(path)
+        self.length = complete_length(self.path)
+
+        with open(str(self.path), 'rb') as f:
+            if f.read(len(HEADER)) != HEADER or self.length < len(HEADER) + FOOTER.size:
+                raise PackError(f'Not a pack: `{self.path}`')
+
+            f.seek(self.length - FOOTER.size)
+            magic, offset, length = FOOTER.unpack(f.read(FOOTER.size))
+            if magic != FOOTER_MAGIC:
+                raise PackError(f'Truncated pack: `{self.path}`')
+
+            f.seek(offset)
+            self.entries = {k: tuple(v) for k, v in loads(f.read(length).decode('utf-8'))['entries'].items()}
+            self.index_length = length
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.entries
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.entries)
+
+    def entry(self, name: str) -> Tuple[int, int, str]:
+        """
+        It returns the offset, the length and the digest of the record with the given name.
+
+        :param name:    The name of the record.
+        :type name:     str.
+
+        :return: See description.
+        :rtype: Tuple[int, int, str].
+        """
+        return self.entries[name]
+
+    def wasted(self) -> int:
+        """
+        It returns the number of bytes of the pack not referenced by its index: the records superseded by a later
+        version and the indexes of the previous versions.
+
+        :return: See description.
+        :rtype: int.
+        """
+        live = sum(length for _, length, _ in self.entries.values())
+        return self.length - len(HEADER) - self.index_length - FOOTER.size - live
+
+    def open(self, name: str) -> PackSlice:
+        """
+        It opens for reading the record with the given name.
+
+        :param name:    The name of the record.
+        :type name:     str.
+
+        :return: See description.
+        :rtype: PackSlice.
+        """
+        offset, length, _ = self.entries[name]
+        return PackSlice(open(str(self.path), 'rb'), offset, length)
+
+    def open_archive(self, name: str) -> ZipFile:
+        """
+        It opens for reading the archive stored as the record with the given name.
+
+        :param name:    The name of the record.
+        :type name:     str.
+
+        :return: See description.
+        :rtype: ZipFile.
+        """
+        return PackZipFile(self.open(name))
+
+    def verify(self, name: str) -> bool:
+        """
+        It tells whether the record with the given name matches the digest recorded in the index.
+
+        :param name:    The name of the record.
+        :type name:     str.
+
+        :return: See description.
+        :rtype: bool.
+        """
+        digest = sha256()
+        with self.open(name) as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+                digest.update(chunk)
+        return f'sha256:{digest.hexdigest()}' == self.entries[name][2]
+
+
+class PackWriter:
+    """
+    It writes a pack, either from scratch by appending records to a hidden partial file, which atomically replaces the
+    final path once the index has been written, or by appending records to the previous version of the pack, which
+    stays readable until the new index has been written. It is safe to add records from several threads.
+    """
+
+    def __init__(self, path: TPath, previous: Opt[PackReader] = None) -> None:
+        """
+        It creates an instance of the PackWriter class writing the pack at the given path, appending to the given
+        previous version of the pack if any.
+
+        :param path:        The final path of the pack.
+        :type path:         TPath.
+
+        :param previous:    The previous version of the pack, the one at path, to be appended to.
+        :type previous:     Opt[PackReader].
+        """
+        self.path = Path(path)
+        self.lock = Lock()
+
+        if previous:
+            # The records of a killed run past the last complete version are dropped
+            self.part = end_path(self.path)
+            self.part.write_text(str(previous.length))
+            self.base = previous.length
+            self.entries = dict(previous.entries)
+            self.f = open(str(self.path), 'r+b')
+            self.f.truncate(self.base)
+            self.f.seek(self.base)
+        else:
+            self.part = self.path.with_name(f'.{self.path.name}.part')
+            self.base = None
+            self.entries = {}
+            self.f = open(str(self.part), 'wb')
+            self.f.write(HEADER)
+
+    @property
+    def appending(self) -> bool:
+        """
+        It tells whether the previous version of the pack is appended to.
+
+        :return: See description.
+        :rtype: bool.
+        """
+        return self.base is not None
+
+    def __contains__(self, name: str) -> bool:
+        with self.lock:
+            return name in self.entries
+
+    def entry(self, name: str) -> Tuple[int, int, str]:
+        """
+        It returns the offset, the length and the digest of the record with the given name.
+
+        :param name:    The name of the record.
+        :type name:     str.
+
+        :return: See description.
+        :rtype: Tuple[int, int, str].
+        """
+        with self.lock:
+            return self.entries[name]
+
+    def add(self, name: str, src: IO[bytes], digest: Opt[str] = None) -> Tuple[int, int, str]:
+        """
+        It appends the content read from src as the record with the given name, replacing any previous record with
+        the same name in the index.
+
+        :param name:    The name of the record.
+        :type name:     str.
+
+        :param src:     The file-like object the record is read from.
+        :type src:      IO[bytes].
+
+        :param digest:  The already known digest of the record, computed while copying when None.
+        :type digest:   Opt[str].
+
+        :return: The offset, the length and the digest of the record.
+        :rtype: Tuple[int, int, str].
+        """
+        with self.lock:
+            offset = self.f.tell()
+
+            if digest:
+                copyfileobj(src, self.f, CHUNK_SIZE)
+            else:
+                hashed = sha256()
+                for chunk in iter(lambda: src.read(CHUNK_SIZE), b''):
+                    hashed.update(chunk)
+                    self.f.write(chunk)
+                digest = f'sha256:{hashed.hexdigest()}'
+
+            self.entries[name] = (offset, self.f.tell() - offset, digest)
+            return self.entries[name]
+
+    def carry_over(self, previous: PackReader) -> int:
+        """
+        It copies from the given previous pack the records which have not been added to this pack.
+
+        :param previous:    The previous version of the pack.
+        :type previous:     PackReader.
+
+        :return: The number of records copied.
+        :rtype: int.
+        """
+        names = [n for n in previous if n not in self]
+        for name in names:
+            with previous.open(name) as src:
+                self.add(name, src, previous.entry(name)[2])
+        return len(names)
+
+    def close(self) -> None:
+        """
+        It writes the index and the footer and moves the pack in place.
+
+        :return: None.
+        :rtype: None.
+        """
+        with self.lock:
+            index = dumps(dict(version=1, entries=self.entries), sort_keys=True).encode('utf-8')
+            offset = self.f.tell()
+            self.f.write(index)
+            self.f.write(FOOTER.pack(FOOTER_MAGIC, offset, len(index)))
+            self.f.flush()
+            fsync(self.f.fileno())
+            self.f.close()
+            if self.appending:
+                unlink(str(self.part))
+            else:
+                replace(str(self.part), str(self.path))
+
+    def abort(self) -> None:
+        """
+        It discards the partial pack, or the records appended to the previous version of the pack, which is left as
+        it was.
+
+        :return: None.
+        :rtype: None.
+        """
+        with self.lock:
+            # Once closed the pack has been completed already
+            if self.appending and not self.f.closed:
+                self.f.truncate(self.base)
+            self.f.close()
+            if self.part.exists():
+                unlink(str(self.part))
@@ -0,0 +1,195 @@
+"""
+It implements the action plan of a restore: what the restore executable would do to each backed up project and issue
+on the target instance, and how many requests it would take. A plan is computed with --plan without changing anything,
+saved as JSON with --plan-json and executed as it is with --apply-plan, without deciding again.
+"""
+
+from datetime import datetime, timezone
+from json import dumps, loads
+from pathlib import Path
+from typing import Any, Dict, List, Optional as Opt
+
+# The version of the plan format
+VERSION = 1
+
+# The actions of a plan, in the order they are reported
+ACTIONS = ('create_project', 'create', 'update', 'skip', 'conflict')
+
+# The actions changing the target instance, the others are only reported
+CHANGES = ('create_project', 'create', 'update')
+
+# The differences an update applies, as returned by fingerprint.differences()
+DETAILS = ('fields', 'comments', 'attachments')
+
+
+class Plan:
+    """
+    It is the list of the actions planned for a restore, each one a dictionary with the action, the project or the
+    issue it applies to, the details needed to execute it and the estimated number of requests and bytes uploaded.
+    """
+
+    def __init__(self, target: str, backup: str, actions: Opt[List[Dict[str, Any]]] = None, lookups: int = 0,
+                 created: Opt[str] = None) -> None:
+        """
+        It creates an instance of the Plan class.
+
+        :param target:  The URL of the target instance.
+        :type target:   str.
+
+        :param backup:  The folder of the backup.
+        :type backup:   str.
+
+        :param actions: The planned actions.
+        :type actions:  Opt[List[Dict[str, Any]]].
+
+        :param lookups: The number of requests the planning took.
+        :type lookups:  int.
+
+        :param created: The UTC date and time of the plan, now by default.
+        :type created:  Opt[str].
+        """
+        self.target = target
+        self.backup = backup
+        self.actions = actions or []
+        self.lookups = lookups
+        self.created = created or datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+        self.by_issue = {a['issue']: a for a in self.actions if 'issue' in a}
+
+    def add(self, action: str, requests: int = 0, size: int = 0, **details: Any) -> Dict[str, Any]:
+        """
+        It appends an action to the plan and returns it.
+
+        :param action:      The action, one of ACTIONS.
+        :type action:       str.
+
+        :param requests:    The estimated number of requests of the action.
+        :type requests:     int.
+
+        :param size:        The estimated number of bytes uploaded by the action.
+        :type size:         int.
+
+        :param details:     The project or the issue the action applies to, and the details needed to execute it.
+        :type details:      Any.
+
+        :return: See description.
+        :rtype: Dict[str, Any].
+        """
+        entry = dict(action=action, **details, requests=requests, bytes=size)
+        self.actions.append(entry)
+        if 'issue' in entry:
+            self.by_issue[entry['issue']] = entry
+        return entry
+
+    def issues(self) -> Dict[str, Dict[str, Any]]:
+        """
+        It returns the actions planned for the issues, by issue identifier.
+
+        :return: See description.
+        :rtype: Dict[str, Dict[str, Any]].
+        """
+        return self.by_issue
+
+    def projects(self) -> List[str]:
+        """
+        It returns the identifiers of the projects planned to be created.
+
+        :return: See description.
+        :rtype: List[str].
+        """
+        return [a['project'] for a in self.actions if a['action'] == 'create_project']
+
+    def counts(self) -> Dict[str, int]:
+        """
+        It returns the number of planned actions of each kind.
+
+        :return: See description.
+        :rtype: Dict[str, int].
+        """
+        counts = dict.fromkeys(ACTIONS, 0)
+        for action in self.actions:
+            counts[action['action']] += 1
+        return counts
+
+    def requests(self) -> int:
+        """
+        It returns the estimated number of requests of the plan.
+
+        :return: See description.
+        :rtype: int.
+        """
+        return sum(a['requests'] for a in self.actions)
+
+    def size(self) -> int:
+        """
+        It returns the estimated number of bytes uploaded by the plan.
+
+        :return: See description.
+        :rtype: int.
+        """
+        return sum(a['bytes'] for a in self.actions)
+
+    def report(self, logger: Any) -> None:
+        """
+        It logs the planned actions, the skipped ones only in verbose mode, followed by their counts and the
+        estimated volume of requests.
+
+        :param logger:  The logger instance object.
+        :type logger:   Logger.
+
+        :return: None.
+        :rtype: None.
+        """
+        # Iterates over the actions in the order they would be executed
+        for action in self.actions:
+            subject = action.get('issue') or action.get('project')
+            details = action.get('reason') or ', '.join(f'{len(action[k])} {k}' for k in DETAILS if action.get(k))
+            log = logger.debug if action['action'] == 'skip' else logger.info
+            log(f'{action["action"]:<16}{subject:<20}{details}')
+
+        logger.info('')
+        for action, count in self.counts().items():
+            logger.info(f'{action:<20}: {count}')
+        logger.info(f'{"Planning requests":<20}: {self.lookups}')
+        logger.info(f'{"Estimated requests":<20}: {self.requests()}')
+        logger.info(f'{"Estimated upload":<20}: {self.size() / (1 << 20):.2f} MiB\n')
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        It returns the plan as a JSON serializable dictionary.
+
+        :return: See description.
+        :rtype: Dict[str, Any].
+        """
+        return dict(version=VERSION, created=self.created, target=self.target, backup=self.backup,
+                    counts=self.counts(), lookups=self.lookups, requests=self.requests(), bytes=self.size(),
+                    actions=self.actions)
+
+    def save(self, path: Path) -> None:
+        """
+        It writes the plan as JSON to the given path.
+
+        :param path:    The path of the plan.
+        :type path:     Path.
+
+        :return: None.
+        :rtype: None.
+        """
+        path.write_text(dumps(self.to_dict(), indent=2, ensure_ascii=False), encoding='utf-8')
+
+    @classmethod
+    def load(cls, path: Path) -> 'Plan':
+        """
+        It reads the plan written to the given path by save().
+
+        :param path:    The path of the plan.
+        :type path:     Path.
+
+        :return: See description.
+        :rtype: Plan.
+
+        :raises ValueError: When the file is not a plan of a supported version.
+        """
+        data = loads(path.read_text(encoding='utf-8'))
+        if not isinstance(data, dict) or data.get('version') != VERSION:
+            raise ValueError(f'The file `{path}` is not a restore plan of version {VERSION}.')
+        return cls(data['target'], data['backup'], data['actions'], data.get('lookups', 0), data.get('created'))
@@ -6,6 +6,9 @@ In case of conflict between issues or projects found both on the
 target YouTrack server instance and on the given backup folder,
 if no overwrite option is given (-op, -oi) the default policy is
 to leave them unchanged on the target YouTrack server instance.
+Issues to overwrite, or all of them with --update, are compared
+with their backup by fingerprint and only their differences are
+applied.
 """
 
 from argparse import ArgumentParser, Namespace, RawDescriptionHelpFormatter
@@ -17,18 +20,27 @@ from os.path import basename
 from platform import system as system_platform
 from signal import signal, SIGINT
 from sys import argv, stdout
-from typing import Any, Dict, List, Set, Optional as Opt, Tuple, Union
+from typing import Any, Callable, Dict, IO, Iterable, Iterator, List, NamedTuple, Set, Tuple, Optional as Opt, Union
 from types import FrameType
 from pathlib import Path
 from youtrack.connection import Connection as yt
 from youtrack import Project, YouTrackException
 from zipfile import ZipFile
-from os import walk, stat, access, R_OK, W_OK
-from stat import S_ISREG, S_ISDIR
-from tempfile import mkdtemp
-from shutil import rmtree
-from re import findall, DOTALL
-from json import loads
+from os import scandir, fsync
+from re import compile as re_compile, sub, DOTALL
+from json import dumps, loads
+from heapq import heappop, heappush
+from threading import Lock
+from concurrent.futures import ThreadPoolExecutor, Future, wait, FIRST_COMPLETED
+from urllib.parse import quote, urlencode, urlsplit
+from http.client import HTTPException
+from uuid import uuid4
+from fingerprint import BUILTIN_FIELDS, FIELDS, FINGERPRINT_NAME, differences, is_unchanged, make_fingerprint
+from fingerprint import target_fingerprint
+from metrics import metrics
+from pack import PackReader, PackError
+from plan import Plan
+from transport import ByteBudget, Connection, ConnectionPool, is_refused, retry_after
 
 major = 1
 minor = 0
@@ -37,6 +49,41 @@ fixes = 0
 TPath = Union[Path, str]
 
 
+class PackMember(NamedTuple):
+    """
+    It identifies an archive stored inside a pack produced by the backup executable with `--format pack`.
+    """
+    pack: Path
+    name: str
+
+
+# A backed up archive: either a zip file or a member of a pack
+TSource = Union[Path, PackMember]
+
+# The folder of the backup holding the content addressed attachments
+BLOBS_FOLDER = 'blobs'
+
+# The manifest written by the backup executable inside the backup folder
+MANIFEST_NAME = 'manifest.json'
+
+# The journal of the archives completed by a backup run not finished cleanly, inside the backup folder
+BACKUP_JOURNAL_NAME = 'journal.jsonl'
+
+# The size of the chunks attachments are uploaded with
+CHUNK_SIZE = 1 << 20
+
+# The fields of a target issue its fingerprint is computed from, requested to the REST API
+TARGET_FIELDS = 'idReadable,summary,description,customFields(name,value(name,login,text,presentation)),' \
+                'comments(text,deleted),attachments(name,size)'
+
+# The custom fields of an issue whose values are logins of users
+USER_FIELDS = ('Assignee',)
+
+# The names of the archives of issues and projects
+ISSUE_NAME = re_compile(r'^(.*?)-(\d+)\.zip$', DOTALL)
+PROJECT_NAME = re_compile(r'^.*\D\.zip$', DOTALL)
+
+
 class LoggingRecordFactoryColorama:
     """
     It adds the 'color' and 'reset' attributes to the LogRecord instance produced by the existing LogRecord.
@@ -160,101 +207,265 @@ def sigint_handler(signum: int, frame: FrameType) -> None:
     exit(0)
 
 
-def get_projects_and_issues(args: Namespace, logger: Any) -> Tuple[Set[Path], Set[Path]]:
+def load_manifest(folder: Path, logger: Any) -> Opt[Dict[str, Any]]:
     """
-    It tries to figure out what files in the given backup folder should be considered as
-    issues and which ones should instead be considered projects. Then it returns the two
-    sets of paths: project_id's paths and  issue's paths. Note that sets may also be empty.
+    It loads the manifest written by the backup executable inside the given folder, if any. The issue archives
+    recorded by the journal a backup run left behind, completed after the manifest was last saved, are merged into it
+    as the backup executable does.
 
-    :param args:        The command line arguments.
-    :type args:         Namespace.
+    :param folder:      The folder of the backup.
+    :type folder:       Path.
 
     :param logger:      The logger.
     :type logger:       Any.
 
-    :return: It returns the two sets containing respectively found projects and issues.
-    :rtype: Tuple[Set[Path], Set[Path]].
+    :return: It returns the content of the manifest when available and readable, None otherwise.
+    :rtype: Opt[Dict[str, Any]].
+    """
+    path = folder / MANIFEST_NAME
+    if not path.is_file():
+        return None
+
+    try:
+        with open(str(path), 'r', encoding='utf-8') as f:
+            manifest = loads(f.read())
+    except (IOError, OSError, ValueError) as e:
+        logger.warning(f'Unreadable manifest: `{path}`: {e}')
+        return None
+
+    path = folder / BACKUP_JOURNAL_NAME
+    if path.is_file():
+        logger.debug(f'Backup journal found: `{path}`')
+        issues, deleted = manifest.setdefault('issues', {}), manifest.setdefault('deleted', {})
+        with open(str(path), 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = loads(line)
+                except ValueError:
+                    # A line torn by a crash
+                    continue
+                if 'issue' in record:
+                    issues[record['issue']] = record['entry']
+                    deleted.pop(record['issue'], None)
+
+    return manifest
+
+
+def iter_manifest(folder: Path, manifest: Dict[str, Any]) -> Iterator[TSource]:
+    """
+    It yields the archives of the projects and of the issues recorded in the given manifest of the given folder,
+    without listing the folder, project by project and in numeric order within each project. The issues recorded as
+    deleted from the server are yielded as well, since their archives are kept.
+
+    :param folder:      The folder of the backup.
+    :type folder:       Path.
+
+    :param manifest:    The content of the manifest of the folder.
+    :type manifest:     Dict[str, Any].
+
+    :return: See description.
+    :rtype: Iterator[TSource].
+    """
+    packs = {}
+    entries = list(manifest.get('issues', {}).items()) + list(manifest.get('deleted', {}).items())
+
+    # Within a project the identifiers share their prefix: the shorter is the lower
+    for issue_id, entry in sorted(entries, key=lambda x: (x[1]['project'], len(x[0]), x[0])):
+        prj = entry['project']
+
+        if prj not in packs:
+            pack = folder / f'{prj}.pack'
+            packs[prj] = pack if pack.is_file() else None
+            yield PackMember(pack, f'{prj}.zip') if packs[prj] else folder / f'{prj}.zip'
+
+        yield PackMember(packs[prj], f'{issue_id}.zip') if packs[prj] else folder / f'{issue_id}.zip'
+
+
+class PackCache:
+    """
+    It keeps, for the duration of a restore session, one reader per pack, so that the index of each pack is loaded and
+    parsed once however many of its archives are read. It is safe to use from several threads.
+    """
+
+    def __init__(self) -> None:
+        """
+        It creates an instance of the PackCache class.
+        """
+        self.lock = Lock()
+        self.readers = {}
+
+    def reader(self, path: Path) -> PackReader:
+        """
+        It returns the reader of the pack at the given path, loading its index on first use.
+
+        :param path:    The path of the pack.
+        :type path:     Path.
+
+        :raises PackError: When the file is not a valid pack.
+
+        :return: See description.
+        :rtype: PackReader.
+        """
+        with self.lock:
+            if path not in self.readers:
+                self.readers[path] = PackReader(path)
+            return self.readers[path]
+
+
+def iter_backup(folder: Path, recursive: bool, packs: PackCache, logger: Any) -> Iterator[TSource]:
     """
+    It lazily yields the archives of the projects and of the issues found in the given backup folder, and in its sub
+    folders when recursive is True. When the folder holds the manifest of the backup its archives are taken from it,
+    along with those recorded by the journal of an unfinished backup run, otherwise only the direct entries of the
+    folder are listed. The archives stored inside packs are yielded as
+    PackMember instances.
+
+    :param folder:      The folder of the backup.
+    :type folder:       Path.
+
+    :param recursive:   Whether the sub folders are searched as well.
+    :type recursive:    bool.
+
+    :param packs:       The readers of the packs of the session.
+    :type packs:        PackCache.
+
+    :param logger:      The logger.
+    :type logger:       Any.
 
-    is_issue = lambda x: True if findall(r'^.*-\d+\.zip$', x, DOTALL) else False
-    is_project = lambda x: True if findall(r'[^\d]\.zip$', x, DOTALL) else False
+    :return: See description.
+    :rtype: Iterator[TSource].
+    """
+    manifest = load_manifest(folder, logger)
 
-    projects = set()
-    issues = set()
+    if manifest is not None:
+        logger.debug(f'Manifest found: `{folder / MANIFEST_NAME}`')
+        yield from iter_manifest(folder, manifest)
+        if not recursive:
+            return
 
-    # Collects issues and projects
-    for idx, (root, _, files) in enumerate(walk(args.backup)):
+    subfolders = []
 
-        # Shallow search
-        if 0 > idx:
-            break
+    with scandir(str(folder)) as entries:
+        for entry in entries:
+            name = entry.name
 
-        root = Path(root)
-        for f in files:
-            if is_issue(f):
-                logger.debug(f'Issue found: `{f}`')
-                issues.add(root / f)
+            if entry.is_dir():
+                # Blobs are reached through the issue archives referencing them
+                if recursive and name != BLOBS_FOLDER:
+                    subfolders.append(Path(entry.path))
                 continue
-            elif is_project(f):
-                logger.debug(f'Project found: `{f}`')
-                projects.add(root / f)
+
+            # The files of the folder are listed in its manifest, partial, hidden and journal files are skipped
+            if manifest is not None or name.startswith('.') or name == MANIFEST_NAME or name.endswith('.jsonl'):
                 continue
+
+            if name.endswith('.pack'):
+                try:
+                    pack = packs.reader(Path(entry.path))
+                except (PackError, OSError) as e:
+                    logger.warning(f'Unreadable pack: `{name}`: {e}')
+                    continue
+                logger.debug(f'Pack found: `{name}`')
+                for member in pack:
+                    if ISSUE_NAME.match(member) or PROJECT_NAME.match(member):
+                        yield PackMember(Path(entry.path), member)
+            elif ISSUE_NAME.match(name) or PROJECT_NAME.match(name):
+                yield Path(entry.path)
             else:
-                logger.warning(f'Unrecognized: `{f}`')
+                logger.warning(f'Unrecognized: `{name}`')
+
+    for subfolder in subfolders:
+        yield from iter_backup(subfolder, recursive, packs, logger)
 
-    return projects, issues
+
+def backup_folder(source: TSource) -> Path:
+    """
+    It returns the folder holding the given backed up archive, or the pack it is stored into.
+
+    :param source:  The backed up archive.
+    :type source:   TSource.
+
+    :return: See description.
+    :rtype: Path.
+    """
+    return source.pack.parent if isinstance(source, PackMember) else source.parent
 
 
-def guess_project_id(issue_path: Path) -> Opt[str]:
+def guess_project_id(issue_path: TSource) -> Opt[str]:
     """
     It tries to guess the the project_id id the given issue belongs to.
 
     :param issue_path:   The issue identifier.
-    :type issue_path:    Path.
+    :type issue_path:    TSource.
 
     :return: It returns the project_id identifier or None in case of failure.
     :rtype:
     """
-    if not isinstance(issue_path, Path):
+    if not isinstance(issue_path, (Path, PackMember)):
         return None
 
-    project = findall(r'^(.*?)-\d+\.zip$', issue_path.parts[-1], DOTALL)
-    return project[-1] if project else None
+    match = ISSUE_NAME.match(issue_path.name)
+    return match.group(1) if match else None
 
 
-def guess_issue_id(issue_path: Path) -> Opt[str]:
+def guess_issue_id(issue_path: TSource) -> Opt[str]:
     """
     Given the path of an issue generated by the backup executable in issue_path it guesses the id of the issue.
 
     :param issue_path:  The path of the baked up issue.
-    :type issue_path:   Path.
+    :type issue_path:   TSource.
 
     :return: It returns the guessed identifier in case of success, None otherwise.
     :rtype: Opt[str].
     """
-    identifier = issue_path.parts[-1]
+    identifier = issue_path.name
     return identifier[:-4] if identifier.endswith('.zip') else None
 
 
-def exists_backed_up_project(project_id: str, projects: Set[Path], backup_path: TPath) -> Opt[Path]:
+def open_backed_up_archive(source: TSource, packs: PackCache) -> ZipFile:
+    """
+    It opens for reading the given backed up archive, be it a zip file or a member of a pack.
+
+    :param source:  The backed up archive.
+    :type source:   TSource.
+
+    :param packs:   The readers of the packs of the session.
+    :type packs:    PackCache.
+
+    :return: See description.
+    :rtype: ZipFile.
+    """
+    if isinstance(source, PackMember):
+        return packs.reader(source.pack).open_archive(source.name)
+    return ZipFile(str(source))
+
+
+def exists_backed_up_project(project_id: str, folder: TPath, packs: PackCache) -> Opt[TSource]:
     """
-    It tells whether the definition for the given project_id is available among
-    the backed up projects.
+    It tells whether the definition for the given project_id has been backed up inside the given folder, either as
+    a zip archive or inside the pack of the project.
 
     :param project_id:      The project identifier (as obtained from a call to guess_project_id()).
     :type project_id:       str.
 
-    :param projects:        The list of backed up projects found.
-    :type projects:         List[Path].
+    :param folder:          The folder of the backup holding the issues of the project.
+    :type folder:           TPath.
 
-    :param backup_path:     The path where the backup to restore is stored.
-    :type backup_path:      TPath.
+    :param packs:           The readers of the packs of the session.
+    :type packs:            PackCache.
 
     :return: It returns the project path if a backed up project with the given project_id exists otherwise None.
-    :rtype: Opt[Path].
+    :rtype: Opt[TSource].
     """
-    path = backup_path / f'{project_id}.zip'
-    return path if path in projects else None
+    path = Path(folder) / f'{project_id}.zip'
+    if path.is_file():
+        return path
+
+    member = PackMember(Path(folder) / f'{project_id}.pack', f'{project_id}.zip')
+    try:
+        return member if member.pack.is_file() and member.name in packs.reader(member.pack) else None
+    except (PackError, OSError):
+        return None
 
 
 def exists_youtrack_project(project_id: str, connection: yt) -> Opt[Project]:
@@ -280,53 +491,173 @@ def exists_youtrack_project(project_id: str, connection: yt) -> Opt[Project]:
     return
 
 
-def extract_backed_up_project(project_path: Union[Path, str], dst: Union[Path, str]) -> Union[Path, str, None]:
+class BackedUpArchive:
+    """
+    It reads a backed up project or issue archive in place: its JSON documents are loaded straight from the zip members
+    and its attachments are exposed as streamed file-like objects, so nothing is ever extracted on disk.
+    """
+
+    def __init__(self, source: TSource, packs: PackCache) -> None:
+        """
+        It creates an instance of the BackedUpArchive class opening the given archive.
+
+        :param source:  The backed up archive.
+        :type source:   TSource.
+
+        :param packs:   The readers of the packs of the session.
+        :type packs:    PackCache.
+        """
+        self.source = source
+        self.zip = open_backed_up_archive(source, packs)
+        self.members = set(self.zip.namelist())
+        self.lock = Lock()
+
+    def __enter__(self) -> 'BackedUpArchive':
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """
+        It closes the archive.
+
+        :return: None.
+        :rtype: None.
+        """
+        self.zip.close()
+
+    def load(self, name: str) -> Any:
+        """
+        It loads the JSON document stored as the member with the given name.
+
+        :param name:    The name of the member.
+        :type name:     str.
+
+        :return: See description.
+        :rtype: Any.
+
+        :raises KeyError: When the archive has no member with the given name.
+        """
+        return loads(self.zip.read(name).decode('utf-8-sig', errors='ignore'))
+
+    def attachments(self, issue_id: str) -> Iterator[Dict[str, Any]]:
+        """
+        It yields the metadata of the attachments of the given issue stored inside the archive, each one stored as the
+        <issueId>_<name>.json member next to the <issueId>_<name> content or to its <issueId>_<name>.blob reference.
+
+        :param issue_id:    The identifier of the issue.
+        :type issue_id:     str.
+
+        :return: See description.
+        :rtype: Iterator[Dict[str, Any]].
+        """
+        for name in sorted(self.members):
+            content = name[:-len('.json')]
+            if name.startswith(f'{issue_id}_') and name.endswith('.json') and \
+                    (content in self.members or f'{content}.blob' in self.members):
+                yield self.load(name)
+
+    def open_attachment(self, issue_id: str, attachment: Dict[str, Any]) -> Opt[IO[bytes]]:
+        """
+        It opens for reading the content of the given attachment of the given issue.
+
+        :param issue_id:    The identifier of the issue.
+        :type issue_id:     str.
+
+        :param attachment:  The metadata of the attachment as yielded by attachments().
+        :type attachment:   Dict[str, Any].
+
+        :return: It returns the file-like object of the content on success, None otherwise.
+        :rtype: Opt[IO[bytes]].
+        """
+        # The members can be read concurrently once opened
+        with self.lock:
+            return open_backed_up_attachment(self.zip, f'{issue_id}_{attachment["name"]}', backup_folder(self.source))
+
+    def attachment_size(self, issue_id: str, attachment: Dict[str, Any]) -> int:
+        """
+        It returns the size of the content of the given attachment of the given issue, without reading it.
+
+        :param issue_id:    The identifier of the issue.
+        :type issue_id:     str.
+
+        :param attachment:  The metadata of the attachment as yielded by attachments().
+        :type attachment:   Dict[str, Any].
+
+        :return: See description.
+        :rtype: int.
+        """
+        name = f'{issue_id}_{attachment["name"]}'
+        return self.zip.getinfo(name).file_size if name in self.members else self.load(f'{name}.blob')['size']
+
+    def fingerprint(self, issue_id: str) -> Dict[str, Any]:
+        """
+        It returns the fingerprint of the given issue stored by the backup. For a backup made before fingerprints were
+        stored it is computed from the archive, without the digests of the attachments not stored as blobs.
+
+        :param issue_id:    The identifier of the issue.
+        :type issue_id:     str.
+
+        :return: See description.
+        :rtype: Dict[str, Any].
+        """
+        name = FINGERPRINT_NAME.format(issue_id)
+        if name in self.members:
+            return self.load(name)
+
+        comments = []
+        if f'{issue_id}.comments.json' in self.members:
+            comments = [c.get('text') for c in self.load(f'{issue_id}.comments.json') if not c.get('deleted')]
+
+        attachments = []
+        for attachment in self.attachments(issue_id):
+            blob = f'{issue_id}_{attachment["name"]}.blob'
+            digest = self.load(blob)['digest'] if blob in self.members else None
+            attachments.append(dict(name=attachment['name'], size=self.attachment_size(issue_id, attachment),
+                                    digest=digest))
+
+        return make_fingerprint(self.load(f'{issue_id}.json'), comments, attachments)
+
+
+def open_backed_up_attachment(archive: ZipFile, name: str, backup_path: TPath) -> Opt[IO[bytes]]:
     """
-    Given the path of a project archive it extracts its content in the given dst folder.
+    It opens for reading the content of the attachment with the given name stored inside the given issue archive.
+    When the backup has been made with a blob store the archive holds a <name>.blob reference instead of the content,
+    which is then resolved to the blob stored inside the backup folder.
+
+    :param archive:     The issue archive.
+    :type archive:      ZipFile.
 
-    :param project_path:    The path of the archive of the project definition.
-    :type project_path:     Union[Path, str].
+    :param name:        The name of the attachment entry, <issueId>_<attachment name>.
+    :type name:         str.
 
-    :param dst:             The destination folder for the extracted project definition.
-    :type dst:              Union[Path, str].
+    :param backup_path: The path where the backup to restore is stored.
+    :type backup_path:  TPath.
 
-    :return: It returns the path of the extracted content upon success, None otherwise.
-    :rtype: Union[Path, str, None].
+    :return: It returns the file-like object of the content on success, None otherwise.
+    :rtype: Opt[IO[bytes]].
     """
     logger = getLogger(__name__)
-    
-    try:
-        # Project path
-        stat_result = stat(project_path)
-        
-        if not S_ISREG(stat_result.st_mode):
-            logger.error(f'The project path must be a valid regular file: `{project_path}`.')
-            return
-        
-        if not access(project_path, R_OK):
-            logger.error(f'You don\'t have permission to read: `{project_path}`.')
-            return
-            
-        # Dst
-        stat_result = stat(dst)
-        
-        if not S_ISDIR(stat_result.st_mode):
-            logger.error(f'The dst path must be a valid folder: `{dst}`.')
-            return
-        
-        if not access(project_path, R_OK|W_OK):
-            logger.error(f'You don\'t have permission to read/write: `{project_path}`.')
-            return
+    members = set(archive.namelist())
 
-        with ZipFile(project_path) as z:
-            # Info: arbitrary location write
-            z.extractall(dst)
+    if name in members:
+        return archive.open(name)
 
-        return dst
+    if f'{name}.blob' not in members:
+        logger.error(f'The attachment `{name}` is missing from `{archive.filename}`.')
+        return None
 
-    except (OSError, Exception) as e:
-        logger.error(e)
-        return
+    reference = loads(archive.read(f'{name}.blob'))
+    hexdigest = reference['digest'].partition(':')[2]
+    path = Path(backup_path) / BLOBS_FOLDER / hexdigest[:2] / hexdigest
+
+    try:
+        return open(str(path), 'rb')
+    except (IOError, OSError) as e:
+        logger.error(f'The blob of the attachment `{name}` cannot be opened: {e}')
+
+    return None
 
 
 def create_project(connection: yt, project_data: Dict[Any, Any]) -> Opt[Dict[Any, Any]]:
@@ -346,43 +677,240 @@ def create_project(connection: yt, project_data: Dict[Any, Any]) -> Opt[Dict[Any
     logger = getLogger(__name__)
 
     try:
-        prj = Project()
-        for k, v in project_data.items():
-            setattr(prj, k, v)
-        # noinspection PyArgumentList
-        return connection.createProject(prj)
+        # Connection.createProject() mixes bytes and str while escaping the parameters, which fails under Python 3
+        lead = project_data.get('lead', '')
+        params = urlencode({
+            'projectName': project_data.get('name', project_data['id']).replace('/', ' '),
+            'description': f'{project_data.get("description") or ""} ',
+            'projectLeadLogin': lead,
+            'lead': lead,
+            'startingNumber': str(project_data.get('startingNumber', 1))
+        })
+        # noinspection PyProtectedMember
+        return connection._put(f'/admin/project/{quote(project_data["id"])}?{params}')
     except (YouTrackException, Exception) as e:
         logger.error(e)
 
     return None
 
 
-def exists_youtrack_issue(connection: yt, issue_id: str) -> Opt[Dict[Any, Any]]:
+class ProjectCache:
+    """
+    It remembers, for the duration of a restore session, what has been learned about each project: whether it exists
+    on the target instance, its backed up definition and the outcome of its creation. Each project is so looked up,
+    extracted and parsed once per run however many of its issues are restored. It is safe to use from several threads,
+    concurrent lookups of the same project wait for the first one.
     """
-    It checks whether an issue with the given issue_id exists in the YouTrack server instance pointed by the connection
-    object and if it does it returns its data.
 
-    :param connection:      The Connection instance object.
-    :type connection:       yt.
+    def __init__(self, args: Namespace, pool: ConnectionPool, packs: PackCache) -> None:
+        """
+        It creates an instance of the ProjectCache class.
 
-    :param issue_id:        The issue identifier.
-    :type issue_id:         str.
+        :param args:        The parsed command line arguments.
+        :type args:         Namespace.
 
-    :return: It returns the issue data structure when the issue exists, it returns None otherwise.
-    :rtype: Opt[Dict[Any, Any]].
-    """
-    logger = getLogger(__name__)
+        :param pool:        The pool of connections to the target instance.
+        :type pool:         ConnectionPool.
 
-    try:
-        return connection.getIssue(issue_id)
-    except (YouTrackException, Exception) as e:
-        logger.error(e.__str__().decode('utf-8', errors='ignore'))
+        :param packs:       The readers of the packs of the session.
+        :type packs:        PackCache.
+        """
+        self.args = args
+        self.pool = pool
+        self.packs = packs
+        self.backup_path = args.backup
+        self.page_size = args.page_size
+        self.lock = Lock()
+        self.locks = {}
+        self.sources = {}
+        self.targets = {}
+        self.definitions = {}
+        self.created = {}
+        self.issues = {}
+
+    def project_lock(self, project_id: str) -> Lock:
+        """
+        It returns the lock serializing the lookups of the project with the given identifier.
 
-    return None
+        :param project_id:  The identifier of the project.
+        :type project_id:   str.
+
+        :return: See description.
+        :rtype: Lock.
+        """
+        with self.lock:
+            return self.locks.setdefault(project_id, Lock())
+
+    def source(self, project_id: str, folder: Opt[Path] = None) -> Opt[TSource]:
+        """
+        It returns the backed up archive of the project with the given identifier, None when it has not been backed up.
+        The archive is looked for in the given folder, the one of the backup by default, the first time.
+
+        :param project_id:  The identifier of the project.
+        :type project_id:   str.
+
+        :param folder:      The folder of the backup holding the issues of the project.
+        :type folder:       Opt[Path].
+
+        :return: See description.
+        :rtype: Opt[TSource].
+        """
+        with self.project_lock(project_id):
+            if project_id not in self.sources:
+                with metrics.timer('project_lookup', project_id):
+                    self.sources[project_id] = exists_backed_up_project(project_id, folder or self.backup_path,
+                                                                           self.packs)
+                if not self.sources[project_id]:
+                    getLogger(__name__).warning(f'The `{project_id:<12}` project has not been baked up.')
+            return self.sources[project_id]
+
+    def target(self, project_id: str) -> Opt[Project]:
+        """
+        It returns the definition of the project with the given identifier on the target instance, None when it does
+        not exist there.
+
+        :param project_id:  The identifier of the project.
+        :type project_id:   str.
+
+        :return: See description.
+        :rtype: Opt[Project].
+        """
+        with self.project_lock(project_id):
+            if project_id not in self.targets:
+                with self.pool.connection() as connection, metrics.timer('project_lookup', project_id):
+                    self.targets[project_id] = exists_youtrack_project(project_id, connection)
+                if not self.targets[project_id]:
+                    getLogger(__name__).warning(f'The `{project_id:<12}` project does not exists on the target instance.')
+            return self.targets[project_id]
+
+    def definition(self, project_id: str) -> Opt[Dict[Any, Any]]:
+        """
+        It returns the backed up definition of the project with the given identifier, None when it is not available.
+
+        :param project_id:  The identifier of the project.
+        :type project_id:   str.
+
+        :return: See description.
+        :rtype: Opt[Dict[Any, Any]].
+        """
+        project_path = self.source(project_id)
+
+        with self.project_lock(project_id):
+            if project_id in self.definitions:
+                return self.definitions[project_id]
+
+            self.definitions[project_id] = None
+            if not project_path:
+                return None
+
+            try:
+                with BackedUpArchive(project_path, self.packs) as archive, metrics.timer('read', project_id):
+                    self.definitions[project_id] = archive.load(f'{project_id}.json')
+            except (IOError, OSError, Exception) as e:
+                getLogger(__name__).error(f'The project at `{project_path}` cannot be read: {e}. Action: skipped.')
+
+            return self.definitions[project_id]
+
+    def create(self, project_id: str) -> Opt[Project]:
+        """
+        It creates on the target instance the project with the given identifier from its backed up definition, unless
+        it has already been attempted during this session. On success the cached target definition is invalidated so
+        that it is fetched again.
+
+        :param project_id:  The identifier of the project.
+        :type project_id:   str.
+
+        :return: It returns the definition of the project on the target instance on success, None otherwise.
+        :rtype: Opt[Project].
+        """
+        project_data = self.definition(project_id)
+
+        with self.project_lock(project_id):
+            if project_id not in self.created:
+                with self.pool.connection() as connection, metrics.timer('project_create', project_id):
+                    self.created[project_id] = create_project(connection, project_data) if project_data else None
+                if self.created[project_id] is not None:
+                    getLogger(__name__).info(f'The `{project_id:<12}` project has been created on the target instance.')
+                    self.targets.pop(project_id, None)
+                    self.issues[project_id] = set()
+
+        return self.target(project_id)
+
+    def prepare(self, project_id: str, folder: Opt[Path] = None) -> Opt[Project]:
+        """
+        It makes the project with the given identifier ready to receive its issues: it is created from its backed up
+        definition when missing on the target instance, and the identifiers of its existing issues are listed. When a
+        plan is applied the project is created only when planned so, and its issues are not listed.
+
+        :param project_id:  The identifier of the project.
+        :type project_id:   str.
+
+        :param folder:      The folder of the backup holding the issues of the project.
+        :type folder:       Opt[Path].
+
+        :return: It returns the definition of the project on the target instance on success, None otherwise.
+        :rtype: Opt[Project].
+        """
+        # The plan tells which projects to create, and which issues exist
+        if self.args.apply_plan:
+            return self.create(project_id) if project_id in self.args.apply_plan.projects() else \
+                self.target(project_id)
+
+        project = self.target(project_id)
+
+        # Project is not defined on target instance but we have a baked up definition
+        if not project and self.source(project_id, folder):
+            project = self.create(project_id)
+
+        if project:
+            self.existing(project_id)
+
+        return project
+
+    def existing(self, project_id: str) -> Set[str]:
+        """
+        It returns the identifiers of the issues of the project with the given identifier existing on the target
+        instance before the restore. They are listed in pages of page_size issues the first time, carrying only their
+        identifier. The issues created afterwards are not added, since the target instance may assign them the
+        identifier of a backed up issue yet to be restored.
+
+        :param project_id:  The identifier of the project.
+        :type project_id:   str.
+
+        :return: See description.
+        :rtype: Set[str].
+        """
+        if not self.target(project_id):
+            return set()
+
+        with self.project_lock(project_id):
+            if project_id not in self.issues:
+                issue_ids, after = set(), 0
+                while True:
+                    with self.pool.connection() as connection, metrics.timer('issue_lookup', project_id):
+                        page = connection.getAllIssues(f'project: {{{project_id}}}', after, self.page_size,
+                                                       withFields=('numberInProject',))
+                    issue_ids.update(issue.id for issue in page)
+                    if len(page) < self.page_size:
+                        break
+                    after += len(page)
+                self.issues[project_id] = issue_ids
+            return self.issues[project_id]
+
+    def exists(self, issue_id: str) -> bool:
+        """
+        It tells whether the issue with the given identifier exists on the target instance.
 
+        :param issue_id:    The identifier of the issue.
+        :type issue_id:     str.
 
-def extract_backed_up_issue(issue_path: Union[Path, str], ) -> Union[Path, str, None]:
-    pass
+        :return: See description.
+        :rtype: bool.
+        """
+        project_id = issue_id.rpartition('-')[0]
+        existing = self.existing(project_id)
+        with self.project_lock(project_id):
+            return issue_id in existing
 
 
 def create_issue(connection: yt, issue_data: Dict[Any, Any]) -> Opt[Dict[Any, Any]]:
@@ -403,157 +931,1427 @@ def create_issue(connection: yt, issue_data: Dict[Any, Any]) -> Opt[Dict[Any, An
     issue = None
 
     try:
+        # The custom fields are backed up under their names, the missing ones are left to the project defaults
         issue = connection.createIssue(
             project=issue_data['projectShortName'],
-            assignee=issue_data['assignee'],
+            assignee=issue_data.get('Assignee'),
             summary=issue_data['summary'],
-            description=issue_data['description'],
-            priority=issue_data['Priority'],
-            state=issue_data['State'],
-            type=issue_data['Type']
+            description=issue_data.get('description'),
+            priority=issue_data.get('Priority'),
+            state=issue_data.get('State'),
+            type=issue_data.get('Type')
         )
 
     except (YouTrackException, Exception) as e:
         logger.error(e)
 
     if not issue:
-        logger.error(f'Issue creation failed for: {issue}')
+        logger.error(f'Issue creation failed for: {issue_data.get("id")}')
 
     return issue
 
 
-def restore_issue(connection: yt, issue_path: TPath, overwrite_set: Set[str]) -> Opt[Dict[Any, Any]]:
+def field_command(name: str, value: Any) -> str:
     """
-    It restores the issue stored at issue_path on the given connection to the YouTrack target instance keeping account
-    of overwrite preferences expressed by the user
+    It returns the YouTrack command setting the custom field with the given name to the given value or values, those
+    made of several words being enclosed in braces.
 
-    :param connection:      The YouTrack connection instance object.
-    :type connection:       Connection.
+    :param name:    The name of the custom field.
+    :type name:     str.
 
-    :param issue_path:      The path of the issue to be restored.
-    :type issue_path:       TPath.
+    :param value:   The value, or the list of values.
+    :type value:    Any.
+
+    :return: See description.
+    :rtype: str.
+    """
+    values = value if isinstance(value, list) else [value]
+    return ' '.join([name] + [f'{{{v}}}' if ' ' in str(v) else str(v) for v in values])
 
-    :param overwrite_set:   The set of identifier of issues to overwrite.
-    :type overwrite_set:    Set[str].
 
-    :return: On success it returns the restored issue, on failure None.
-    :rtype: Opt[Dict[Any, Any]].
+class Journal:
+    """
+    It durably records what restore sessions did on a target instance, one JSON line per event appended and synced to
+    disk as soon as it happens: the creation of an issue, before and after the request, along with its project and its
+    identifier on the target instance, the upload of each of its attachments and its completion. A later session
+    restoring the same backup onto the same instance skips the completed issues without asking the server, and only
+    uploads the attachments left for the issues created halfway. A line torn by a crash is ignored.
     """
-    logger = getLogger(__name__)
 
-    try:
-        issue_id = guess_issue_id(issue_path)
+    def __init__(self, path: Path, readonly: bool = False) -> None:
+        """
+        It creates an instance of the Journal class loading the journal at the given path, if any, and opening it for
+        appending unless readonly is given, in which case nothing is ever written.
 
-        if not issue_id:
-            logger.error(f'Cannot guess the issue identifier from `{issue_path}`.')
-            return
+        :param path:        The path of the journal.
+        :type path:         Path.
 
-        target_issue = None
+        :param readonly:    Whether the journal is only read.
+        :type readonly:     bool.
+        """
+        self.path = path
+        self.lock = Lock()
+        self.issues = {}
+
+        if path.exists():
+            with open(str(path), 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        self.apply(loads(line))
+                    except (ValueError, KeyError, TypeError):
+                        continue
+
+        self.f = None
+        if not readonly:
+            self.f = open(str(path), 'a', encoding='utf-8')
+            # Terminates the line possibly torn by a crash
+            self.write(None)
+
+    def apply(self, record: Dict[str, Any]) -> None:
+        """
+        It updates what is known of the issue of the given record.
 
-        try:
-            target_issue = connection.getIssue(issue_id)
-        except YouTrackException as e:
-            pass
+        :param record:  The record.
+        :type record:   Dict[str, Any].
 
-        if not target_issue or issue_id in overwrite_set:
-            with open(issue_path, 'r', encoding='utf-8-sig', errors='ignore') as f:
-                data = f.read()
-                json = loads(data)
-                return create_issue(connection, json)
+        :return: None.
+        :rtype: None.
+        """
+        entry = self.issues.setdefault(record['issue'], dict(attachments=[]))
+        if 'attachment' in record:
+            entry['attachments'].append(record['attachment'])
+        else:
+            entry.update({k: v for k, v in record.items() if k != 'issue'})
 
-    except (IOError, OSError, Exception) as e:
-        logger.error(str(e))
+    def entry(self, issue_id: str) -> Opt[Dict[str, Any]]:
+        """
+        It returns what is recorded about the backed up issue with the given identifier: its project, its state,
+        creating, created or done, its identifier on the target instance once created and the names of its uploaded
+        attachments. None when nothing is recorded.
 
-    return None
+        :param issue_id:    The identifier of the backed up issue.
+        :type issue_id:     str.
 
+        :return: See description.
+        :rtype: Opt[Dict[str, Any]].
+        """
+        with self.lock:
+            entry = self.issues.get(issue_id)
+            return dict(entry, attachments=list(entry['attachments'])) if entry and 'state' in entry else None
 
-def restore(connection: yt, issue: TPath, prjs: Set[Path], backup_path: TPath, tempdir: str, args: Namespace) -> bool:
-    """
+    def target(self, issue_id: str) -> str:
+        """
+        It returns the identifier on the target instance of the backed up issue with the given identifier: the one the
+        journal records it has been created with, its own one otherwise.
 
-    :param connection:  The YouTrack connection instance object.
-    :type connection:   Connection.
+        :param issue_id:    The identifier of the backed up issue.
+        :type issue_id:     str.
 
-    :param issue:       The backed up issue zip file path.
-    :type issue:        TPath.
+        :return: See description.
+        :rtype: str.
+        """
+        entry = self.entry(issue_id)
+        return entry.get('target') or issue_id if entry else issue_id
 
-    :param prjs:        The set of backed up projects.
-    :type prjs:         Set[Path].
+    def is_done(self, issue_id: str) -> bool:
+        """
+        It tells whether the backed up issue with the given identifier has been restored along with its attachments.
 
-    :param backup_path: The path where the backup to restore is stored.
-    :type backup_path:  TPath.
+        :param issue_id:    The identifier of the backed up issue.
+        :type issue_id:     str.
 
-    :param tempdir:     The temporary directory where projects and issues are unzipped.
-    :type tempdir:      TPath.
+        :return: See description.
+        :rtype: bool.
+        """
+        entry = self.entry(issue_id)
+        return bool(entry) and entry['state'] == 'done'
 
-    :param args:        The parsed command line arguments.
-    :type args:         Namespace.
+    def creating(self, issue_id: str, project_id: str) -> None:
+        """
+        It records the backed up issue with the given identifier as being created on the target instance.
 
-    :return: It returns True upon successful issue restoration, False otherwise.
-    :rtype: bool.
-    """
-    logger = getLogger(__name__)
+        :param issue_id:    The identifier of the backed up issue.
+        :type issue_id:     str.
 
-    # Acquire the project_id id
-    project_id = guess_project_id(issue)
+        :param project_id:  The identifier of its project.
+        :type project_id:   str.
 
-    # When the project id cannot be guessed the issue is skipped
-    if not project_id:
-        logger.warning(f'Cannot guess the project identifier for the issue: `{issue}`. Action: Skipped.')
-        return False
+        :return: None.
+        :rtype: None.
+        """
+        self.write(dict(issue=issue_id, project=project_id, state='creating'))
 
-    # Acquiring the backed up project_id
-    project_path = exists_backed_up_project(project_id, prjs, backup_path)
+    def created(self, issue_id: str, project_id: str, target_id: str) -> None:
+        """
+        It records the backed up issue with the given identifier as created on the target instance with the given
+        identifier.
 
-    # No project with the given project_id has been backed up
-    if not project_path:
-        logger.warning(f'The `{project_id:<12}` project has not been baked up. Issue: `{issue}`')
+        :param issue_id:    The identifier of the backed up issue.
+        :type issue_id:     str.
 
-    # Acquiring the defined project on the target instance
-    project = exists_youtrack_project(project_id, connection)
+        :param project_id:  The identifier of its project.
+        :type project_id:   str.
 
-    # Checking if the projects is defined on the target instance
-    if not project:
-        logger.warning(f'The `{project_id:<12}` project does not exists on the target instance.')
+        :param target_id:   The identifier of the issue on the target instance.
+        :type target_id:    str.
 
-    # Project is not defined on target instance but we have a baked up definition
-    if not project and project_path:
+        :return: None.
+        :rtype: None.
+        """
+        self.write(dict(issue=issue_id, project=project_id, target=target_id, state='created'))
 
-        project_extracted = extract_backed_up_project(project_path, tempdir)
-        if not project_extracted:
-            logger.error(f'The project at `{project_path}` cannot be extracted. Action: skipped.')
-            return False
+    def uploaded(self, issue_id: str, name: str) -> None:
+        """
+        It records the attachment with the given name of the given backed up issue as uploaded.
 
-        try:
-            with open(Path(project_extracted) / f'{project_id}.json', 'r') as f:
-                project_content = loads(f.read())
+        :param issue_id:    The identifier of the backed up issue.
+        :type issue_id:     str.
 
-        except (IOError, OSError, Exception) as e:
-            logger.error(e)
-            return False
+        :param name:        The name of the attachment.
+        :type name:         str.
 
-        r = create_project(connection, project_content)
-        return True
+        :return: None.
+        :rtype: None.
+        """
+        self.write(dict(issue=issue_id, attachment=name))
 
-    # Project is defined on the target instance but we do not have a backed up definition
-    if project and not project_path:
-        restore_issue(connection, issue_path=issue, overwrite_set=set(args.oi))
+    def done(self, issue_id: str) -> None:
+        """
+        It records the given backed up issue as restored along with all its attachments.
 
-    # We have both: the definition of the project on the target instance and a backed up definition
-    if project and project_path:
-        logger.info(f'The `{project_id:<12}` project already exists on the target instance.')
-        restore_issue(connection, issue_path=issue, overwrite_set=set(args.oi))
-        return True
+        :param issue_id:    The identifier of the backed up issue.
+        :type issue_id:     str.
 
-    # We miss a definition for the project
-    logger.error(f'The `{project_id:<12}` project cannot be restored. Action: Skip.')
-    return False
+        :return: None.
+        :rtype: None.
+        """
+        self.write(dict(issue=issue_id, state='done'))
 
+    def write(self, record: Opt[Dict[str, Any]]) -> None:
+        """
+        It appends the given record to the journal, and to what is known of its issue, and syncs it to disk. An empty
+        line is written when the record is None.
 
-def compare_issues(connection: yt, lh_issue, rh_issue):
-    pass
+        :param record:  The record.
+        :type record:   Opt[Dict[str, Any]].
 
+        :return: None.
+        :rtype: None.
+        """
+        with self.lock:
+            if record is not None:
+                self.apply(record)
+            if self.f:
+                self.f.write((dumps(record) if record is not None else '') + '\n')
+                self.f.flush()
+                fsync(self.f.fileno())
+
+    def close(self) -> None:
+        """
+        It closes the journal.
 
-def usage(args: List[str]) -> Namespace:
+        :return: None.
+        :rtype: None.
+        """
+        with self.lock:
+            if self.f:
+                self.f.close()
+                self.f = None
+
+
+def is_rechecked(args: Namespace, issue_id: str) -> bool:
+    """
+    It tells whether the backed up issue with the given identifier is compared with its backup even when the journal
+    records it as restored: when it is given with args.oi, or args.update is given.
+
+    :param args:        The parsed command line arguments.
+    :type args:         Namespace.
+
+    :param issue_id:    The identifier of the backed up issue.
+    :type issue_id:     str.
+
+    :return: See description.
+    :rtype: bool.
+    """
+    return issue_id in args.oi or args.update
+
+
+def journal_path(args: Namespace) -> Path:
+    """
+    It returns the path of the journal of the restore sessions of the backup onto the target instance: the one given
+    with args.journal, or a restore-<host>.jsonl file inside the backup folder.
+
+    :param args:    The parsed command line arguments.
+    :type args:     Namespace.
+
+    :return: See description.
+    :rtype: Path.
+    """
+    if args.journal:
+        return Path(args.journal)
+    host = sub(r'[^\w.-]+', '_', urlsplit(args.url).netloc)
+    return args.backup / f'restore-{host}.jsonl'
+
+
+def upload_attachment(connection: Connection, issue_id: str, attachment: Dict[str, Any], content: IO[bytes],
+                      size: int) -> bool:
+    """
+    It uploads the given attachment to the given issue of the target instance as a multipart/form-data request whose
+    body is streamed in chunks of CHUNK_SIZE bytes: its length is computed up front, so the content is never held in
+    memory. The original author, creation time and group are sent along and kept when the target instance allows.
+    The upload is attempted again when refused by the server, or when the connection drops before it is sent.
+
+    :param connection:  The connection to the target instance.
+    :type connection:   Connection.
+
+    :param issue_id:    The identifier of the issue on the target instance.
+    :type issue_id:     str.
+
+    :param attachment:  The backed up metadata of the attachment.
+    :type attachment:   Dict[str, Any].
+
+    :param content:     The content of the attachment.
+    :type content:      IO[bytes].
+
+    :param size:        The size of the content.
+    :type size:         int.
+
+    :return: It returns True on success, False otherwise.
+    :rtype: bool.
+    """
+    logger = getLogger(__name__)
+    params = {k: attachment.get(k) for k in ('authorLogin', 'created', 'group') if attachment.get(k)}
+    path = f'{urlsplit(connection.baseUrl).path}/issue/{quote(issue_id)}/attachment?{urlencode(params)}'
+
+    # Connection.createAttachment() relies on the Python 2 file type and buffers the whole content
+    boundary = uuid4().hex
+    name = attachment['name'].replace('"', '%22')
+    head = (f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{name}"\r\n'
+            f'Content-Type: application/octet-stream\r\n\r\n').encode('utf-8')
+    tail = f'\r\n--{boundary}--\r\n'.encode('ascii')
+    attempt = 0
+
+    while True:
+        http = connection.open_stream()
+        sending = True
+
+        try:
+            http.putrequest('POST', path)
+            for k, v in connection.headers.items():
+                http.putheader(k, v)
+            http.putheader('Content-Type', f'multipart/form-data; boundary={boundary}')
+            http.putheader('Content-Length', str(len(head) + size + len(tail)))
+            http.endheaders()
+
+            sent = 0
+            http.send(head)
+            for chunk in iter(lambda: content.read(CHUNK_SIZE), b''):
+                http.send(chunk)
+                sent += len(chunk)
+            if sent != size:
+                raise ValueError(f'{sent} bytes read out of {size}')
+            http.send(tail)
+            sending = False
+
+            response = http.getresponse()
+            response.read()
+            requested = retry_after(response.getheader('Retry-After'))
+            if is_refused(response.status, requested) and attempt < connection.retries and content.seekable():
+                content.seek(0)
+                connection.retry('POST', path, attempt, response.status, requested)
+                attempt += 1
+                continue
+            if response.status >= 300:
+                raise HTTPException(f'{response.status} {response.reason}')
+
+            logger.debug(f'Attachment uploaded: `{issue_id}` `{attachment["name"]}` ({size} bytes)')
+            return True
+
+        except (HTTPException, OSError, ValueError) as e:
+            http.close()
+            if sending and not isinstance(e, ValueError) and attempt < connection.retries and content.seekable():
+                content.seek(0)
+                connection.retry('POST', path, attempt, e)
+                attempt += 1
+                continue
+            logger.error(f'The attachment `{attachment["name"]}` of `{issue_id}` cannot be uploaded: {e}')
+            return False
+
+
+def restore_attachments(args: Namespace, pool: ConnectionPool, archive: BackedUpArchive, issue_id: str,
+                        target_id: str, budget: ByteBudget, journal: Journal) -> int:
+    """
+    It uploads the backed up attachments of the given issue to the issue restored on the target instance, at most
+    args.attachment_jobs at a time and within the given budget of bytes in flight shared by all the issues. The
+    attachments the journal records as uploaded are skipped, the uploaded ones are recorded.
+
+    :param args:        The parsed command line arguments.
+    :type args:         Namespace.
+
+    :param pool:        The pool of connections to the target instance.
+    :type pool:         ConnectionPool.
+
+    :param archive:     The archive of the backed up issue.
+    :type archive:      BackedUpArchive.
+
+    :param issue_id:    The identifier of the backed up issue.
+    :type issue_id:     str.
+
+    :param target_id:   The identifier of the issue on the target instance.
+    :type target_id:    str.
+
+    :param budget:      The budget of bytes in flight.
+    :type budget:       ByteBudget.
+
+    :param journal:     The journal of the restore sessions.
+    :type journal:      Journal.
+
+    :return: The number of attachments that could not be uploaded.
+    :rtype: int.
+    """
+    project_id = issue_id.rpartition('-')[0]
+
+    def restore_attachment(attachment: Dict[str, Any]) -> bool:
+        size = archive.attachment_size(issue_id, attachment)
+        with budget.reserve(size):
+            content = archive.open_attachment(issue_id, attachment)
+            if content is None:
+                return False
+            # Reading the content out of the backup is accounted apart from its upload
+            with metrics.metered(content, 'read', project_id) as content, pool.connection() as connection, \
+                    metrics.timer('upload', project_id) as sample:
+                sample.size = size
+                if not upload_attachment(connection, target_id, attachment, content, size):
+                    return False
+        journal.uploaded(issue_id, attachment['name'])
+        return True
+
+    entry = journal.entry(issue_id)
+    uploaded = set(entry['attachments']) if entry else set()
+    attachments = [a for a in archive.attachments(issue_id) if a['name'] not in uploaded]
+    if not attachments:
+        return 0
+
+    with ThreadPoolExecutor(max_workers=args.attachment_jobs) as executor:
+        return sum(1 for uploaded in executor.map(restore_attachment, attachments) if not uploaded)
+
+
+def issue_changes(archive: BackedUpArchive, issue_id: str, issue: Dict[str, Any]) -> Opt[Dict[str, Any]]:
+    """
+    It compares the fingerprint of the given issue of the target instance, as answered by the REST API with the
+    TARGET_FIELDS, with the one of its backup and returns their differences, as returned by differences().
+
+    :param archive:     The archive of the backed up issue.
+    :type archive:      BackedUpArchive.
+
+    :param issue_id:    The identifier of the issue, on the target instance as well.
+    :type issue_id:     str.
+
+    :param issue:       The issue of the target instance.
+    :type issue:        Dict[str, Any].
+
+    :return: It returns the differences, None when the issue is unchanged.
+    :rtype: Opt[Dict[str, Any]].
+    """
+    with metrics.timer('read', issue_id.rpartition('-')[0]):
+        backed_up = archive.fingerprint(issue_id)
+
+    target = target_fingerprint(issue, backed_up)
+
+    # Matching digests spare the comparison
+    changes = None if target['digest'] == backed_up['digest'] else differences(backed_up, target)
+    return None if is_unchanged(changes) else changes
+
+
+def is_created_copy(pool: ConnectionPool, archive: BackedUpArchive, issue_id: str) -> bool:
+    """
+    It tells whether the issue with the given identifier existing on the target instance is the copy of the backed up
+    issue with the same identifier, as created by a session stopped before the response: the summary and the
+    description set by the creation match the backed up ones, its comments and attachments may be missing. It costs a
+    single request.
+
+    :param pool:        The pool of connections to the target instance.
+    :type pool:         ConnectionPool.
+
+    :param archive:     The archive of the backed up issue.
+    :type archive:      BackedUpArchive.
+
+    :param issue_id:    The identifier of the issue, on the target instance as well.
+    :type issue_id:     str.
+
+    :return: See description.
+    :rtype: bool.
+    """
+    with pool.connection() as connection, metrics.timer('issue_lookup', issue_id.rpartition('-')[0]):
+        issue = connection.getJson(f'/api/issues/{quote(issue_id)}', dict(fields=TARGET_FIELDS))
+
+    backed_up = archive.fingerprint(issue_id)
+    target = target_fingerprint(issue, backed_up)
+    return all(target['fields'][name] == backed_up['fields'][name] for name in BUILTIN_FIELDS)
+
+
+def update_issue(args: Namespace, pool: ConnectionPool, archive: BackedUpArchive, issue_id: str, target_id: str,
+                 budget: ByteBudget, journal: Journal) -> Opt[Dict[str, Any]]:
+    """
+    It brings the issue with the given target identifier existing on the target instance in line with the backup of
+    the issue with the given identifier, without creating it again. The fingerprint of the target issue, fetched in a
+    single request, is compared with the backed up one and only their differences are applied by apply_changes. An
+    unchanged issue costs that single request.
+
+    :param args:        The parsed command line arguments.
+    :type args:         Namespace.
+
+    :param pool:        The pool of connections to the target instance.
+    :type pool:         ConnectionPool.
+
+    :param archive:     The archive of the backed up issue.
+    :type archive:      BackedUpArchive.
+
+    :param issue_id:    The identifier of the backed up issue.
+    :type issue_id:     str.
+
+    :param target_id:   The identifier of the issue on the target instance.
+    :type target_id:    str.
+
+    :param budget:      The budget of attachment bytes in flight.
+    :type budget:       ByteBudget.
+
+    :param journal:     The journal of the restore sessions.
+    :type journal:      Journal.
+
+    :return: It returns the journal entry of the issue once updated, None when some attachments failed.
+    :rtype: Opt[Dict[str, Any]].
+    """
+    with pool.connection() as connection, metrics.timer('issue_lookup', issue_id.rpartition('-')[0]):
+        issue = connection.getJson(f'/api/issues/{quote(target_id)}', dict(fields=TARGET_FIELDS))
+
+    changes = issue_changes(archive, issue_id, issue)
+
+    if not changes:
+        getLogger(__name__).info(f'Unchanged issue: `{issue_id}`')
+        journal.done(issue_id)
+        return journal.entry(issue_id)
+
+    return apply_changes(args, pool, archive, issue_id, target_id, changes, budget, journal)
+
+
+def apply_changes(args: Namespace, pool: ConnectionPool, archive: BackedUpArchive, issue_id: str, target_id: str,
+                  changes: Dict[str, Any], budget: ByteBudget, journal: Journal) -> Opt[Dict[str, Any]]:
+    """
+    It applies to the issue with the given target identifier existing on the target instance the given differences
+    with the backup of the issue with the given identifier: the differing fields are updated with their backed up
+    values, the missing comments added and the missing attachments uploaded.
+
+    :param args:        The parsed command line arguments.
+    :type args:         Namespace.
+
+    :param pool:        The pool of connections to the target instance.
+    :type pool:         ConnectionPool.
+
+    :param archive:     The archive of the backed up issue.
+    :type archive:      BackedUpArchive.
+
+    :param issue_id:    The identifier of the backed up issue.
+    :type issue_id:     str.
+
+    :param target_id:   The identifier of the issue on the target instance.
+    :type target_id:    str.
+
+    :param changes:     The differences, as returned by differences().
+    :type changes:      Dict[str, Any].
+
+    :param budget:      The budget of attachment bytes in flight.
+    :type budget:       ByteBudget.
+
+    :param journal:     The journal of the restore sessions.
+    :type journal:      Journal.
+
+    :return: It returns the journal entry of the issue once updated, None when some attachments failed.
+    :rtype: Opt[Dict[str, Any]].
+    """
+    logger = getLogger(__name__)
+    project_id = issue_id.rpartition('-')[0]
+
+    fields, comments, attachments = changes['fields'], changes['comments'], changes['attachments']
+    logger.info(f'Updating `{issue_id}` as `{target_id}`: {len(fields)} fields, {len(comments)} comments, '
+                f'{len(attachments)} attachments.')
+
+    if fields or comments:
+        with metrics.timer('read', project_id):
+            data = archive.load(f'{issue_id}.json')
+
+        with pool.connection() as connection, metrics.timer('update', project_id):
+            if any(name in fields for name in BUILTIN_FIELDS):
+                connection.updateIssue(target_id, data.get('summary'), data.get('description'))
+            for name in fields:
+                if name not in BUILTIN_FIELDS:
+                    connection.executeCommand(target_id, field_command(name, data.get(name)))
+            for text in comments:
+                connection.executeCommand(target_id, '', comment=text)
+
+    # The attachments already there are recorded as uploaded, so that only the missing ones are
+    journal.created(issue_id, project_id, target_id)
+    for attachment in archive.attachments(issue_id):
+        if attachment['name'] not in attachments:
+            journal.uploaded(issue_id, attachment['name'])
+
+    failures = restore_attachments(args, pool, archive, issue_id, target_id, budget, journal)
+    if failures:
+        logger.warning(f'{failures} attachments of `{issue_id}` have not been restored.')
+        return None
+
+    journal.done(issue_id)
+    return journal.entry(issue_id)
+
+
+class CreationOrder:
+    """
+    It lets the issues of each project be created one after the other in numeric order, so that the target instance
+    assigns the identifiers of the created issues in the same order as the backed up ones, while everything else is
+    done concurrently. Every discovered issue is pending until it is settled, that is until it has been created or
+    found not to need a creation. The creation of an issue deferred to the order is handed to submit as soon as the
+    issue is the lowest pending one of its project and every lower number has been discovered, or the discovery is
+    over. Nothing ever waits for a turn: the creations are submitted by the thread settling the previous issue. It is
+    safe to use from several threads.
+    """
+
+    def __init__(self, submit: Callable[[Callable[[], str]], Any]) -> None:
+        """
+        It creates an instance of the CreationOrder class.
+
+        :param submit:  The function running the given creation of an issue, which returns the outcome of its restore.
+        :type submit:   Callable[[Callable[[], str]], Any].
+        """
+        self.submit = submit
+        self.lock = Lock()
+        self.complete = False
+        self.projects = {}
+
+    def project(self, issue_id: str) -> Tuple[Dict[str, Any], int]:
+        """
+        It returns what is known of the project of the issue with the given identifier along with the number of the
+        issue. It must be called holding the lock.
+
+        :param issue_id:    The identifier of the issue.
+        :type issue_id:     str.
+
+        :return: See description.
+        :rtype: Tuple[Dict[str, Any], int].
+        """
+        project_id, _, number = issue_id.rpartition('-')
+        project = self.projects.setdefault(project_id, dict(pending=set(), heap=[], seen=set(), prefix=0, ready={}))
+        return project, int(number) if number.isdigit() else 0
+
+    def discover(self, issue_id: str, pending: bool = True) -> None:
+        """
+        It records the discovery of the issue with the given identifier, pending unless told otherwise, e.g. when the
+        journal records it as restored.
+
+        :param issue_id:    The identifier of the issue.
+        :type issue_id:     str.
+
+        :param pending:     Whether the issue is to be settled.
+        :type pending:      bool.
+
+        :return: None.
+        :rtype: None.
+        """
+        with self.lock:
+            project, number = self.project(issue_id)
+            if pending and number not in project['pending']:
+                project['pending'].add(number)
+                heappush(project['heap'], number)
+            # Only the numbers above the contiguous prefix of discovered ones are remembered
+            project['seen'].add(number)
+            while project['prefix'] + 1 in project['seen']:
+                project['prefix'] += 1
+                project['seen'].remove(project['prefix'])
+            creation = self.next(project)
+        if creation:
+            self.submit(creation)
+
+    def defer(self, issue_id: str, creation: Callable[[], str]) -> None:
+        """
+        It defers to its turn the given creation of the issue with the given identifier, which stays pending.
+
+        :param issue_id:    The identifier of the issue.
+        :type issue_id:     str.
+
+        :param creation:    The function creating the issue, which returns the outcome of its restore.
+        :type creation:     Callable[[], str].
+
+        :return: None.
+        :rtype: None.
+        """
+        with self.lock:
+            project, number = self.project(issue_id)
+            project['ready'][number] = creation
+            creation = self.next(project)
+        if creation:
+            self.submit(creation)
+
+    def settle(self, issue_id: str) -> None:
+        """
+        It records that the issue with the given identifier has been created or does not need a creation, letting the
+        next one of its project be created. Settling an issue twice is harmless.
+
+        :param issue_id:    The identifier of the issue.
+        :type issue_id:     str.
+
+        :return: None.
+        :rtype: None.
+        """
+        with self.lock:
+            project, number = self.project(issue_id)
+            project['pending'].discard(number)
+            creation = self.next(project)
+        if creation:
+            self.submit(creation)
+
+    def close(self) -> None:
+        """
+        It records the end of the discovery: the numbers never discovered are not waited for any longer.
+
+        :return: None.
+        :rtype: None.
+        """
+        with self.lock:
+            self.complete = True
+            creations = [self.next(project) for project in self.projects.values()]
+        for creation in creations:
+            if creation:
+                self.submit(creation)
+
+    def next(self, project: Dict[str, Any]) -> Opt[Callable[[], str]]:
+        """
+        It returns the creation of the given project whose turn has come, removing it from the deferred ones, None when
+        there is none. It must be called holding the lock.
+
+        :param project: What is known of the project.
+        :type project:  Dict[str, Any].
+
+        :return: See description.
+        :rtype: Opt[Callable[[], str]].
+        """
+        heap = project['heap']
+        # The settled numbers are dropped lazily
+        while heap and heap[0] not in project['pending']:
+            heappop(heap)
+        if not heap or heap[0] not in project['ready']:
+            return None
+        if not self.complete and project['prefix'] < heap[0] - 1:
+            return None
+        return project['ready'].pop(heap[0])
+
+
+def complete_issue(args: Namespace, pool: ConnectionPool, archive: BackedUpArchive, issue_id: str, target_id: str,
+                   comments: List[str], budget: ByteBudget, journal: Journal) -> str:
+    """
+    It adds the given comments to the issue with the given target identifier, created from the backup of the issue with
+    the given identifier, uploads its backed up attachments the journal does not record as uploaded and records it as
+    restored.
+
+    :param args:        The parsed command line arguments.
+    :type args:         Namespace.
+
+    :param pool:        The pool of connections to the target instance.
+    :type pool:         ConnectionPool.
+
+    :param archive:     The archive of the backed up issue.
+    :type archive:      BackedUpArchive.
+
+    :param issue_id:    The identifier of the backed up issue.
+    :type issue_id:     str.
+
+    :param target_id:   The identifier of the issue on the target instance.
+    :type target_id:    str.
+
+    :param comments:    The texts of the comments to be added.
+    :type comments:     List[str].
+
+    :param budget:      The budget of attachment bytes in flight.
+    :type budget:       ByteBudget.
+
+    :param journal:     The journal of the restore sessions.
+    :type journal:      Journal.
+
+    :return: It returns the outcome: 'restored' when everything has been added, 'failed' otherwise.
+    :rtype: str.
+    """
+    logger = getLogger(__name__)
+
+    if comments:
+        with pool.connection() as connection, metrics.timer('update', issue_id.rpartition('-')[0]):
+            for text in comments:
+                connection.executeCommand(target_id, '', comment=text)
+
+    failures = restore_attachments(args, pool, archive, issue_id, target_id, budget, journal)
+    if failures:
+        logger.warning(f'{failures} attachments of `{issue_id}` have not been restored.')
+        return 'failed'
+
+    journal.done(issue_id)
+    return 'restored'
+
+
+def create_restored_issue(args: Namespace, pool: ConnectionPool, issue_path: TSource, issue_id: str,
+                          projects: ProjectCache, budget: ByteBudget, journal: Journal,
+                          order: Opt[CreationOrder] = None) -> str:
+    """
+    It creates on the target instance the backed up issue stored at issue_path, then adds its comments and attachments.
+    The given order, if any, is told the issue is settled as soon as the server has answered the creation, so that the
+    next issue of the project is created while the comments and attachments of this one are being added.
+
+    :param args:        The parsed command line arguments.
+    :type args:         Namespace.
+
+    :param pool:        The pool of connections to the target instance.
+    :type pool:         ConnectionPool.
+
+    :param issue_path:  The path of the issue to be created.
+    :type issue_path:   TSource.
+
+    :param issue_id:    The identifier of the backed up issue.
+    :type issue_id:     str.
+
+    :param projects:    The projects known to the current restore session.
+    :type projects:     ProjectCache.
+
+    :param budget:      The budget of attachment bytes in flight.
+    :type budget:       ByteBudget.
+
+    :param journal:     The journal of the restore sessions.
+    :type journal:      Journal.
+
+    :param order:       The order the creations of the issues of each project follow.
+    :type order:        Opt[CreationOrder].
+
+    :return: It returns the outcome: 'restored' when the issue has been created along with its comments and
+             attachments, 'failed' otherwise.
+    :rtype: str.
+    """
+    logger = getLogger(__name__)
+    project_id = issue_id.rpartition('-')[0]
+
+    try:
+        with BackedUpArchive(issue_path, projects.packs) as archive:
+            try:
+                with metrics.timer('read', project_id):
+                    data = archive.load(f'{issue_id}.json')
+                journal.creating(issue_id, project_id)
+                with pool.connection() as connection, metrics.timer('create', project_id):
+                    issue = create_issue(connection, data)
+                if issue:
+                    target_id = issue[0]['location'].rpartition('/')[2]
+                    metrics.issue(project_id)
+                    journal.created(issue_id, project_id, target_id)
+            finally:
+                if order:
+                    order.settle(issue_id)
+
+            if not issue:
+                return 'failed'
+            return complete_issue(args, pool, archive, issue_id, target_id, archive.fingerprint(issue_id)['comments'],
+                                  budget, journal)
+
+    except (IOError, OSError, Exception) as e:
+        logger.error(str(e))
+
+    return 'failed'
+
+
+def restore_issue(pool: ConnectionPool, issue_path: TSource, overwrite_set: Set[str], projects: ProjectCache,
+                  args: Namespace, budget: ByteBudget, journal: Journal, order: Opt[CreationOrder] = None) -> str:
+    """
+    It restores the issue stored at issue_path on the given connection to the YouTrack target instance keeping account
+    of overwrite preferences expressed by the user. An issue existing on the target instance is left as it is, unless it
+    is to be overwritten or args.update is given: its differences with the backup are then applied through update_issue.
+    An issue the journal records as created by an earlier session is not created again, whatever the overwrite
+    preferences: only its comments and attachments missing from the target issue are added. An issue being created when
+    an earlier session stopped is adopted under its own identifier when the target issue with that identifier is its
+    copy, as told by is_created_copy, and created again otherwise. An issue the journal records as restored is left as
+    it is, unless it is to be overwritten or args.update is given: it is then compared with its backup as any existing
+    issue, and left as it is when missing from the target instance. The issue is looked up, compared and updated under
+    the identifier the journal records it has been created with, which may differ from its own. A missing issue is
+    created through create_restored_issue, right away or, when an order is given, in its turn. When a plan is applied
+    the issue is created, updated or left as it is as planned, without asking the server.
+
+    :param pool:            The pool of connections to the target instance.
+    :type pool:             ConnectionPool.
+
+    :param issue_path:      The path of the issue to be restored.
+    :type issue_path:       TSource.
+
+    :param overwrite_set:   The set of identifier of issues to overwrite.
+    :type overwrite_set:    Set[str].
+
+    :param projects:        The projects known to the current restore session.
+    :type projects:         ProjectCache.
+
+    :param args:            The parsed command line arguments.
+    :type args:             Namespace.
+
+    :param budget:          The budget of attachment bytes in flight.
+    :type budget:           ByteBudget.
+
+    :param journal:         The journal of the restore sessions.
+    :type journal:          Journal.
+
+    :param order:           The order the creations of the issues of each project follow, None when they are not
+                            ordered.
+    :type order:            Opt[CreationOrder].
+
+    :return: It returns the outcome: 'restored' when the issue has been created or brought in line with its backup,
+             'skipped' when it has been left as it is, 'deferred' when its creation has been deferred to the given
+             order, 'failed' otherwise.
+    :rtype: str.
+    """
+    logger = getLogger(__name__)
+
+    try:
+        issue_id = guess_issue_id(issue_path)
+
+        if not issue_id:
+            logger.error(f'Cannot guess the issue identifier from `{issue_path}`.')
+            return 'failed'
+
+        project_id = issue_id.rpartition('-')[0]
+        entry = journal.entry(issue_id)
+        state = entry['state'] if entry else None
+        # The issue may have been created under another identifier by an earlier session
+        target_id = journal.target(issue_id)
+        # The action planned for the issue, the issues missing from the plan are left as they are
+        planned = args.apply_plan.issues().get(issue_id, dict(action='skip')) if args.apply_plan else None
+
+        if state == 'done':
+            if not is_rechecked(args, issue_id):
+                return 'skipped'
+            if not planned and not projects.exists(target_id):
+                logger.warning(f'`{issue_id}` has been restored by an earlier session as `{target_id}` but it is '
+                               f'missing from the target instance. Action: skipped.')
+                return 'skipped'
+            state = None
+
+        create = False
+        if state == 'creating':
+            # A session stopped before the response may have created it, under its own identifier when the numbering of
+            # the target project follows the backup one: the issue found there is adopted only when it is its copy
+            with BackedUpArchive(issue_path, projects.packs) as archive:
+                adopted = projects.exists(issue_id) and is_created_copy(pool, archive, issue_id)
+            if adopted:
+                journal.created(issue_id, project_id, issue_id)
+                state, target_id = 'created', issue_id
+            else:
+                create = True
+
+        if state == 'created' or create or (planned and planned['action'] == 'create'):
+            exists = False
+        else:
+            exists = bool(planned) or projects.exists(target_id)
+
+        if order and (exists or state == 'created'):
+            # Only the creations are ordered, the next one does not wait for this issue
+            order.settle(issue_id)
+
+        if exists:
+            if planned and planned['action'] == 'update':
+                with BackedUpArchive(issue_path, projects.packs) as archive:
+                    entry = apply_changes(args, pool, archive, issue_id, target_id, planned, budget, journal)
+                return 'restored' if entry else 'failed'
+            if not planned and (issue_id in overwrite_set or args.update):
+                with BackedUpArchive(issue_path, projects.packs) as archive:
+                    entry = update_issue(args, pool, archive, issue_id, target_id, budget, journal)
+                return 'restored' if entry else 'failed'
+            # Existing issues are left as they are
+            return 'skipped'
+
+        if state != 'created':
+            if order:
+                order.defer(issue_id, lambda: create_restored_issue(args, pool, issue_path, issue_id, projects, budget,
+                                                                    journal, order))
+                return 'deferred'
+            return create_restored_issue(args, pool, issue_path, issue_id, projects, budget, journal)
+
+        logger.info(f'Resuming `{issue_id}`, created as `{target_id}`.')
+        with BackedUpArchive(issue_path, projects.packs) as archive:
+            # A comment or an upload may have been completed by a session stopped before recording it
+            with pool.connection() as connection, metrics.timer('issue_lookup', project_id):
+                issue = connection.getJson(f'/api/issues/{quote(target_id)}', dict(fields=TARGET_FIELDS))
+            backed_up = archive.fingerprint(issue_id)
+            missing = differences(backed_up, target_fingerprint(issue, backed_up))
+            for attachment in backed_up['attachments']:
+                if attachment['name'] not in missing['attachments']:
+                    journal.uploaded(issue_id, attachment['name'])
+            return complete_issue(args, pool, archive, issue_id, target_id, missing['comments'], budget, journal)
+
+    except (IOError, OSError, Exception) as e:
+        logger.error(str(e))
+
+    return 'failed'
+
+
+def restore(pool: ConnectionPool, issue: TSource, projects: ProjectCache, args: Namespace, budget: ByteBudget,
+            journal: Journal, order: Opt[CreationOrder] = None) -> bool:
+    """
+    It restores the given backed up issue, creating its project on the target instance beforehand when needed. The
+    issue is settled in the given order, if any, unless its creation has been deferred to it.
+
+    :param pool:        The pool of connections to the target instance.
+    :type pool:         ConnectionPool.
+
+    :param issue:       The backed up issue zip file path.
+    :type issue:        TSource.
+
+    :param projects:    The projects known to the current restore session.
+    :type projects:     ProjectCache.
+
+    :param args:        The parsed command line arguments.
+    :type args:         Namespace.
+
+    :param budget:      The budget of attachment bytes in flight.
+    :type budget:       ByteBudget.
+
+    :param journal:     The journal of the restore sessions.
+    :type journal:      Journal.
+
+    :param order:       The order the creations of the issues of each project follow.
+    :type order:        Opt[CreationOrder].
+
+    :return: It returns False when the issue could not be restored, True when it has been restored, left as it is or
+             deferred to the order.
+    :rtype: bool.
+    """
+    logger = getLogger(__name__)
+
+    # Acquire the project_id id
+    project_id = guess_project_id(issue)
+
+    # When the project id cannot be guessed the issue is skipped
+    if not project_id:
+        logger.warning(f'Cannot guess the project identifier for the issue: `{issue}`. Action: Skipped.')
+        return False
+
+    outcome = 'failed'
+    try:
+        # Acquiring the defined project on the target instance, creating it when needed
+        project = projects.prepare(project_id, backup_folder(issue))
+
+        # We miss a definition for the project
+        if not project:
+            logger.error(f'The `{project_id:<12}` project cannot be restored. Issue: `{issue}`. Action: Skip.')
+            return False
+
+        outcome = restore_issue(pool, issue_path=issue, overwrite_set=set(args.oi), projects=projects, args=args,
+                                budget=budget, journal=journal, order=order)
+        return outcome != 'failed'
+    finally:
+        # The next creation of the project does not wait for an issue that is not to be created
+        if order and outcome != 'deferred':
+            order.settle(guess_issue_id(issue))
+
+
+def issue_number(issue: TSource) -> int:
+    """
+    It returns the number in project of the given backed up issue, 0 when it cannot be guessed.
+
+    :param issue:   The backed up issue.
+    :type issue:    TSource.
+
+    :return: See description.
+    :rtype: int.
+    """
+    number = (guess_issue_id(issue) or '').rpartition('-')[2]
+    return int(number) if number.isdigit() else 0
+
+
+def collect(futures: Set[Future], lock: Lock) -> int:
+    """
+    It waits for at least one of the given futures to complete, removes the completed ones from the set and returns
+    the number of failed issue restorations among them. The set is only accessed holding the given lock, since the
+    workers add the creations whose turn has come to it.
+
+    :param futures:     The set of pending futures of the restore tasks, whose result is False on failure.
+    :type futures:      Set[Future].
+
+    :param lock:        The lock guarding the set.
+    :type lock:         Lock.
+
+    :return: See description.
+    :rtype: int.
+    """
+    with lock:
+        pending = set(futures)
+    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+    with lock:
+        futures.difference_update(done)
+    return sum(1 for f in done if not f.result())
+
+
+def schedule(args: Namespace, pool: ConnectionPool, sources: Iterable[TSource], projects: ProjectCache,
+             journal: Journal, logger: Any) -> int:
+    """
+    It restores the backed up issues among the given archives through a pool of args.jobs workers, each issue being an
+    independent task submitted as soon as it is discovered. Every project is created or validated once, as soon as its
+    first issue is found, in parallel across projects. Only the creations of the issues of each project are run one
+    after the other in numeric order, through a CreationOrder, unless args.unordered is given: the lookups, comparisons
+    and updates of the issues and the comments and attachments of the created ones are run concurrently. The issues
+    the journal records as restored are skipped without asking the server, unless they are to be overwritten or
+    args.update is given.
+
+    :param args:        The parsed command line arguments.
+    :type args:         Namespace.
+
+    :param pool:        The pool of connections to the target instance.
+    :type pool:         ConnectionPool.
+
+    :param sources:     The backed up archives of projects and issues.
+    :type sources:      Iterable[TSource].
+
+    :param projects:    The projects known to the current restore session.
+    :type projects:     ProjectCache.
+
+    :param journal:     The journal of the restore sessions.
+    :type journal:      Journal.
+
+    :param logger:      The logger instance object.
+    :type logger:       Logger.
+
+    :return: The number of issues that could not be restored.
+    :rtype: int.
+    """
+    prepared = set()
+    found = dict(projects=0, issues=0, restored=0, rechecked=0)
+    budget = ByteBudget(args.upload_budget << 20)
+    failures = 0
+    futures = set()
+    lock = Lock()
+
+    def submit(task: Callable[[], bool]) -> None:
+        future = executor.submit(task)
+        with lock:
+            futures.add(future)
+
+    def create(creation: Callable[[], str]) -> None:
+        submit(lambda: creation() != 'failed')
+
+    order = None if args.unordered else CreationOrder(create)
+
+    with ThreadPoolExecutor(max_workers=args.jobs) as executor:
+
+        # Iterates over the archives as they are discovered
+        for source in sources:
+            if not ISSUE_NAME.match(source.name):
+                found['projects'] += 1
+                continue
+
+            found['issues'] += 1
+            project_id = guess_project_id(source)
+            issue_id = guess_issue_id(source)
+
+            # Skips the issues restored by an earlier session, unless they are to be compared with their backup
+            if journal.is_done(issue_id):
+                if not is_rechecked(args, issue_id):
+                    found['restored'] += 1
+                    if order:
+                        order.discover(issue_id, pending=False)
+                    continue
+                found['rechecked'] += 1
+
+            # Creates or validates every project once
+            if project_id not in prepared:
+                prepared.add(project_id)
+                executor.submit(projects.prepare, project_id, backup_folder(source))
+
+            if order:
+                order.discover(issue_id)
+
+            # Bounds the number of queued tasks
+            while len(futures) >= 2 * args.jobs:
+                failures += collect(futures, lock)
+            submit(lambda source=source: restore(pool, source, projects, args, budget, journal, order))
+
+        logger.info(f'{"Backed up projects":<20}: {found["projects"]}')
+        logger.info(f'{"Backed up issues":<20}: {found["issues"]}')
+        logger.info(f'{"Already restored":<20}: {found["restored"]}')
+        logger.info(f'{"Rechecked":<20}: {found["rechecked"]}\n')
+
+        # The numbers never discovered are not waited for
+        if order:
+            order.close()
+
+        # Drains the remaining workers, along with the creations they submit
+        while futures:
+            failures += collect(futures, lock)
+
+    return failures
+
+
+def fetch_pages(pool: ConnectionPool, path: str, params: Dict[str, str], page_size: int, phase: str,
+                project_id: Opt[str] = None) -> Tuple[List[Any], int]:
+    """
+    It requests the given listing of the REST API in pages of page_size items, until a short page, and returns all the
+    listed items along with the number of requests it took.
+
+    :param pool:        The pool of connections to the target instance.
+    :type pool:         ConnectionPool.
+
+    :param path:        The path of the listing, e.g. /api/issues.
+    :type path:         str.
+
+    :param params:      The query parameters, besides the paging ones.
+    :type params:       Dict[str, str].
+
+    :param page_size:   The number of items requested at once.
+    :type page_size:    int.
+
+    :param phase:       The phase the requests are accounted to.
+    :type phase:        str.
+
+    :param project_id:  The project the requests are accounted to.
+    :type project_id:   Opt[str].
+
+    :return: See description.
+    :rtype: Tuple[List[Any], int].
+    """
+    items, requests = [], 0
+    while True:
+        with pool.connection() as connection, metrics.timer(phase, project_id):
+            page = connection.getJson(path, dict(params, **{'$skip': str(len(items)), '$top': str(page_size)}))
+        requests += 1
+        items.extend(page)
+        if len(page) < page_size:
+            return items, requests
+
+
+def fetch_names(pool: ConnectionPool, path: str, key: str, page_size: int, plan: Plan, logger: Any) -> Opt[Set[str]]:
+    """
+    It lists the users or the custom fields of the target instance and returns their logins or names, None when the
+    listing is not allowed to the token, in which case the references to them are not checked.
+
+    :param pool:        The pool of connections to the target instance.
+    :type pool:         ConnectionPool.
+
+    :param path:        The path of the listing.
+    :type path:         str.
+
+    :param key:         The attribute of the listed items returned, login or name.
+    :type key:          str.
+
+    :param page_size:   The number of items requested at once.
+    :type page_size:    int.
+
+    :param plan:        The plan the requests are accounted to.
+    :type plan:         Plan.
+
+    :param logger:      The logger instance object.
+    :type logger:       Logger.
+
+    :return: See description.
+    :rtype: Opt[Set[str]].
+    """
+    try:
+        items, requests = fetch_pages(pool, path, dict(fields=key), page_size, 'project_lookup')
+    except (YouTrackException, HTTPException, OSError) as e:
+        logger.warning(f'The `{path}` listing failed, the references to it are not checked: {e}')
+        return None
+
+    plan.lookups += requests
+    return set(item.get(key) for item in items)
+
+
+def unknown_references(values: Dict[str, Any], users: Opt[Set[str]], fields: Opt[Set[str]]) -> List[str]:
+    """
+    It returns the problems the given field values of an issue would meet on the target instance: the custom fields
+    not defined there and the users not existing there. The references are not checked against a None listing.
+
+    :param values:  The field values of the issue by name.
+    :type values:   Dict[str, Any].
+
+    :param users:   The logins of the users of the target instance.
+    :type users:    Opt[Set[str]].
+
+    :param fields:  The names of the custom fields of the target instance.
+    :type fields:   Opt[Set[str]].
+
+    :return: See description.
+    :rtype: List[str].
+    """
+    problems = []
+    for name, value in values.items():
+        if name in BUILTIN_FIELDS or value is None:
+            continue
+        if fields is not None and name not in fields:
+            problems.append(f'unknown field `{name}`')
+        elif users is not None and name in USER_FIELDS:
+            problems.extend(f'unknown user `{v}`' for v in (value if isinstance(value, list) else [value])
+                            if v not in users)
+    return problems
+
+
+def plan_issue(args: Namespace, plan: Plan, source: TSource, target: Opt[Dict[str, Any]], users: Opt[Set[str]],
+               fields: Opt[Set[str]], packs: PackCache, journal: Journal) -> None:
+    """
+    It adds to the plan the action restore_issue would take on the given backed up issue: it is skipped when the journal
+    records it as restored, unless it is to be overwritten or args.update is given, or when it is unchanged, created
+    when missing from the target instance, updated when it differs from its backup and is to be overwritten, and
+    reported as a conflict when it differs but is not to be overwritten or when it references custom fields or users
+    unknown to the target instance.
+
+    :param args:    The parsed command line arguments.
+    :type args:     Namespace.
+
+    :param plan:    The plan.
+    :type plan:     Plan.
+
+    :param source:  The backed up issue.
+    :type source:   TSource.
+
+    :param target:  The issue of the target instance as listed with the TARGET_FIELDS, None when it does not exist.
+    :type target:   Opt[Dict[str, Any]].
+
+    :param users:   The logins of the users of the target instance.
+    :type users:    Opt[Set[str]].
+
+    :param fields:  The names of the custom fields of the target instance.
+    :type fields:   Opt[Set[str]].
+
+    :param packs:   The readers of the packs of the session.
+    :type packs:    PackCache.
+
+    :param journal: The journal of the restore sessions.
+    :type journal:  Journal.
+
+    :return: None.
+    :rtype: None.
+    """
+    issue_id = guess_issue_id(source)
+    project_id = issue_id.rpartition('-')[0]
+
+    if journal.is_done(issue_id):
+        if not is_rechecked(args, issue_id):
+            plan.add('skip', issue=issue_id, reason='already restored')
+            return
+        if target is None:
+            plan.add('skip', issue=issue_id, reason='already restored, missing from the target instance')
+            return
+
+    with BackedUpArchive(source, packs) as archive:
+        attachments = list(archive.attachments(issue_id))
+
+        if target is None:
+            with metrics.timer('read', project_id):
+                data = archive.load(f'{issue_id}.json')
+            problems = unknown_references({name: data.get(name) for name in FIELDS}, users, fields)
+            if problems:
+                plan.add('conflict', issue=issue_id, reason=', '.join(problems))
+            else:
+                plan.add('create', 1 + len(attachments), sum(archive.attachment_size(issue_id, a) for a in attachments),
+                         issue=issue_id)
+            return
+
+        changes = issue_changes(archive, issue_id, target)
+
+        if not changes:
+            plan.add('skip', issue=issue_id, reason='unchanged')
+            return
+
+        if issue_id not in args.oi and not args.update:
+            plan.add('conflict', issue=issue_id, reason='differs from its backup, left as it is without -oi or -u')
+            return
+
+        problems = unknown_references(changes['fields'], users, fields)
+        if problems:
+            plan.add('conflict', issue=issue_id, reason=', '.join(problems))
+            return
+
+        names = changes['fields']
+        requests = int(any(name in BUILTIN_FIELDS for name in names)) + \
+            sum(1 for name in names if name not in BUILTIN_FIELDS) + len(changes['comments']) + \
+            len(changes['attachments'])
+        size = sum(archive.attachment_size(issue_id, a) for a in attachments if a['name'] in changes['attachments'])
+        plan.add('update', requests, size, issue=issue_id, **changes)
+
+
+def make_plan(args: Namespace, pool: ConnectionPool, sources: Iterable[TSource], projects: ProjectCache,
+              journal: Journal, logger: Any) -> Plan:
+    """
+    It computes, without changing anything on the target instance, the plan of the restore of the given backed up
+    archives. The target instance is asked in bulk: its projects in a single request, its users and custom fields in
+    pages, and the issues of each backed up project existing there in pages of args.page_size issues along with
+    everything their fingerprint is computed from, args.jobs projects at a time. Every decision is then taken locally,
+    as restore_issue would take it.
+
+    :param args:        The parsed command line arguments.
+    :type args:         Namespace.
+
+    :param pool:        The pool of connections to the target instance.
+    :type pool:         ConnectionPool.
+
+    :param sources:     The backed up archives of projects and issues.
+    :type sources:      Iterable[TSource].
+
+    :param projects:    The projects known to the current restore session.
+    :type projects:     ProjectCache.
+
+    :param journal:     The journal of the restore sessions.
+    :type journal:      Journal.
+
+    :param logger:      The logger instance object.
+    :type logger:       Logger.
+
+    :return: See description.
+    :rtype: Plan.
+    """
+    plan = Plan(args.url, str(args.backup))
+    by_project = {}
+
+    for source in sources:
+        if ISSUE_NAME.match(source.name):
+            by_project.setdefault(guess_project_id(source), []).append(source)
+
+    with pool.connection() as connection, metrics.timer('project_lookup'):
+        targets = set(connection.getProjectIds())
+    plan.lookups += 1
+
+    users = fetch_names(pool, '/api/users', 'login', args.page_size, plan, logger)
+    fields = fetch_names(pool, '/api/admin/customFieldSettings/customFields', 'name', args.page_size, plan, logger)
+
+    with ThreadPoolExecutor(max_workers=args.jobs) as executor:
+        listings = {project_id: executor.submit(fetch_pages, pool, '/api/issues',
+                                                dict(query=f'project: {{{project_id}}}', fields=TARGET_FIELDS),
+                                                args.page_size, 'issue_lookup', project_id)
+                    for project_id in by_project if project_id in targets}
+
+        # Iterates over the issues of each project in numeric order
+        for project_id, project_issues in sorted(by_project.items()):
+            project_issues.sort(key=issue_number)
+            existing = {}
+
+            if project_id in listings:
+                issues, requests = listings[project_id].result()
+                plan.lookups += requests
+                existing = {issue['idReadable']: issue for issue in issues}
+            else:
+                definition = projects.definition(project_id) if projects.source(
+                    project_id, backup_folder(project_issues[0])) else None
+                lead = definition.get('lead') if definition else None
+                reason = 'not backed up' if not definition else \
+                    f'unknown user `{lead}`' if users is not None and lead and lead not in users else None
+                if reason:
+                    plan.add('conflict', project=project_id, reason=reason)
+                    for source in project_issues:
+                        plan.add('conflict', issue=guess_issue_id(source), reason=f'project {reason}')
+                    continue
+                plan.add('create_project', 1, project=project_id)
+
+            for source in project_issues:
+                target = existing.get(journal.target(guess_issue_id(source)))
+                plan_issue(args, plan, source, target, users, fields, projects.packs, journal)
+
+    return plan
+
+
+def usage(args: List[str]) -> Namespace:
     """
     It parses the given args (usually from sys.argv) and checks they conform to the rules of the application. It then
     returns a namedtuple with a field for a any given or defaulted argument.
@@ -570,8 +2368,29 @@ def usage(args: List[str]) -> Namespace:
         token='The to use with the given instance.',
         backup='The folder where backed up issues are located.',
         overwrite_projects='The projects that will be overwritten.',
-        overwrite_issues='The issues that will be overwritten.',
+        overwrite_issues='The issues that will be overwritten: the differences with their backup are applied to them, '
+                         'even when the journal records them as restored.',
+        update='The existing issues are compared with their backup by fingerprint and only their differences are '
+               'applied, instead of leaving them unchanged, even when the journal records them as restored.',
         verbose='It shows more verbose output.',
+        page_size='The number of issue identifiers requested to the server at once.',
+        jobs='The number of issues restored concurrently.',
+        unordered='The issues of a project are created concurrently, in no particular order.',
+        recursive='The sub folders of the backup folder are searched as well.',
+        attachment_jobs='The number of attachments of an issue uploaded concurrently.',
+        upload_budget='The number of MiB of attachments being uploaded at once, across all the issues.',
+        connections='The number of connections to the server, by default one per uploaded attachment.',
+        retries='The number of times a request failed for a transient error is attempted again.',
+        backoff='The delay in seconds before retrying a failed request, doubled at each attempt.',
+        journal='The journal of the restore sessions of the backup onto the target instance, by default the '
+                'restore-<host>.jsonl file of the backup folder. Delete it to restore the recorded issues again.',
+        metrics_json='The JSON file the time, operations and bytes of each phase of the run are written to, besides '
+                     'the summary shown at exit.',
+        plan='Nothing is changed on the target instance: the actions the restore would take are computed with bulk '
+             'lookups and reported, along with their counts and the estimated number of requests.',
+        plan_json='The JSON file the computed plan is written to, it implies --plan.',
+        apply_plan='The JSON file of a plan written with --plan-json, whose actions are taken as they are without '
+                   'deciding again.',
     )
 
     logger = getLogger(__name__)
@@ -587,10 +2406,57 @@ def usage(args: List[str]) -> Namespace:
     parser.add_argument('-v', '--verbose', dest='verbose', action='store_true', default=False, help=helps['verbose'])
     parser.add_argument('-op','--overwrite-projects', dest='op', nargs='+', default=[], help=helps['overwrite_projects'])
     parser.add_argument('-oi','--overwrite-issues', dest='oi', nargs='+', default=[], help=helps['overwrite_issues'])
+    parser.add_argument('-u', '--update', dest='update', action='store_true', default=False, help=helps['update'])
+    parser.add_argument('--page-size', dest='page_size', type=int, default=100, help=helps['page_size'])
+    parser.add_argument('-j', '--jobs', dest='jobs', type=int, default=1, help=helps['jobs'])
+    parser.add_argument('--unordered', dest='unordered', action='store_true', default=False, help=helps['unordered'])
+    parser.add_argument('--recursive', dest='recursive', action='store_true', default=False, help=helps['recursive'])
+    parser.add_argument('--attachment-jobs', dest='attachment_jobs', type=int, default=2, help=helps['attachment_jobs'])
+    parser.add_argument('--upload-budget', dest='upload_budget', type=int, default=64, help=helps['upload_budget'])
+    parser.add_argument('--connections', dest='connections', type=int, default=0, help=helps['connections'])
+    parser.add_argument('--retries', dest='retries', type=int, default=5, help=helps['retries'])
+    parser.add_argument('--backoff', dest='backoff', type=float, default=0.5, help=helps['backoff'])
+    parser.add_argument('--journal', dest='journal', default=None, help=helps['journal'])
+    parser.add_argument('--metrics-json', dest='metrics_json', default=None, help=helps['metrics_json'])
+    parser.add_argument('--plan', dest='plan', action='store_true', default=False, help=helps['plan'])
+    parser.add_argument('--plan-json', dest='plan_json', default=None, help=helps['plan_json'])
+    parser.add_argument('--apply-plan', dest='apply_plan', default=None, help=helps['apply_plan'])
 
     # Parsing
     args = parser.parse_args(args)
 
+    # Checking the number of workers
+    if args.jobs < 1:
+        parser.error(f'The number of jobs must be a positive integer: `{args.jobs}`')
+
+    # Checking the page size
+    if args.page_size < 1:
+        parser.error(f'The page size must be a positive integer: `{args.page_size}`')
+
+    # Checking the attachment uploads
+    if args.attachment_jobs < 1:
+        parser.error(f'The number of attachment jobs must be a positive integer: `{args.attachment_jobs}`')
+
+    if args.upload_budget < 1:
+        parser.error(f'The upload budget must be a positive integer: `{args.upload_budget}`')
+
+    # Checking the transport
+    if args.connections < 0 or args.retries < 0 or args.backoff < 0:
+        parser.error('The number of connections, the retries and the backoff cannot be negative.')
+
+    # Checking the plan
+    args.plan = args.plan or bool(args.plan_json)
+    if args.plan and args.apply_plan:
+        parser.error('A plan cannot be computed and applied at once.')
+
+    if args.apply_plan:
+        try:
+            args.apply_plan = Plan.load(Path(args.apply_plan))
+        except (OSError, ValueError, KeyError) as e:
+            parser.error(f'The plan cannot be read: {e}')
+        if args.apply_plan.target.rstrip('/') != args.url.rstrip('/'):
+            parser.error(f'The plan has been computed for another instance: `{args.apply_plan.target}`')
+
     # Converts backup to path
     args.backup = Path(args.backup)
 
@@ -621,26 +2487,51 @@ def main(args: Namespace) -> None:
     """
     logger = getLogger(__name__)
     logger.setLevel(INFO if not args.verbose else DEBUG)
+    metrics.reset()
 
     logger.info(f'TARGET: `{args.url}`')
     logger.debug(f'TOKEN:  `{args.token}`')
     logger.info(f'BACKUP: `{args.backup}`\n')
 
+    # Every worker uploads up to args.attachment_jobs attachments at once
+    pool = ConnectionPool(args.url, args.token, args.connections or args.jobs * args.attachment_jobs, args.retries,
+                          args.backoff)
+
+    journal = None
+
     try:
 
-        tempdir = mkdtemp()
-        connection = yt(args.url, token=args.token)
-        projects, issues = get_projects_and_issues(args, logger)
-        logger.info(f'{"Backed up projects":<20}: {len(projects)}')
-        logger.info(f'{"Backed up issues":<20}: {len(issues)}\n')
+        journal = Journal(journal_path(args), readonly=args.plan)
+        logger.debug(f'JOURNAL: `{journal.path}`')
 
-        for issue in issues:
-            restore(connection, issue, projects, args.backup, tempdir, args)
+        packs = PackCache()
+        projects = ProjectCache(args, pool, packs)
+        sources = iter_backup(args.backup, args.recursive, packs, logger)
+
+        if args.plan:
+            plan = make_plan(args, pool, sources, projects, journal, logger)
+            plan.report(logger)
+            if args.plan_json:
+                plan.save(Path(args.plan_json))
+                logger.info(f'PLAN: `{args.plan_json}`')
+        else:
+            if args.apply_plan:
+                logger.info(f'PLAN: {len(args.apply_plan.actions)} actions, computed on {args.apply_plan.created}\n')
+            failures = schedule(args, pool, sources, projects, journal, logger)
+
+            if failures:
+                logger.warning(f'\nFailed issues: {failures}')
 
     except Exception as e:
         logger.error(str(e))
         exit(1)
 
+    finally:
+        pool.close()
+        if journal:
+            journal.close()
+        metrics.report(logger, args.metrics_json)
+
 
 def external_main(args: List[str]) -> None:
     """
@@ -0,0 +1,474 @@
+"""
+It implements the transport shared by the backup and restore executables: a youtrack connection retrying transient
+failures with exponential backoff and jitter, a pool of such persistent connections shared by several threads, and a
+budget bounding the bytes of the transfers in flight.
+"""
+
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+from http.client import HTTPConnection, HTTPSConnection, HTTPException, HTTPResponse
+from io import RawIOBase
+from json import loads
+from logging import getLogger
+from queue import LifoQueue, Empty
+from random import uniform
+from ssl import _create_unverified_context
+from threading import BoundedSemaphore, Condition
+from time import sleep, time
+from typing import Any, Dict, Iterator, Optional as Opt
+from urllib.parse import quote, urlencode, urlsplit
+from httplib2 import HttpLib2Error, Response
+from youtrack import YouTrackException
+from youtrack.connection import Connection as yt
+
+# The statuses of the failures worth retrying: rate limiting and transient server side errors
+TRANSIENT_STATUSES = {429, 500, 502, 503, 504}
+
+# The methods which can be safely repeated
+IDEMPOTENT_METHODS = {'GET', 'HEAD', 'OPTIONS'}
+
+# The longest wait between two attempts in seconds, Retry-After included
+MAX_DELAY = 300.0
+
+
+def retry_after(value: Opt[str]) -> Opt[float]:
+    """
+    It parses the value of a Retry-After header, either a number of seconds or an HTTP date.
+
+    :param value:   The value of the header, None when missing.
+    :type value:    Opt[str].
+
+    :return: It returns the number of seconds to wait, None when the value is missing or invalid.
+    :rtype: Opt[float].
+    """
+    if not value:
+        return None
+
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time())
+    except (TypeError, ValueError):
+        return None
+
+
+def is_refused(status: int, requested: Opt[float]) -> bool:
+    """
+    It tells whether a response with the given status and Retry-After delay reports a request the server has refused
+    without processing it, which can be safely sent again whatever its method.
+
+    :param status:      The status of the response.
+    :type status:       int.
+
+    :param requested:   The delay requested through Retry-After, None when missing.
+    :type requested:    Opt[float].
+
+    :return: See description.
+    :rtype: bool.
+    """
+    return status == 429 or status == 503 and requested is not None
+
+
+def backoff_delay(backoff: float, attempt: int, requested: Opt[float] = None) -> float:
+    """
+    It returns how long to wait before the given retry attempt: the delay requested by the server when given, a
+    random delay up to backoff * 2^attempt otherwise.
+
+    :param backoff:     The delay in seconds before the first retry, doubled at each attempt.
+    :type backoff:      float.
+
+    :param attempt:     The number of attempts already retried.
+    :type attempt:      int.
+
+    :param requested:   The delay requested by the server through Retry-After.
+    :type requested:    Opt[float].
+
+    :return: See description.
+    :rtype: float.
+    """
+    if requested is not None:
+        return min(requested, MAX_DELAY)
+    return uniform(0, min(MAX_DELAY, backoff * (1 << attempt)))
+
+
+class AttachmentStream(RawIOBase):
+    """
+    It is the content of an attachment being downloaded over a persistent connection. When closed before the content
+    has been read entirely, the connection is closed as well so that the unread bytes are not taken for the next
+    response.
+    """
+
+    def __init__(self, response: HTTPResponse, connection: HTTPConnection) -> None:
+        """
+        It creates an instance of the AttachmentStream class.
+
+        :param response:    The response carrying the content.
+        :type response:     HTTPResponse.
+
+        :param connection:  The connection the response is read from.
+        :type connection:   HTTPConnection.
+        """
+        super().__init__()
+        self.response = response
+        self.connection = connection
+        self.headers = response.headers
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer: Any) -> int:
+        return self.response.readinto(buffer)
+
+    def close(self) -> None:
+        if not self.closed:
+            if not self.response.isclosed():
+                self.connection.close()
+            self.response.close()
+        super().close()
+
+
+class Connection(yt):
+    """
+    It is a youtrack connection retrying the requests failed because of rate limiting, transient server errors or
+    network errors. Idempotent requests are attempted up to retries more times, waiting an exponentially growing,
+    jittered delay, or what the server asks for with Retry-After; other requests are retried only when the server
+    has refused them without processing them. Attachments are transferred over a persistent connection of its own.
+    """
+
+    def __init__(self, url: str, token: Opt[str] = None, retries: int = 5, backoff: float = 0.5,
+                 **kwargs: Any) -> None:
+        """
+        It creates an instance of the Connection class.
+
+        :param url:         The URL of the YouTrack instance.
+        :type url:          str.
+
+        :param token:       The token to use with the given instance.
+        :type token:        Opt[str].
+
+        :param retries:     The number of times a failed request is attempted again.
+        :type retries:      int.
+
+        :param backoff:     The delay in seconds before the first retry, doubled at each attempt.
+        :type backoff:      float.
+        """
+        super().__init__(url, token=token, **kwargs)
+        self.retries = retries
+        self.backoff = backoff
+        self.stream = None
+
+    def delay(self, attempt: int, requested: Opt[float] = None) -> float:
+        """
+        It returns how long to wait before the given retry attempt: the delay requested by the server when given,
+        a random delay up to backoff * 2^attempt otherwise.
+
+        :param attempt:     The number of attempts already retried.
+        :type attempt:      int.
+
+        :param requested:   The delay requested by the server through Retry-After.
+        :type requested:    Opt[float].
+
+        :return: See description.
+        :rtype: float.
+        """
+        return backoff_delay(self.backoff, attempt, requested)
+
+    def retry(self, method: str, url: str, attempt: int, reason: Any, requested: Opt[float] = None) -> None:
+        """
+        It waits before retrying the given request.
+
+        :param method:      The method of the request.
+        :type method:       str.
+
+        :param url:         The URL of the request.
+        :type url:          str.
+
+        :param attempt:     The number of attempts already retried.
+        :type attempt:      int.
+
+        :param reason:      The reason of the failure.
+        :type reason:       Any.
+
+        :param requested:   The delay requested by the server through Retry-After.
+        :type requested:    Opt[float].
+
+        :return: None.
+        :rtype: None.
+        """
+        wait = self.delay(attempt, requested)
+        getLogger(__name__).warning(f'{method} `{url}` failed ({reason}), retry {attempt + 1}/{self.retries} '
+                                    f'in {wait:.1f}s.')
+        sleep(wait)
+
+    def _req(self, method: str, url: str, body: Any = None, ignoreStatus: Opt[int] = None,
+             content_type: Opt[str] = None) -> Any:
+        """
+        It performs the given request, retrying it on transient failures.
+        """
+        # The youtrack retry loop sleeps 30 seconds on 504 and gives up on 500 when authenticated by token
+        request = yt._req.__wrapped__
+        attempt = 0
+
+        while True:
+            try:
+                return request(self, method, url, body, ignoreStatus, content_type)
+
+            except YouTrackException as e:
+                status, requested = e.response.status, retry_after(e.response.get('retry-after'))
+                if status in (401, 403) and self._last_credentials is not None and not attempt:
+                    self._login(*self._last_credentials)
+                elif status not in TRANSIENT_STATUSES or attempt >= self.retries or \
+                        method not in IDEMPOTENT_METHODS and not is_refused(status, requested):
+                    raise
+                else:
+                    self.retry(method, url, attempt, status, requested)
+
+            except (HttpLib2Error, HTTPException, OSError) as e:
+                # The broken connection is dropped and opened again by the next attempt
+                for connection in self.http.connections.values():
+                    connection.close()
+                self.http.connections.clear()
+                if attempt >= self.retries or method not in IDEMPOTENT_METHODS:
+                    raise
+                self.retry(method, url, attempt, e)
+
+            attempt += 1
+
+    def open_stream(self) -> HTTPConnection:
+        """
+        It returns the persistent connection streamed transfers are performed on, which is opened on first use.
+
+        :return: See description.
+        :rtype: HTTPConnection.
+        """
+        if self.stream is None:
+            parts = urlsplit(self.url)
+            # Certificates are not verified, as by the youtrack connection
+            self.stream = HTTPSConnection(parts.netloc, context=_create_unverified_context()) \
+                if parts.scheme == 'https' else HTTPConnection(parts.netloc)
+        return self.stream
+
+    def getJson(self, path: str, params: Dict[str, str]) -> Any:
+        """
+        It requests the given path of the REST API, relative to the URL of the instance, with the given query
+        parameters, and returns the JSON document answered.
+
+        :param path:    The path of the request, e.g. /api/issues.
+        :type path:     str.
+
+        :param params:  The query parameters.
+        :type params:   Dict[str, str].
+
+        :return: See description.
+        :rtype: Any.
+
+        :raises YouTrackException: When the server answers with an error.
+        """
+        _, content = self._req('GET', f'{self.url}{path}?{urlencode(params)}', content_type='application/json')
+        return loads(content)
+
+    def updateIssue(self, issue_id: str, summary: Opt[str], description: Opt[str]) -> None:
+        """
+        It updates the summary and the description of the issue with the given identifier, those given as None being
+        left as they are.
+
+        :param issue_id:    The identifier of the issue.
+        :type issue_id:     str.
+
+        :param summary:     The summary.
+        :type summary:      Opt[str].
+
+        :param description: The description.
+        :type description:  Opt[str].
+
+        :raises YouTrackException: When the server answers with an error.
+        """
+        params = {name: value for name, value in (('summary', summary), ('description', description))
+                  if value is not None}
+        self._req('POST', f'/issue/{quote(issue_id)}?{urlencode(params)}')
+
+    def getAttachmentContent(self, url: str) -> AttachmentStream:
+        """
+        It opens for reading the content of the attachment at the given URL, relative to the URL of the instance.
+
+        :param url:     The URL of the attachment.
+        :type url:      str.
+
+        :return: See description.
+        :rtype: AttachmentStream.
+
+        :raises YouTrackException: When the server answers with an error.
+        """
+        parts = urlsplit(url if url.startswith('http') else self.url + url)
+        path = f'{parts.path}?{parts.query}' if parts.query else parts.path
+        attempt = 0
+
+        while True:
+            stream = self.open_stream()
+            try:
+                stream.request('GET', path, headers=self.headers)
+                response = stream.getresponse()
+                if response.status == 200:
+                    return AttachmentStream(response, stream)
+
+                content = response.read()
+                if response.status not in TRANSIENT_STATUSES or attempt >= self.retries:
+                    raise YouTrackException(url, Response(response), content)
+                self.retry('GET', url, attempt, response.status, retry_after(response.getheader('Retry-After')))
+
+            except (HTTPException, OSError) as e:
+                stream.close()
+                if attempt >= self.retries:
+                    raise
+                self.retry('GET', url, attempt, e)
+
+            attempt += 1
+
+    def close(self) -> None:
+        """
+        It closes the persistent connections.
+
+        :return: None.
+        :rtype: None.
+        """
+        for connection in self.http.connections.values():
+            connection.close()
+        self.http.connections.clear()
+        if self.stream is not None:
+            self.stream.close()
+
+
+class ConnectionPool:
+    """
+    It shares persistent connections among several threads: a connection is checked out for a unit of work and then
+    given back, so that the next unit of work reuses its open sockets. At most size connections exist at once, the
+    threads asking for more wait for one to be given back. A thread must not check out a connection while holding one.
+    """
+
+    def __init__(self, url: str, token: Opt[str], size: int, retries: int = 5, backoff: float = 0.5) -> None:
+        """
+        It creates an instance of the ConnectionPool class.
+
+        :param url:         The URL of the YouTrack instance.
+        :type url:          str.
+
+        :param token:       The token to use with the given instance.
+        :type token:        Opt[str].
+
+        :param size:        The maximum number of connections.
+        :type size:         int.
+
+        :param retries:     The number of times a failed request is attempted again.
+        :type retries:      int.
+
+        :param backoff:     The delay in seconds before the first retry, doubled at each attempt.
+        :type backoff:      float.
+        """
+        self.url = url
+        self.token = token
+        self.retries = retries
+        self.backoff = backoff
+        self.slots = BoundedSemaphore(size)
+        self.idle = LifoQueue()
+
+    @contextmanager
+    def connection(self) -> Iterator[Connection]:
+        """
+        It checks out a connection for the duration of the context, opening a new one when none is idle.
+
+        :return: See description.
+        :rtype: Iterator[Connection].
+        """
+        with self.slots:
+            try:
+                connection = self.idle.get_nowait()
+            except Empty:
+                connection = Connection(self.url, token=self.token, retries=self.retries, backoff=self.backoff)
+            try:
+                yield connection
+            finally:
+                self.idle.put(connection)
+
+    def close(self) -> None:
+        """
+        It closes the idle connections.
+
+        :return: None.
+        :rtype: None.
+        """
+        while True:
+            try:
+                self.idle.get_nowait().close()
+            except Empty:
+                break
+
+
+class ByteBudget:
+    """
+    It bounds the number of bytes in flight among concurrent transfers: a transfer waits until its size fits in what is
+    left of the budget. A transfer larger than the whole budget is let through alone.
+    """
+
+    def __init__(self, limit: int) -> None:
+        """
+        It creates an instance of the ByteBudget class.
+
+        :param limit:   The number of bytes allowed in flight.
+        :type limit:    int.
+        """
+        self.limit = limit
+        self.used = 0
+        self.condition = Condition()
+
+    def acquire(self, size: int, wait: bool = True) -> None:
+        """
+        It holds size bytes of the budget until they are released, waiting for them to be available unless wait is
+        False, in which case the budget may be exceeded.
+
+        :param size:    The number of bytes to hold.
+        :type size:     int.
+
+        :param wait:    Whether to wait for the bytes to be available.
+        :type wait:     bool.
+
+        :return: None.
+        :rtype: None.
+        """
+        with self.condition:
+            if wait:
+                self.condition.wait_for(lambda: not self.used or self.used + size <= self.limit)
+            self.used += size
+
+    def release(self, size: int) -> None:
+        """
+        It gives back size bytes of the budget.
+
+        :param size:    The number of bytes to give back.
+        :type size:     int.
+
+        :return: None.
+        :rtype: None.
+        """
+        with self.condition:
+            self.used -= size
+            self.condition.notify_all()
+
+    @contextmanager
+    def reserve(self, size: int) -> Iterator[None]:
+        """
+        It holds size bytes of the budget for the duration of the context, waiting for them to be available.
+
+        :param size:    The number of bytes to hold.
+        :type size:     int.
+
+        :return: See description.
+        :rtype: Iterator[None].
+        """
+        self.acquire(size)
+        try:
+            yield
+        finally:
+            self.release(size)